@@ -0,0 +1,4 @@
+"""Benchmarks of the hot paths of the framework, run offline with `FakeLLM`.
+
+Run all of them with ``python -m benchmarks`` from the project root, or a
+single one with e.g. ``python -m benchmarks.consensus``."""
@@ -0,0 +1,5 @@
+from benchmarks import agents, consensus, imports, policies, throughput
+
+for module in (imports, agents, policies, consensus, throughput):
+    print(f"# {module.__name__}")
+    module.run()
@@ -0,0 +1,43 @@
+"""Benchmarks of creating agents and formatting their prompts"""
+
+from langchain.schema import AgentAction
+
+from benchmarks.common import fake_llm, make_agents, measure, report, silence
+from todf.agent import ARGUMENT_TEMPLATE, CustomPromptTemplate
+
+
+def run():
+    silence()
+    llm = fake_llm()
+    for count in (10, 100, 1000):
+        seconds = measure(lambda: make_agents(llm, count), repeat=3)
+        report(f"create {count} agents", seconds, count, "agent")
+
+    prompt = CustomPromptTemplate(
+        template=ARGUMENT_TEMPLATE.format(
+            name="Agent 1", persona="persona 1", no_tools="None"
+        ),
+        tools=[],
+        input_variables=["input", "intermediate_steps", "history"],
+    )
+    steps = [
+        (
+            AgentAction(tool="search", tool_input="query", log="Thought: search"),
+            "result",
+        )
+    ] * 2
+    history = "Human: a proposition\nAI: [support] an argument\n" * 20
+
+    def format_prompts(count=1000):
+        for _ in range(count):
+            prompt.format_messages(
+                input="Wealth should be distributed equally.",
+                intermediate_steps=steps,
+                history=history,
+            )
+
+    report("format 1000 argument prompts", measure(format_prompts), 1000, "prompt")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,99 @@
+"""This module provides the helpers shared by the benchmarks"""
+
+import logging
+import random
+import time
+from typing import Callable, List, Optional
+
+from todf.agent import Agent, AgentEngine
+from todf.argument import Argument
+from todf.fake import FakeLLM
+from todf.utils import configure_verbose_output
+
+
+def silence():
+    """Drops the messages the agents print, which would swamp the results."""
+    configure_verbose_output(handlers=[logging.NullHandler()])
+
+
+def measure(fn: Callable[[], object], repeat: int = 5) -> float:
+    """
+    Times a function several times.
+
+    :param fn: the function to time
+    :param repeat: the number of runs
+    :return: the seconds of the fastest run
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name: str, seconds: float, count: Optional[int] = None, unit: str = "op"):
+    """
+    Prints the result of a benchmark.
+
+    :param name: the name of the benchmark
+    :param seconds: the measured seconds
+    :param count: the number of operations in the measured time, if any
+    :param unit: the name of an operation
+    """
+    line = f"{name:<48} {seconds * 1000:10.2f} ms"
+    if count:
+        line += f" {seconds / count * 1e6:10.1f} us/{unit}"
+    print(line)
+
+
+def make_agents(llm, count: int, **engine_kwargs) -> List[Agent]:
+    """
+    Creates a panel of agents sharing one engine.
+
+    :param llm: the language model of the agents
+    :param count: the number of agents
+    :param engine_kwargs: further arguments of the AgentEngine
+    :return: the agents
+    """
+    engine = AgentEngine(llm, None, [], **engine_kwargs)
+    return [
+        Agent(id=f"ag{i}", name=f"Agent {i}", persona=f"persona {i % 4}", engine=engine)
+        for i in range(1, count + 1)
+    ]
+
+
+def make_target(text: str = "Wealth should be distributed equally.") -> Argument:
+    return Argument(id="t", text=text, is_target=True, creator="system")
+
+
+def make_tree(
+    size: int, agents: int = 5, branching: int = 3, seed: int = 0
+) -> List[Argument]:
+    """
+    Creates a synthetic discussion: a random tree of arguments, voted on by every agent.
+
+    :param size: the number of arguments, including the target
+    :param agents: the number of voting agents
+    :param branching: the mean number of children of an inner argument
+    :param seed: the seed of the tree and of the votes
+    :return: the arguments, the target first and every parent before its children
+    """
+    rng = random.Random(seed)
+    arguments = [make_target()]
+    for i in range(1, size):
+        parent = arguments[rng.randrange(max(1, (i - 1) // branching + 1))]
+        argument = Argument(id=f"a{i}", text=f"argument {i}", creator="ag1")
+        if rng.random() < 0.5:
+            parent.supported_by.append(argument.id)
+        else:
+            parent.opposed_by.append(argument.id)
+        arguments.append(argument)
+    for argument in arguments:
+        for agent in range(1, agents + 1):
+            argument.labelling[f"ag{agent}"] = rng.choice((-1, 0, 1))
+    return arguments
+
+
+def fake_llm(**kwargs) -> FakeLLM:
+    return FakeLLM(seed=0, **kwargs)
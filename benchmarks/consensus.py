@@ -0,0 +1,36 @@
+"""Benchmarks of computing the consensus of large synthetic discussions"""
+
+from benchmarks.common import make_tree, measure, report
+from todf.consensus import ConsensusEngine, compute_support_label
+from todf.store import ArgumentStore
+
+
+def run():
+    for size in (1000, 10000, 100000):
+        store = ArgumentStore(make_tree(size))
+        target = store[0]
+
+        seconds = measure(
+            lambda: compute_support_label(target, store.by_id), repeat=3
+        )
+        report(f"support label, tree walk, {size} arguments", seconds, size, "arg")
+
+        seconds = measure(store.support_labels, repeat=3)
+        report(f"support labels, numpy, {size} arguments", seconds, size, "arg")
+
+        engine = ConsensusEngine(store)
+        engine.support_label(target.id)
+        leaves = [argument for argument in store if not argument.supported_by][:1000]
+
+        def revote():
+            # every vote invalidates one path to the target
+            for argument in leaves:
+                argument.labelling["ag1"] = -argument.labelling["ag1"]
+                engine.support_label(target.id)
+
+        seconds = measure(revote, repeat=3)
+        report(f"incremental consensus, {size} arguments", seconds, len(leaves), "vote")
+
+
+if __name__ == "__main__":
+    run()
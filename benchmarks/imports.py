@@ -0,0 +1,56 @@
+"""Benchmarks of the import time of the core modules and of the agent layer,
+each measured in a fresh interpreter"""
+
+import subprocess
+import sys
+
+from benchmarks.common import report
+
+MODULES = (
+    "todf",
+    "todf.argument",
+    "todf.consensus",
+    "todf.store",
+    "todf.export",
+    "todf.snapshot",
+    "todf.todf",
+    "todf.agent",
+    "todf.policies",
+)
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, "langchain" in sys.modules)
+"""
+
+
+def import_time(module: str, repeat: int = 3):
+    """
+    Imports a module in fresh interpreters.
+
+    :param module: the name of the module
+    :param repeat: the number of interpreters
+    :return: the seconds of the fastest import, and whether it loaded LangChain
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(module=module)],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.split()
+        best = min(best, float(output[0]))
+    return best, output[1] == "True"
+
+
+def run():
+    for module in MODULES:
+        seconds, langchain = import_time(module)
+        report(f"import {module}{' (loads langchain)' if langchain else ''}", seconds)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,56 @@
+"""Benchmarks of the scheduling cost of the execution policies, i.e. the time
+spent outside of the language model, measured with an instant FakeLLM"""
+
+from benchmarks.common import (
+    fake_llm,
+    make_agents,
+    make_target,
+    measure,
+    report,
+    silence,
+)
+from todf.policies import (
+    AdaptiveExecutionPolicy,
+    RandomExecutionPolicy,
+    RoundExecutionPolicy,
+    SequentialExecutionPolicy,
+)
+from todf.todf import Discussion
+from todf.voting import BatchVoting, LazyVoting
+
+POLICIES = {
+    "sequential": lambda: SequentialExecutionPolicy(max_arguments=30, seed=0),
+    "rounds": lambda: RoundExecutionPolicy(max_depth=2, seed=0),
+    "rounds, batch voting": lambda: RoundExecutionPolicy(
+        max_depth=2, voting=BatchVoting(), seed=0
+    ),
+    "rounds, lazy voting": lambda: RoundExecutionPolicy(
+        max_depth=2, voting=LazyVoting(), seed=0
+    ),
+    "adaptive": lambda: AdaptiveExecutionPolicy(max_arguments=30, seed=0),
+    "random": lambda: RandomExecutionPolicy(max_arguments=30, seed=0),
+}
+
+
+def run(agents: int = 6):
+    silence()
+    for name, make_policy in POLICIES.items():
+        llm = fake_llm()
+
+        def discuss():
+            Discussion(
+                proposition=make_target(),
+                agents=make_agents(llm, agents),
+                policy=make_policy(),
+                summarization_llm=llm,
+                verbose=False,
+            ).argue()
+
+        calls = llm.calls
+        discuss()
+        calls = llm.calls - calls
+        report(f"policy {name}", measure(discuss, repeat=3), calls, "call")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,55 @@
+"""Benchmarks of whole discussions with simulated language model latency,
+comparing serial and concurrent execution"""
+
+from benchmarks.common import (
+    fake_llm,
+    make_agents,
+    make_target,
+    measure,
+    report,
+    silence,
+)
+from todf.concurrency import BoundedExecutor
+from todf.policies import RoundExecutionPolicy
+from todf.todf import Discussion
+from todf.voting import BatchVoting, ConcurrentVoting, SerialVoting
+
+MODES = {
+    "serial": lambda: RoundExecutionPolicy(max_depth=1, voting=SerialVoting(), seed=0),
+    "concurrent": lambda: RoundExecutionPolicy(
+        max_depth=1,
+        voting=ConcurrentVoting(max_concurrency=16),
+        executor=BoundedExecutor(16),
+        seed=0,
+    ),
+    "concurrent, batch voting": lambda: RoundExecutionPolicy(
+        max_depth=1,
+        voting=BatchVoting(max_concurrency=16),
+        executor=BoundedExecutor(16),
+        seed=0,
+    ),
+}
+
+
+def run(agents: int = 6, latency: float = 0.02):
+    silence()
+    for name, make_policy in MODES.items():
+        llm = fake_llm(latency=latency)
+
+        def discuss():
+            Discussion(
+                proposition=make_target(),
+                agents=make_agents(llm, agents),
+                policy=make_policy(),
+                summarization_llm=llm,
+                verbose=False,
+            ).argue()
+
+        calls = llm.calls
+        seconds = measure(discuss, repeat=1)
+        calls = llm.calls - calls
+        report(f"{name}, {latency * 1000:.0f} ms latency", seconds, calls, "call")
+
+
+if __name__ == "__main__":
+    run()
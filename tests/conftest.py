@@ -0,0 +1,12 @@
+"""Shared fixtures of the tests, which run discussions of agents answered by
+a FakeLLM, without network access"""
+
+import pytest
+
+from benchmarks.common import silence
+
+
+@pytest.fixture(autouse=True)
+def quiet():
+    """Drops the messages the agents print."""
+    silence()
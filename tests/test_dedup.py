@@ -0,0 +1,113 @@
+from benchmarks.common import make_agents, make_target
+from todf.argument import Argument
+from todf.dedup import DuplicateIndex, HashingEmbedding, normalize_text
+from todf.events import ArgumentCreated, ArgumentMerged
+from todf.fake import FakeLLM
+from todf.policies import RoundExecutionPolicy
+from todf.todf import TODF, Discussion
+
+
+def add(framework, argument_id, text, creator, parent, sign):
+    argument = Argument(id=argument_id, text=text, creator=creator)
+    if sign > 0:
+        parent.supported_by.append(argument_id)
+    elif sign < 0:
+        parent.opposed_by.append(argument_id)
+    if sign:
+        parent.labelling[creator] = sign
+    return framework.add_argument(argument, parent)
+
+
+def test_normalize_text():
+    assert normalize_text("  Cats, are GREAT!! ") == "cats are great"
+
+
+def test_duplicate_takes_the_place_of_the_new_argument():
+    framework = TODF(make_target(), [], index=DuplicateIndex())
+    target = framework.target
+    add(framework, "a_1", "Cats are great.", "a", target, 1)
+    child = framework.arguments.get("a_1")
+    add(framework, "b_1", "No, they are not", "b", child, -1)
+
+    event = add(framework, "c_1", "no they are NOT", "c", target, -1)
+
+    assert isinstance(event, ArgumentMerged)
+    assert event.argument.id == "b_1" and event.duplicate.id == "c_1"
+    assert list(target.opposed_by) == ["b_1"]
+    assert target.labelling["c"] == -1
+    assert [argument.id for argument in framework.arguments] == ["t", "a_1", "b_1"]
+
+
+def test_linked_duplicate_is_not_linked_twice():
+    framework = TODF(make_target(), [], index=DuplicateIndex())
+    target = framework.target
+    add(framework, "a_1", "Cats are great.", "a", target, 1)
+
+    event = add(framework, "b_1", "cats are GREAT", "b", target, 1)
+
+    assert isinstance(event, ArgumentMerged)
+    assert list(target.supported_by) == ["a_1"]
+    assert target.labelling == {"a": 1, "b": 1}
+
+
+def test_duplicate_of_an_ancestor_is_added():
+    framework = TODF(make_target(), [], index=DuplicateIndex())
+    add(framework, "a_1", "Cats are great.", "a", framework.target, 1)
+    parent = framework.arguments.get("a_1")
+
+    event = add(framework, "b_1", "cats are great", "b", parent, -1)
+
+    assert isinstance(event, ArgumentCreated)
+    assert list(parent.opposed_by) == ["b_1"]
+
+
+def test_duplicate_without_a_stance_is_added():
+    framework = TODF(make_target(), [], index=DuplicateIndex())
+    add(framework, "a_1", "Cats are great.", "a", framework.target, 1)
+
+    event = add(framework, "b_1", "Cats are great", "b", framework.target, 0)
+
+    assert isinstance(event, ArgumentCreated)
+    assert [argument.id for argument in framework.arguments] == ["t", "a_1", "b_1"]
+
+
+def test_embedding_matches_reworded_arguments():
+    index = DuplicateIndex(embedding=HashingEmbedding(), threshold=0.8)
+    framework = TODF(make_target(), [], index=index)
+    target = framework.target
+    text = "Remote work increases productivity for most engineers"
+    add(framework, "a_1", text, "a", target, 1)
+
+    text = "For most engineers, remote work increases productivity"
+    merged = add(framework, "b_1", text, "b", target, 1)
+    text = "Offices foster mentoring of juniors"
+    created = add(framework, "c_1", text, "c", target, -1)
+
+    assert isinstance(merged, ArgumentMerged)
+    assert isinstance(created, ArgumentCreated)
+    assert len(index) == 3
+
+
+def test_discussion_merges_duplicates_of_any_case():
+    llm = FakeLLM(
+        responses=[
+            "Final Answer: [support] Equality is fair.",
+            "Final Answer: [Support] equality is FAIR!",
+        ]
+    )
+    discussion = Discussion(
+        make_target(),
+        make_agents(llm, 3),
+        RoundExecutionPolicy(1, seed=0),
+        llm,
+        verbose=False,
+        dedup=DuplicateIndex(),
+    )
+
+    events = list(discussion.stream())
+
+    merged = [event for event in events if isinstance(event, ArgumentMerged)]
+    assert len(merged) == 1
+    target = discussion.framework.target
+    assert list(target.supported_by).count(merged[0].argument.id) == 1
+    assert target.labelling[merged[0].duplicate.creator] == 1
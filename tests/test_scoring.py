@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from benchmarks.common import make_agents, make_target, make_tree
+from todf.argument import Argument
+from todf.consensus import compute_support_label
+from todf.fake import FakeLLM
+from todf.policies import RoundExecutionPolicy
+from todf.scoring import DiscussionBatch
+from todf.store import ArgumentStore
+from todf.todf import Discussion
+
+
+def tree_labels(store: ArgumentStore) -> np.ndarray:
+    labels = {}
+    for argument in store:
+        compute_support_label(argument, store.by_id, labels)
+    return np.array([labels[argument_id] for argument_id in store.ids], dtype=np.int8)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("size", [1, 2, 50, 500])
+def test_vectorized_labels_match_tree_walk(size, seed):
+    store = ArgumentStore(make_tree(size, agents=4, seed=seed))
+
+    np.testing.assert_array_equal(store.support_labels(), tree_labels(store))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_vectorized_labels_match_tree_walk_of_discussion(seed):
+    llm = FakeLLM(seed=seed)
+    discussion = Discussion(
+        make_target(),
+        make_agents(llm, 4),
+        RoundExecutionPolicy(2, seed=seed),
+        llm,
+        verbose=False,
+    )
+    discussion.argue()
+    store = discussion.framework.arguments
+
+    np.testing.assert_array_equal(store.support_labels(), tree_labels(store))
+    assert store.support_labels()[0] == discussion.consensus()
+
+
+def test_vectorized_labels_with_missing_votes():
+    target = make_target()
+    pro = Argument(id="a1", text="pro", creator="ag1")
+    con = Argument(id="a2", text="con", creator="ag2")
+    target.supported_by.append(pro.id)
+    target.opposed_by.append(con.id)
+    pro.labelling["ag1"] = 1
+    con.labelling.update(ag1=1, ag2=1)
+    store = ArgumentStore([target, pro, con])
+
+    np.testing.assert_array_equal(store.support_labels(), tree_labels(store))
+
+
+def test_batch_consensus_matches_each_discussion():
+    stores = [ArgumentStore(make_tree(100, seed=seed)) for seed in range(4)]
+
+    consensus = DiscussionBatch.from_stores(stores).consensus()
+
+    assert consensus.tolist() == [tree_labels(store)[0] for store in stores]
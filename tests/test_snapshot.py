@@ -0,0 +1,112 @@
+from typing import Any, List, Optional
+
+import pytest
+
+from benchmarks.common import make_agents, make_target
+from todf.concurrency import BoundedExecutor
+from todf.fake import FakeLLM
+from todf.memory import AgentMemory
+from todf.policies import (
+    AdaptiveExecutionPolicy,
+    RandomExecutionPolicy,
+    RoundExecutionPolicy,
+)
+from todf.snapshot import read_snapshot
+from todf.todf import Discussion
+
+POLICIES = {
+    "rounds": lambda: RoundExecutionPolicy(2, seed=3),
+    "rounds concurrent": lambda: RoundExecutionPolicy(
+        2, executor=BoundedExecutor(4), seed=3
+    ),
+    "random": lambda: RandomExecutionPolicy(
+        max_arguments=10, executor=BoundedExecutor(3), seed=3
+    ),
+    "adaptive": lambda: AdaptiveExecutionPolicy(max_arguments=10, seed=3),
+}
+
+
+class CrashingLLM(FakeLLM):
+    """Fails every call after the first `limit` ones, like a killed process."""
+
+    limit: int = 0
+
+    def _call(
+        self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> str:
+        if self.calls >= self.limit:
+            raise RuntimeError("crash")
+        return super()._call(prompt, stop, **kwargs)
+
+
+def discussion(llm, policy, checkpoint=None) -> Discussion:
+    return Discussion(
+        make_target(),
+        make_agents(llm, 4, memory_factory=AgentMemory),
+        policy,
+        llm,
+        verbose=False,
+        checkpoint=checkpoint,
+    )
+
+
+def state(d: Discussion):
+    arguments = [
+        (a.id, a.text, list(a.supported_by), list(a.opposed_by), dict(a.labelling))
+        for a in d.framework.arguments
+    ]
+    agents = [
+        (agent.id, sorted(agent.seen_arguments), agent.created_arguments)
+        for agent in d.framework.agents
+    ]
+    return arguments, agents
+
+
+@pytest.mark.parametrize("name", POLICIES)
+def test_resume_matches_uninterrupted_run(name, tmp_path):
+    uninterrupted = discussion(FakeLLM(), POLICIES[name]())
+    uninterrupted.argue()
+    path = str(tmp_path / "log.jsonl")
+
+    crashed = discussion(CrashingLLM(limit=15), POLICIES[name](), path)
+    with pytest.raises(RuntimeError):
+        crashed.argue()
+    llm = FakeLLM()
+    resumed = discussion(llm, POLICIES[name](), path)
+    resumed.argue()
+
+    assert state(resumed) == state(uninterrupted)
+    assert resumed.consensus() == uninterrupted.consensus()
+    # the answered requests are replayed from the log, not paid again
+    assert 0 < llm.calls < uninterrupted.framework.agents[0].engine.llm.calls
+
+    replayed = FakeLLM()
+    discussion(replayed, POLICIES[name](), path).argue()
+    assert replayed.calls == 0
+
+
+@pytest.mark.parametrize("name", POLICIES)
+def test_snapshot_matches_discussion(name, tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    d = discussion(FakeLLM(), POLICIES[name](), path)
+    d.argue()
+
+    snapshot = read_snapshot(path)
+
+    assert state(snapshot)[0] == state(d)[0]
+    assert snapshot.framework.consensus_engine.support_label("t") == d.consensus()
+
+
+def test_snapshot_keeps_arguments_without_a_stance(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    llm = FakeLLM(responses=["Final Answer: [Maybe] It depends."])
+    d = discussion(llm, RoundExecutionPolicy(1, seed=0), path)
+    d.argue()
+    unlinked = d.framework.arguments[1]
+    assert unlinked.text == "It depends."
+
+    snapshot = read_snapshot(path)
+
+    assert state(snapshot)[0] == state(d)[0]
+    target = snapshot.framework.target
+    assert unlinked.id not in list(target.supported_by) + list(target.opposed_by)
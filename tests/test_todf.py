@@ -0,0 +1,47 @@
+from benchmarks.common import make_agents, make_target
+from todf.argument import Argument
+from todf.fake import FakeLLM
+from todf.policies import RoundExecutionPolicy
+from todf.todf import TODF, Discussion
+
+
+def run(proposition: Argument, seed: int) -> Discussion:
+    llm = FakeLLM(seed=seed)
+    discussion = Discussion(
+        proposition,
+        make_agents(llm, 4),
+        RoundExecutionPolicy(2, seed=seed),
+        llm,
+        verbose=False,
+    )
+    discussion.argue()
+    return discussion
+
+
+def test_proposition_can_start_several_discussions():
+    proposition = make_target()
+
+    first = run(proposition, 0)
+    second = run(proposition, 1)
+
+    assert first.framework.target is not second.framework.target
+    assert list(proposition.supported_by) == []
+    assert list(proposition.opposed_by) == []
+    assert proposition.labelling == {}
+    assert first.consensus() == run(make_target(), 0).consensus()
+    assert second.consensus() == run(make_target(), 1).consensus()
+
+
+def test_framework_keeps_the_edges_and_labels_of_the_target():
+    target = make_target()
+    target.supported_by.append("a1")
+    target.labelling["ag1"] = 1
+    argument = Argument(id="a1", text="pro", creator="ag1")
+    argument.labelling["ag1"] = 1
+
+    framework = TODF(target, [])
+    framework.arguments.append(argument)
+
+    assert list(framework.target.supported_by) == ["a1"]
+    assert framework.target.labelling == {"ag1": 1}
+    assert framework.consensus_engine.support_label(target.id) == 1
@@ -0,0 +1,38 @@
+import pytest
+
+from benchmarks.common import make_agents, make_target
+from todf.fake import FakeLLM
+from todf.policies import RoundExecutionPolicy
+from todf.todf import Discussion
+from todf.voting import LazyVoting, SerialVoting
+
+
+def run(voting, seed):
+    llm = FakeLLM(seed=seed)
+    discussion = Discussion(
+        make_target(),
+        make_agents(llm, 4),
+        RoundExecutionPolicy(2, voting=voting, seed=seed),
+        llm,
+        verbose=False,
+    )
+    discussion.argue()
+    return discussion, llm
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_lazy_voting_reaches_the_same_consensus(seed):
+    serial, serial_llm = run(SerialVoting(), seed)
+    lazy, lazy_llm = run(LazyVoting(), seed)
+
+    assert [a.id for a in lazy.framework.arguments] == [
+        a.id for a in serial.framework.arguments
+    ]
+    assert lazy.consensus() == serial.consensus()
+    assert lazy_llm.calls <= serial_llm.calls
+
+
+def test_lazy_voting_skips_votes():
+    calls = [run(voting, 1)[1].calls for voting in (SerialVoting(), LazyVoting())]
+
+    assert calls[1] < calls[0]
@@ -0,0 +1,47 @@
+"""Target-oriented discussion frameworks of LLM agents.
+
+The core, i.e. arguments, frameworks, consensus, scoring, export and
+snapshots, only depends on numpy. The agent layer, i.e. agents, policies,
+caches and limits, loads LangChain. The names below are imported from their
+modules on first use, so e.g. ``from todf import compute_support_label``
+does not load the agent layer."""
+
+import importlib
+from typing import Any, List
+
+_EXPORTS = {
+    # core
+    "Argument": "todf.argument",
+    "ArgumentStore": "todf.store",
+    "TODF": "todf.todf",
+    "Discussion": "todf.todf",
+    "ConsensusEngine": "todf.consensus",
+    "compute_majority_label": "todf.consensus",
+    "compute_support_label": "todf.consensus",
+    "DiscussionBatch": "todf.scoring",
+    "read_jsonl": "todf.export",
+    "ParquetCorpus": "todf.export",
+    "read_snapshot": "todf.snapshot",
+    "DuplicateIndex": "todf.dedup",
+    "HashingEmbedding": "todf.dedup",
+    # agent layer
+    "Agent": "todf.agent",
+    "AgentEngine": "todf.agent",
+    "ExecutionPolicies": "todf.policies",
+    "FakeLLM": "todf.fake",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -5,7 +5,19 @@ maintaining persona.
 """
 
 import re
-from typing import List, Optional, Union
+import threading
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 from langchain import LLMChain, PromptTemplate
 from langchain.agents import (
@@ -14,10 +26,18 @@ from langchain.agents import (
     LLMSingleActionAgent,
     Tool,
 )
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain.prompts import BaseChatPromptTemplate
 from langchain.schema import AgentAction, AgentFinish, HumanMessage
+from pydantic import root_validator
 
 from todf.argument import Argument
+from todf.cache import CachedLLM
+from todf.metrics import request_scope
+from todf.utils import print_message
+
+if TYPE_CHECKING:
+    from todf.snapshot import DiscussionJournal
 
 
 class CustomPromptTemplate(BaseChatPromptTemplate):
@@ -29,6 +49,18 @@ class CustomPromptTemplate(BaseChatPromptTemplate):
 
     template: str
     tools: List[Tool]
+    # the descriptions and names of the tools, joined once when the template is created
+    tool_descriptions: str = ""
+    tool_names: str = ""
+
+    @root_validator()
+    def join_tools(cls, values: Dict) -> Dict:
+        tools = values.get("tools") or []
+        values["tool_descriptions"] = "\n".join(
+            [f"{tool.name}: {tool.description}" for tool in tools]
+        )
+        values["tool_names"] = ", ".join([tool.name for tool in tools])
+        return values
 
     def format_messages(self, **kwargs) -> str:
         """
@@ -45,12 +77,9 @@ class CustomPromptTemplate(BaseChatPromptTemplate):
             thoughts += f"\nObservation: {observation}\nThought: "
         # Set the agent_scratchpad variable to that value
         kwargs["agent_scratchpad"] = thoughts
-        # Create a tools variable from the list of tools provided
-        kwargs["tools"] = "\n".join(
-            [f"{tool.name}: {tool.description}" for tool in self.tools]
-        )
-        # Create a list of tool names for the tools provided
-        kwargs["tool_names"] = ", ".join([tool.name for tool in self.tools])
+        # Set the tools and tool_names variables from the tools provided
+        kwargs["tools"] = self.tool_descriptions
+        kwargs["tool_names"] = self.tool_names
         formatted = self.template.format(**kwargs)
         return [HumanMessage(content=formatted)]
 
@@ -96,66 +125,14 @@ class CustomOutputParser(AgentOutputParser):
         )
 
 
-class AgentEngine:
-    """
-    A class that provides an execution environment for an agent with access
-    to the language model and tools.
-    """
-
-    def __init__(self, llm, memory, tools, verbose=False):
-        """
-        Initialize the AgentEngine.
-
-        :param llm: the language model instance
-        :param memory: shared memory object for the engine
-        :param tools: a list of available tools for the agent
-        :param verbose: if True, print log messages; otherwise, remain silent
-        """
-        self.llm = llm
-        self.memory = memory
-        self.tools = tools
-        self.verbose = verbose
-
-        self.no_tools_str = ""
-        if not self.tools:
-            self.no_tools_str = "None"
-
-    def get_tool_names(self):
-        """
-        Get the list of the names of available tools.
-
-        :return: a list of tool names
-        """
-        return [tool.name for tool in self.tools]
-
-
-class Agent:
-    """
-    A class representing an agent capable of supporting or opposing propositions
-    using available tools while maintaining the persona.
-    """
-
-    def __init__(self, id: str, name: str, persona, engine: AgentEngine):
-        """
-        Initialize the Agent with its unique attributes.
-
-        :param id: a unique identifier for the agent
-        :param name: the name of the agent
-        :param persona: the persona of the agent
-        :param engine: the AgentEngine that provides access to the tools and the language model
-        """
-        self.id = id
-        self.name = name
-        self.persona = persona
-        self.seen_arguments: List[str] = []
-        self.argued_arguments: List[str] = []
-        self.engine = engine
+OUTPUT_PARSER = CustomOutputParser()
+"""The output parser shared by all agents; it has no state."""
 
-        template_with_history = f"""
-        Pretend that you are {self.name}, a {self.persona}.
+ARGUMENT_TEMPLATE = """
+        Pretend that you are {name}, a {persona}.
         You are taking part in a discussion.
         Support or oppose the given proposition.
-        You have access to the following tools: {self.engine.no_tools_str}
+        You have access to the following tools: {no_tools}
 
         {{tools}}
 
@@ -200,42 +177,197 @@ class Agent:
         Proposition: {{input}}
         
         {{agent_scratchpad}}"""
+
+VOTING_TEMPLATE = """
+        Pretend that you are a {persona}.
+        Express as best as you can your opinion only with a YES, NO or UNDECIDED 
+        about the following argument: {{argument}}"""
+
+BATCH_VOTING_TEMPLATE = """
+        Pretend that you are a {persona}.
+        Express as best as you can your opinion only with a YES, NO or UNDECIDED
+        about each of the following numbered arguments.
+        Answer with one line per argument in the form: <number>. <YES, NO or UNDECIDED>
+
+        {{arguments}}"""
+
+
+@dataclass(frozen=True)
+class CompiledAgent:
+    """
+    The agent executor and voting chains of a persona. They hold no state of
+    their own, so all agents with the same name and persona share them.
+    """
+
+    executor: AgentExecutor
+    vote_chain: LLMChain
+    batch_vote_chain: LLMChain
+
+
+class AgentEngine:
+    """
+    A class that provides an execution environment for an agent with access
+    to the language model and tools.
+    """
+
+    def __init__(
+        self,
+        llm,
+        memory,
+        tools,
+        verbose=False,
+        cache=None,
+        memory_factory=None,
+        tool_cache=None,
+    ):
+        """
+        Initialize the AgentEngine.
+
+        :param llm: the language model instance
+        :param memory: shared memory object for the engine
+        :param tools: a list of available tools for the agent
+        :param verbose: if True, print log messages; otherwise, remain silent
+        :param cache: an optional ResponseCache; prompts found in it are not sent to the language model
+        :param memory_factory: an optional callable creating a memory for each agent, e.g.
+                               `AgentMemory`; if given, it is used instead of the shared memory
+        :param tool_cache: an optional ToolCache, shared with other engines, that the tools answer through
+        """
+        self.llm = llm if cache is None else CachedLLM(llm=llm, cache=cache)
+        self.cache = cache
+        self.memory = memory
+        self.memory_factory = memory_factory
+        self.tool_cache = tool_cache
+        self.tools = tools if tool_cache is None else tool_cache.wrap_all(tools)
+        self.verbose = verbose
+
+        self.no_tools_str = ""
+        if not self.tools:
+            self.no_tools_str = "None"
+
+        self._compiled: Dict[Tuple[str, str], CompiledAgent] = {}
+        self._vote_chains: Dict[str, Tuple[LLMChain, LLMChain]] = {}
+        self._lock = threading.Lock()
+
+    def create_memory(self):
+        """
+        Get the memory of a new agent.
+
+        :return: a new memory from `memory_factory`, or the shared memory
+        """
+        if self.memory_factory is not None:
+            return self.memory_factory()
+        return self.memory
+
+    def get_tool_names(self):
+        """
+        Get the list of the names of available tools.
+
+        :return: a list of tool names
+        """
+        return [tool.name for tool in self.tools]
+
+    def compile(self, name: str, persona: str) -> CompiledAgent:
+        """
+        Get the agent executor and voting chains of a persona, building them
+        the first time they are asked for.
+
+        :param name: the name of the agent
+        :param persona: the persona of the agent
+        :return: the CompiledAgent shared by the agents with this name and persona
+        """
+        with self._lock:
+            compiled = self._compiled.get((name, persona))
+            if compiled is None:
+                vote_chain, batch_vote_chain = self._compile_vote_chains(persona)
+                compiled = CompiledAgent(
+                    executor=self._compile_executor(name, persona),
+                    vote_chain=vote_chain,
+                    batch_vote_chain=batch_vote_chain,
+                )
+                self._compiled[(name, persona)] = compiled
+            return compiled
+
+    def _compile_executor(self, name: str, persona: str) -> AgentExecutor:
         prompt_with_history = CustomPromptTemplate(
-            template=template_with_history,
-            tools=self.engine.tools,
+            template=ARGUMENT_TEMPLATE.format(
+                name=name, persona=persona, no_tools=self.no_tools_str
+            ),
+            tools=self.tools,
             input_variables=["input", "intermediate_steps", "history"],
         )
-        output_parser = CustomOutputParser()
-        llm_chain = LLMChain(llm=self.engine.llm, prompt=prompt_with_history)
+        llm_chain = LLMChain(llm=self.llm, prompt=prompt_with_history)
         agent = LLMSingleActionAgent(
             llm_chain=llm_chain,
-            output_parser=output_parser,
+            output_parser=OUTPUT_PARSER,
             stop=["\nObservation:"],
-            allowed_tools=self.engine.get_tool_names(),
+            allowed_tools=self.get_tool_names(),
         )
 
-        self.executor = AgentExecutor.from_agent_and_tools(
+        # the history is loaded and saved by the agent itself, see `Agent.argue`
+        return AgentExecutor.from_agent_and_tools(
             agent=agent,
-            tools=self.engine.tools,
-            memory=self.engine.memory,
-            verbose=self.engine.verbose,
+            tools=self.tools,
+            verbose=self.verbose,
         )
 
-        voting_template = f"""
-        Pretend that you are a {self.persona}.
-        Express as best as you can your opinion only with a YES, NO or UNDECIDED 
-        about the following argument: {{argument}}"""
+    def _compile_vote_chains(self, persona: str) -> Tuple[LLMChain, LLMChain]:
+        chains = self._vote_chains.get(persona)
+        if chains is None:
+            voting_prompt = PromptTemplate(
+                template=VOTING_TEMPLATE.format(persona=persona),
+                input_variables=["argument"],
+            )
+            batch_voting_prompt = PromptTemplate(
+                template=BATCH_VOTING_TEMPLATE.format(persona=persona),
+                input_variables=["arguments"],
+            )
+            # votes are saved to memory by the agent itself, see `Agent.record_vote`
+            chains = (
+                LLMChain(
+                    prompt=voting_prompt, llm=self.llm, verbose=self.verbose
+                ),
+                LLMChain(
+                    prompt=batch_voting_prompt,
+                    llm=self.llm,
+                    verbose=self.verbose,
+                ),
+            )
+            self._vote_chains[persona] = chains
+        return chains
 
-        voting_prompt = PromptTemplate(
-            template=voting_template, input_variables=["argument"]
-        )
 
-        self.vote_chain = LLMChain(
-            prompt=voting_prompt,
-            llm=self.engine.llm,
-            memory=self.engine.memory,
-            verbose=self.engine.verbose,
-        )
+class Agent:
+    """
+    A class representing an agent capable of supporting or opposing propositions
+    using available tools while maintaining the persona.
+    """
+
+    def __init__(self, id: str, name: str, persona, engine: AgentEngine):
+        """
+        Initialize the Agent with its unique attributes.
+
+        :param id: a unique identifier for the agent
+        :param name: the name of the agent
+        :param persona: the persona of the agent
+        :param engine: the AgentEngine that provides access to the tools and the language model
+        """
+        self.id = id
+        self.name = name
+        self.persona = persona
+        self.seen_arguments: Set[str] = set()
+        self.argued_arguments: Set[str] = set()
+        self.created_arguments = 0
+        self.engine = engine
+        self.memory = engine.create_memory()
+        # callback handlers of the agent's language model calls, e.g. a CallBudget
+        self.callbacks: Optional[List[BaseCallbackHandler]] = None
+        # the log of a checkpointed discussion, see `DiscussionJournal`
+        self.journal: Optional["DiscussionJournal"] = None
+
+        compiled = engine.compile(name, persona)
+        self.executor = compiled.executor
+        self.vote_chain = compiled.vote_chain
+        self.batch_vote_chain = compiled.batch_vote_chain
 
     def __str__(self):
         return f"{self.id}: {self.name}"
@@ -249,11 +381,13 @@ class Agent:
         :param target_argument: the target argument being supported or opposed
         :return: a new Argument object
         """
+        self.created_arguments += 1
         new_argument = Argument(
-            id=f"{self.id}_{len(self.argued_arguments)+1}",
+            id=f"{self.id}_{self.created_arguments}",
             text=text,
             creator=self.id,
         )
+        result = result.lower()
         if result == "oppose":
             target_argument.opposed_by.append(new_argument.id)
             target_argument.labelling[self.id] = -1
@@ -264,43 +398,124 @@ class Agent:
 
     def see_argument(self, argument: Argument):
         """
-        Add an argument to the list of seen arguments.
+        Add an argument to the set of seen arguments.
 
         :param argument: the Argument object seen by the agent
         """
-        self.seen_arguments.append(argument.id)
+        self.seen_arguments.add(argument.id)
 
-    def argue(self, argument: Argument) -> Optional[Argument]:
+    def _request(
+        self, kind: str, arguments: Sequence[Argument], call: Callable[[], str]
+    ) -> str:
         """
-        Generate a response for the given argument.
+        Make a request on behalf of the agent, see `request_scope`, or take its
+        response from the journal of a resumed discussion.
+
+        :param kind: the kind of request, "argument", "vote" or "votes"
+        :param arguments: the Argument objects of the request
+        :param call: makes the request
+        :return: the raw response
+        """
+        argument_ids = [argument.id for argument in arguments]
+        with request_scope(self.id, kind, argument_ids):
+            if self.journal is None:
+                return call()
+            return self.journal.request(self.id, kind, argument_ids, call)
+
+    def request_argument(self, argument: Argument) -> str:
+        """
+        Ask the language model for the agent's response to the given argument.
+
+        Does not change the state of the agent, so it can be called concurrently.
 
         :param argument: the Argument object to be responded to
-        :return: a new Argument object for the generated response or None if no response
+        :return: the raw response of the agent executor
+        """
+        def call():
+            inputs = {"input": argument.text, "history": ""}
+            if self.memory is not None:
+                inputs.update(
+                    self.memory.load_memory_variables({"input": argument.text})
+                )
+            return self.executor.run(callbacks=self.callbacks, **inputs)
+
+        return self._request("argument", [argument], call)
+
+    def record_argument(
+        self, argument: Argument, response: str
+    ) -> Optional[Argument]:
+        """
+        Save a response of `request_argument` to memory and turn it into a new argument.
+
+        :param argument: the Argument object that was responded to
+        :param response: the raw response of the agent executor
+        :return: a new Argument object for the response or None if no response
         """
-        response = self.executor.run(argument.text)
+        if self.memory is not None:
+            self.memory.save_context(
+                {"input": argument.text}, {"output": response}
+            )
 
         match = re.match(
             r"^\[(.*?)\]", response
         )  # match [pass/support/oppose] in string
 
         if not match:
-            print("** failure **")  # LLM fail, agent ignores argument
+            print_message("** failure **")  # LLM fail, agent ignores argument
             return None
 
-        print(response)
+        print_message(response)
 
         result = match.group(1)
 
         if "pass" in result.lower():
-            print("** failure **")
+            print_message("** failure **")
             return None
 
         justification = response.replace(f"[{result}]", "").strip()
         new_argument = self.new_argument(result, justification, argument)
-        self.argued_arguments.append(argument.id)
+        self.argued_arguments.add(argument.id)
 
         return new_argument
 
+    def argue(self, argument: Argument) -> Optional[Argument]:
+        """
+        Generate a response for the given argument.
+
+        :param argument: the Argument object to be responded to
+        :return: a new Argument object for the generated response or None if no response
+        """
+        return self.record_argument(argument, self.request_argument(argument))
+
+    def request_vote(self, arg: Argument) -> str:
+        """
+        Ask the language model for the agent's opinion on the given argument.
+
+        Does not change the state of the agent, so it can be called concurrently.
+
+        :param arg: the Argument object to be voted on
+        :return: the raw response of the language model
+        """
+        return self._request(
+            "vote",
+            [arg],
+            lambda: self.vote_chain.run(arg.text, callbacks=self.callbacks),
+        )
+
+    def record_vote(self, arg: Argument, response: str) -> int:
+        """
+        Save a response of `request_vote` to memory and turn it into a label.
+
+        :param arg: the Argument object that was voted on
+        :param response: the raw response of the language model
+        :return: 1 for 'yes', -1 for 'no', and 0 for 'undecided'
+        """
+        if self.memory is not None:
+            self.memory.save_context(
+                {"argument": arg.text}, {"text": response}
+            )
+        return parse_label(response)
+
     def vote(self, arg: Argument) -> int:
         """
         Vote on the given argument.
@@ -308,14 +523,100 @@ class Agent:
         :param arg: the Argument object to be voted on
         :return: 1 for 'yes', -1 for 'no', and 0 for 'undecided'
         """
-        label = self.vote_chain.run(arg.text)
-        label = "".join(
-            char for char in label.lower() if char.isalpha() or char.isspace()
+        return self.record_vote(arg, self.request_vote(arg))
+
+    def request_votes(self, args: Sequence[Argument]) -> str:
+        """
+        Ask the language model for the agent's opinion on several arguments
+        with a single numbered prompt.
+
+        Does not change the state of the agent, so it can be called concurrently.
+
+        :param args: the Argument objects to be voted on
+        :return: the raw response of the language model
+        """
+        return self._request(
+            "votes",
+            args,
+            lambda: self.batch_vote_chain.run(
+                number_arguments(args), callbacks=self.callbacks
+            ),
         )
 
-        if "yes" in label:
-            return 1
-        if "no" in label:
-            return -1
-        # 'undecided'
-        return 0
+    def record_votes(self, args: Sequence[Argument], response: str) -> List[int]:
+        """
+        Save a response of `request_votes` to memory and turn it into labels.
+        Arguments the response has no label for are voted on one by one.
+
+        :param args: the Argument objects that were voted on
+        :param response: the raw response of the language model
+        :return: a list of labels, one per argument, as returned by `vote`
+        """
+        if self.memory is not None:
+            self.memory.save_context(
+                {"argument": number_arguments(args)}, {"text": response}
+            )
+
+        labels = parse_numbered_labels(response, len(args))
+        return [
+            labels[i] if i in labels else self.vote(arg)
+            for i, arg in enumerate(args)
+        ]
+
+    def vote_batch(self, args: Sequence[Argument]) -> List[int]:
+        """
+        Vote on several arguments with a single call to the language model.
+
+        :param args: the Argument objects to be voted on
+        :return: a list of labels, one per argument, as returned by `vote`
+        """
+        return self.record_votes(args, self.request_votes(args))
+
+
+def parse_label(response: str) -> int:
+    """
+    Turn a YES, NO or UNDECIDED answer of the language model into a label.
+
+    :param response: the answer of the language model
+    :return: 1 for 'yes', -1 for 'no', and 0 for 'undecided'
+    """
+    label = "".join(
+        char for char in response.lower() if char.isalpha() or char.isspace()
+    )
+
+    if "yes" in label:
+        return 1
+    if "no" in label:
+        return -1
+    # 'undecided'
+    return 0
+
+
+def number_arguments(args: Sequence[Argument]) -> str:
+    """
+    Format arguments as a numbered list, starting from 1.
+
+    :param args: the Argument objects to be listed
+    :return: one line per argument
+    """
+    return "\n".join(f"{i}. {arg.text}" for i, arg in enumerate(args, start=1))
+
+
+def parse_numbered_labels(response: str, count: int) -> Dict[int, int]:
+    """
+    Parse the labels of a numbered list of answers.
+
+    :param response: the answer of the language model, one numbered line per argument
+    :param count: the number of arguments that were asked for
+    :return: a dict from the 0-based position of an argument to its label;
+             positions without an answer are missing
+    """
+    labels: Dict[int, int] = {}
+    for line in response.splitlines():
+        match = re.match(r"^\s*(\d+)\s*[.):-]?\s*(.+)$", line)
+        if not match:
+            continue
+        position = int(match.group(1)) - 1
+        if 0 <= position < count and position not in labels:
+            labels[position] = parse_label(match.group(2))
+    return labels
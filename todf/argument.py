@@ -5,7 +5,24 @@ from typing import Dict, List, Optional
 
 
 class Argument:
-    """Represents an individual argument in a debate or discussion setting."""
+    """Represents an individual argument in a debate or discussion setting.
+
+    Once an argument is added to an `ArgumentStore`, its `supported_by`,
+    `opposed_by` and `labelling` are views over the arrays of the store.
+    Before that they are plain lists and a plain dict.
+    """
+
+    __slots__ = (
+        "id",
+        "text",
+        "creator",
+        "is_target",
+        "_store",
+        "_slot",
+        "_supported_by",
+        "_opposed_by",
+        "_labelling",
+    )
 
     def __init__(
         self,
@@ -18,9 +35,52 @@ class Argument:
         self.text = text
         self.creator = creator
         self.is_target = is_target
-        self.supported_by: List[str] = []
-        self.opposed_by: List[str] = []
-        self.labelling: Dict[str, int] = {}
+        self._store = None
+        self._slot = -1
+        self._supported_by: Optional[List[str]] = []
+        self._opposed_by: Optional[List[str]] = []
+        self._labelling: Optional[Dict[str, int]] = {}
 
     def __str__(self):
         return f"{self.id} (creator: {self.creator})"
+
+    @property
+    def supported_by(self) -> List[str]:
+        if self._store is None:
+            return self._supported_by
+        return self._store.supported_by(self._slot)
+
+    @supported_by.setter
+    def supported_by(self, value: List[str]):
+        if self._store is None:
+            self._supported_by = list(value)
+        else:
+            self._store.supported_by(self._slot)[:] = value
+
+    @property
+    def opposed_by(self) -> List[str]:
+        if self._store is None:
+            return self._opposed_by
+        return self._store.opposed_by(self._slot)
+
+    @opposed_by.setter
+    def opposed_by(self, value: List[str]):
+        if self._store is None:
+            self._opposed_by = list(value)
+        else:
+            self._store.opposed_by(self._slot)[:] = value
+
+    @property
+    def labelling(self) -> Dict[str, int]:
+        if self._store is None:
+            return self._labelling
+        return self._store.labelling(self._slot)
+
+    @labelling.setter
+    def labelling(self, value: Dict[str, int]):
+        if self._store is None:
+            self._labelling = dict(value)
+        else:
+            labelling = self._store.labelling(self._slot)
+            labelling.clear()
+            labelling.update(value)
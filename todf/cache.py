@@ -0,0 +1,347 @@
+"""This module provides persistent and in-memory caches of language model
+responses, and a language model wrapper that answers repeated prompts from
+such a cache"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, List, Optional, Sequence
+
+from langchain.callbacks.manager import (
+    AsyncCallbackManager,
+    CallbackManager,
+    Callbacks,
+)
+from langchain.schema import Generation, LLMResult, PromptValue
+
+from todf.llm import LLMWrapper
+
+
+def make_key(
+    prompt: str,
+    model: Optional[str],
+    temperature: Optional[float],
+    stop: Optional[Sequence[str]],
+) -> str:
+    """
+    Computes the cache key of a language model call.
+
+    :param prompt: the text of the prompt
+    :param model: the name of the model
+    :param temperature: the sampling temperature of the model
+    :param stop: the stop sequences of the call
+    :return: a hex digest identifying the call
+    """
+    payload = json.dumps(
+        [prompt, model, temperature, list(stop) if stop else None],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """An abstract class base for caches of language model responses.
+
+    Attributes:
+    hits (int): The number of lookups that found a response.
+    misses (int): The number of lookups that did not.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> Optional[str]:
+        """
+        Looks up a cached response.
+
+        :param key: the key of the call, see `make_key`
+        :return: the cached response or None
+        """
+        with self._lock:
+            response = self._lookup(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response
+
+    def update(self, key: str, response: str):
+        """
+        Stores a response, evicting the least recently used ones if the cache is full.
+
+        :param key: the key of the call, see `make_key`
+        :param response: the response of the language model
+        """
+        with self._lock:
+            self._update(key, response)
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of lookups that found a response."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @abstractmethod
+    def _lookup(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def _update(self, key: str, response: str):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """Removes all cached responses."""
+        pass
+
+
+class InMemoryResponseCache(ResponseCache):
+    """A least recently used cache of responses kept in memory."""
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        :param max_entries: the maximum number of responses kept, or None for no limit
+        """
+        super().__init__()
+        self.max_entries = max_entries
+        self._responses: "OrderedDict[str, str]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def _lookup(self, key: str) -> Optional[str]:
+        response = self._responses.get(key)
+        if response is not None:
+            self._responses.move_to_end(key)
+        return response
+
+    def _update(self, key: str, response: str):
+        self._responses[key] = response
+        self._responses.move_to_end(key)
+        if self.max_entries is not None:
+            while len(self._responses) > self.max_entries:
+                self._responses.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """A least recently used cache of responses persisted in an SQLite file,
+    which survives restarts and can be shared by the runs of a notebook."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        """
+        :param path: the path of the database file, or ":memory:"
+        :param max_entries: the maximum number of responses kept, or None for no limit
+        :param max_bytes: the maximum total size of the responses kept, or None for no limit
+        """
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "size INTEGER NOT NULL, used INTEGER NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_used ON responses (used)"
+        )
+        self._connection.commit()
+        (self._clock,) = self._connection.execute(
+            "SELECT COALESCE(MAX(used), 0) FROM responses"
+        ).fetchone()
+        # the recency of hits is written together with the next update, so
+        # that a hit is a single read
+        self._used = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()
+            return count
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def _lookup(self, key: str) -> Optional[str]:
+        row = self._connection.execute(
+            "SELECT response FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._used[key] = self._tick()
+        return row[0]
+
+    def _update(self, key: str, response: str):
+        with self._connection:
+            self._flush_used()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, len(response.encode("utf-8")), self._tick()),
+            )
+            self._evict()
+
+    def _flush_used(self):
+        if self._used:
+            self._connection.executemany(
+                "UPDATE responses SET used = ? WHERE key = ?",
+                [(used, key) for key, used in self._used.items()],
+            )
+            self._used.clear()
+
+    def _evict(self):
+        if self.max_entries is not None:
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                "ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes is not None:
+            (total,) = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            rows = self._connection.execute(
+                "SELECT key, size FROM responses ORDER BY used"
+            )
+            evicted = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                total -= size
+            self._connection.executemany(
+                "DELETE FROM responses WHERE key = ?", evicted
+            )
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._used.clear()
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self):
+        """Writes the recency of pending hits and closes the database."""
+        with self._lock:
+            with self._connection:
+                self._flush_used()
+            self._connection.close()
+
+
+class CachedLLM(LLMWrapper):
+    """Wraps a language model or chat model and answers prompts seen before
+    from a response cache, without calling the wrapped model.
+
+    The cache key is made of the prompt text, the model name, the temperature
+    and the stop sequences. Cached responses are reported to the callbacks of
+    the call like responses of the model, marked as cached in `llm_output`.
+    """
+
+    cache: Any
+
+    def _key(self, prompt: PromptValue, stop: Optional[Sequence[str]]) -> str:
+        # rate limits and budgets do not change the responses, so the key is
+        # made of the model they wrap
+        llm = self.wrapped
+        model = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+        return make_key(
+            prompt.to_string(),
+            str(model) if model else llm.__class__.__name__,
+            getattr(llm, "temperature", None),
+            stop,
+        )
+
+    def _lookup(self, prompts: List[PromptValue], stop: Optional[List[str]]):
+        keys = [self._key(prompt, stop) for prompt in prompts]
+        responses = [self.cache.lookup(key) for key in keys]
+        missing = [i for i, response in enumerate(responses) if response is None]
+        return keys, responses, missing
+
+    def _result(self, keys, responses, missing, result: Optional[LLMResult]):
+        if result is not None:
+            for i, generations in zip(missing, result.generations):
+                responses[i] = generations[0].text
+                self.cache.update(keys[i], responses[i])
+        return LLMResult(
+            generations=[[Generation(text=response)] for response in responses],
+            llm_output=result.llm_output if result is not None else None,
+        )
+
+    @staticmethod
+    def _hits(prompts, responses, missing):
+        missing = set(missing)
+        hits = [i for i in range(len(prompts)) if i not in missing]
+        return (
+            [prompts[i].to_string() for i in hits],
+            LLMResult(
+                generations=[[Generation(text=responses[i])] for i in hits],
+                llm_output={"cached": True},
+            ),
+        )
+
+    def _report_hits(self, prompts, responses, missing, callbacks: Callbacks):
+        # callbacks see cached responses like calls, so that counting them
+        # gives the same result whether the cache is warm or cold
+        if callbacks is None or len(missing) == len(prompts):
+            return
+        texts, result = self._hits(prompts, responses, missing)
+        manager = CallbackManager.configure(callbacks)
+        run_manager = manager.on_llm_start({"name": self.__class__.__name__}, texts)
+        run_manager.on_llm_end(result)
+
+    async def _areport_hits(self, prompts, responses, missing, callbacks: Callbacks):
+        if callbacks is None or len(missing) == len(prompts):
+            return
+        texts, result = self._hits(prompts, responses, missing)
+        manager = AsyncCallbackManager.configure(callbacks)
+        run_manager = await manager.on_llm_start(
+            {"name": self.__class__.__name__}, texts
+        )
+        await run_manager.on_llm_end(result)
+
+    def generate_prompt(
+        self,
+        prompts: List[PromptValue],
+        stop: Optional[List[str]] = None,
+        callbacks: Callbacks = None,
+    ) -> LLMResult:
+        keys, responses, missing = self._lookup(prompts, stop)
+        self._report_hits(prompts, responses, missing, callbacks)
+        result = None
+        if missing:
+            result = self.llm.generate_prompt(
+                [prompts[i] for i in missing], stop=stop, callbacks=callbacks
+            )
+        return self._result(keys, responses, missing, result)
+
+    async def agenerate_prompt(
+        self,
+        prompts: List[PromptValue],
+        stop: Optional[List[str]] = None,
+        callbacks: Callbacks = None,
+    ) -> LLMResult:
+        keys, responses, missing = self._lookup(prompts, stop)
+        await self._areport_hits(prompts, responses, missing, callbacks)
+        result = None
+        if missing:
+            result = await self.llm.agenerate_prompt(
+                [prompts[i] for i in missing], stop=stop, callbacks=callbacks
+            )
+        return self._result(keys, responses, missing, result)
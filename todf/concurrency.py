@@ -0,0 +1,110 @@
+"""This module provides a bounded thread pool for running independent LLM calls
+concurrently, with a per-call timeout and retries."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Callable, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# The attempt number of the call running in the current thread, starting at
+# 0, and the time.perf_counter() value at which the attempt was queued.
+current_attempt: ContextVar[Tuple[int, Optional[float]]] = ContextVar(
+    "current_attempt", default=(0, None)
+)
+
+
+class BoundedExecutor:
+    """Runs blocking calls concurrently while keeping at most
+    ``max_concurrency`` of them in flight.
+
+    Threads are used instead of asyncio so that the executor also works from
+    inside an already running event loop, e.g. a Jupyter notebook.
+
+    A timeout only stops waiting for an attempt: the timed out attempt keeps
+    running while the next one starts, so both make their calls, report them
+    to the callbacks, count against call and token budgets, and are logged
+    by a discussion journal. Set the timeout above the worst-case latency of
+    a call, to retry hung calls only.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+    ):
+        """
+        Initialize the BoundedExecutor.
+
+        :param max_concurrency: the maximum number of calls in flight at once
+        :param timeout: the number of seconds to wait for a single attempt, or None to wait forever
+        :param retries: how many times a failed or timed out call is attempted again
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if retries < 0:
+            raise ValueError("retries must not be negative")
+
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        """
+        Apply ``fn`` to every item concurrently.
+
+        :param fn: the blocking callable to apply
+        :param items: the inputs of the calls
+        :return: the results, in the order of ``items``
+        :raises Exception: the last error of a call that failed on every attempt
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        # A timed out attempt cannot be interrupted and keeps its thread busy,
+        # so the attempts get their own pool, large enough for every retry,
+        # which is not waited for on shutdown.
+        attempts = ThreadPoolExecutor(
+            max_workers=self.max_concurrency * (self.retries + 1)
+        )
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as calls:
+                queued = time.perf_counter()
+                futures = [
+                    calls.submit(self._call, attempts, fn, item, queued)
+                    for item in items
+                ]
+                return [future.result() for future in futures]
+        finally:
+            attempts.shutdown(wait=False, cancel_futures=True)
+
+    def _call(
+        self,
+        attempts: ThreadPoolExecutor,
+        fn: Callable[[T], R],
+        item: T,
+        queued: float,
+    ) -> R:
+        attempt = 0
+        while True:
+            future = attempts.submit(self._attempt, fn, item, attempt, queued)
+            try:
+                return future.result(timeout=self.timeout)
+            except Exception:
+                future.cancel()
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                queued = time.perf_counter()
+
+    @staticmethod
+    def _attempt(fn: Callable[[T], R], item: T, attempt: int, queued: float) -> R:
+        token = current_attempt.set((attempt, queued))
+        try:
+            return fn(item)
+        finally:
+            current_attempt.reset(token)
@@ -0,0 +1,328 @@
+"""This module provides the computation of majority and support labels, an
+incremental consensus engine for a growing discussion, and bounds of the
+labels of a discussion that is still being labelled"""
+
+from collections import defaultdict
+from itertools import chain
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from todf.argument import Argument
+
+if TYPE_CHECKING:
+    from todf.store import ArgumentStore
+
+
+def compute_majority_label(argument: Argument):
+    """Computes the majority label of an argument.
+
+    :param argument: (Argument) The argument to compute the majority label for.
+    :return: (int) The majority label for the argument.
+    """
+    total_sum = sum(argument.labelling.values())
+    if total_sum > 0:
+        return 1
+    elif total_sum == 0:
+        return 0
+    else:
+        return -1
+
+
+def compute_support_label(
+    argument: Argument,
+    arguments: Mapping[str, Argument],
+    labels: Optional[Dict[str, int]] = None,
+) -> int:
+    """Computes the support label for an argument in discussion.
+
+    The children of an argument are visited with an explicit stack, so deep
+    discussions do not hit the recursion limit, and each argument is labelled
+    only once even if it is reachable through several parents.
+
+    :param argument: (Argument) The argument to compute the support for.
+    :param arguments: (Mapping[str, Argument]) A dictionary of arguments in the
+                    discussion, e.g. `ArgumentStore.by_id`.
+    :param labels: (Dict[str, int], optional) Support labels computed so far,
+                    by argument id. Missing labels are computed and added to it.
+    :return: (int) The computed support value for the argument.
+    """
+    if labels is None:
+        labels = {}
+
+    stack = [argument.id]
+    visiting: Set[str] = set()
+    while stack:
+        argument_id = stack[-1]
+        if argument_id in labels:
+            stack.pop()
+            continue
+
+        current = arguments[argument_id]
+        children = [
+            child_id
+            for child_id in chain(current.supported_by, current.opposed_by)
+            if child_id not in labels
+        ]
+        if children and argument_id not in visiting:
+            visiting.add(argument_id)
+            for child_id in children:
+                if child_id in visiting:
+                    raise ValueError(
+                        f"Argument {child_id} supports or opposes itself"
+                    )
+                stack.append(child_id)
+            continue
+
+        stack.pop()
+        visiting.discard(argument_id)
+        labels[argument_id] = _support_label(current, labels)
+
+    return labels[argument.id]
+
+
+def _support_label(argument: Argument, labels: Dict[str, int]) -> int:
+    """Computes the support label of an argument from the support labels of
+    its children."""
+    if len(argument.supported_by) == 0 and len(argument.opposed_by) == 0:
+        # leaf
+        return compute_majority_label(argument)
+
+    pro = 0
+    con = 0
+
+    for child_argument_id in argument.supported_by:
+        child_support = labels[child_argument_id]
+        if child_support == 1:
+            pro += 1
+        elif child_support == -1:
+            con += 1
+
+    for child_argument_id in argument.opposed_by:
+        child_support = labels[child_argument_id]
+        if child_support == 1:
+            con += 1
+        elif child_support == -1:
+            pro += 1
+
+    if pro > con:
+        return 1
+    elif pro < con:
+        return -1
+    else:
+        return compute_majority_label(argument)
+
+
+class ConsensusEngine:
+    """Keeps the support labels of a growing discussion up to date.
+
+    Support labels are cached per argument. When the labelling or the
+    supporters/opposers of an argument change, only that argument and its
+    ancestors are invalidated, so the consensus can be recomputed after every
+    new argument or vote without walking the whole discussion again.
+    """
+
+    def __init__(self, arguments: "ArgumentStore"):
+        """
+        :param arguments: (ArgumentStore) The arguments of the discussion. Changes
+                        and new arguments are reported by the store.
+        """
+        self.arguments = arguments
+        self._parents: Dict[str, Set[str]] = defaultdict(set)
+        self._labels: Dict[str, int] = {}
+
+        for argument in arguments:
+            self._on_change(argument)
+        arguments.subscribe(self._on_change)
+
+    def support_label(self, argument_id: str) -> int:
+        """
+        Returns the support label of an argument, computing only what changed
+        since the last query.
+
+        :param argument_id: (str) The id of the argument.
+        :return: (int) The support label (-1, 0, or 1) of the argument.
+        """
+        return compute_support_label(
+            self.arguments.get(argument_id), self.arguments.by_id, self._labels
+        )
+
+    def _on_change(self, argument: Argument):
+        for child_id in chain(argument.supported_by, argument.opposed_by):
+            self._parents[child_id].add(argument.id)
+        self._invalidate(argument.id)
+
+    def _invalidate(self, argument_id: str):
+        # a cached label implies cached children, so the walk stops at the
+        # first ancestor that is already invalid
+        stack = [argument_id]
+        while stack:
+            current = stack.pop()
+            if self._labels.pop(current, None) is None:
+                continue
+            stack.extend(self._parents.get(current, ()))
+
+
+def _sign(value: int) -> int:
+    return (value > 0) - (value < 0)
+
+
+class LabelBounds:
+    """Bounds the support labels that arguments can still take while their
+    labelling is incomplete.
+
+    Every agent that has not labelled an argument yet may still add -1, 0 or 1
+    to it, so the majority label of an argument lies between the signs of its
+    label sum minus and plus the number of such agents. The bounds of the
+    support labels follow from the bounds of the children, bottom up. They only
+    narrow as votes come in, so a vote that cannot change the support label of
+    any root argument now never will.
+    """
+
+    def __init__(self, arguments: Sequence[Argument], pending: Mapping[str, int]):
+        """
+        :param arguments: (Sequence[Argument]) The arguments of the discussion. Those
+                        without a parent among them are the roots.
+        :param pending: (Mapping[str, int]) The number of agents that may still label
+                        each argument, by argument id.
+        """
+        self._arguments = {argument.id: argument for argument in arguments}
+        self._pending = {
+            argument_id: pending.get(argument_id, 0)
+            for argument_id in self._arguments
+        }
+        self._sums = {
+            argument.id: sum(argument.labelling.values()) for argument in arguments
+        }
+        self._parents: Dict[str, List[str]] = defaultdict(list)
+        for argument in arguments:
+            for child_id in chain(argument.supported_by, argument.opposed_by):
+                if child_id in self._arguments:
+                    self._parents[child_id].append(argument.id)
+
+        self._diffs: Dict[str, Tuple[int, int]] = {}
+        self._labels: Dict[str, Tuple[int, int]] = {}
+        for argument_id in self._postorder():
+            self._update(argument_id)
+
+    def _postorder(self) -> List[str]:
+        order = []
+        done: Set[str] = set()
+        for root_id in self._arguments:
+            stack = [(root_id, False)]
+            while stack:
+                argument_id, expanded = stack.pop()
+                if argument_id in done:
+                    continue
+                if expanded:
+                    done.add(argument_id)
+                    order.append(argument_id)
+                    continue
+                stack.append((argument_id, True))
+                argument = self._arguments[argument_id]
+                for child_id in chain(argument.supported_by, argument.opposed_by):
+                    if child_id in self._arguments and child_id not in done:
+                        stack.append((child_id, False))
+        return order
+
+    def majority(self, argument_id: str) -> Tuple[int, int]:
+        """
+        :param argument_id: (str) The id of the argument.
+        :return: (Tuple[int, int]) The lowest and highest majority label the argument can still get.
+        """
+        total = self._sums[argument_id]
+        pending = self._pending[argument_id]
+        return _sign(total - pending), _sign(total + pending)
+
+    def label(self, argument_id: str) -> Tuple[int, int]:
+        """
+        :param argument_id: (str) The id of the argument.
+        :return: (Tuple[int, int]) The lowest and highest support label the argument can still get.
+        """
+        return self._labels[argument_id]
+
+    def _child(self, child_id: str) -> Tuple[int, int]:
+        # arguments outside the given ones may take any label
+        return self._labels.get(child_id, (-1, 1))
+
+    def _update(self, argument_id: str) -> bool:
+        argument = self._arguments[argument_id]
+        low = high = 0
+        for child_id in argument.supported_by:
+            child_low, child_high = self._child(child_id)
+            low += child_low
+            high += child_high
+        for child_id in argument.opposed_by:
+            child_low, child_high = self._child(child_id)
+            low -= child_high
+            high -= child_low
+
+        labels = []
+        if high > 0:
+            labels.append(1)
+        if low < 0:
+            labels.append(-1)
+        if low <= 0 <= high:
+            # a leaf, or a possible tie between pro and con children
+            labels.extend(self.majority(argument_id))
+
+        bounds = (min(labels), max(labels))
+        changed = self._labels.get(argument_id) != bounds
+        self._diffs[argument_id] = (low, high)
+        self._labels[argument_id] = bounds
+        return changed
+
+    def add_vote(self, argument_id: str, label: int):
+        """
+        Narrows the bounds with a new vote.
+
+        :param argument_id: (str) The id of the labelled argument.
+        :param label: (int) The label of the vote.
+        """
+        self._sums[argument_id] += label
+        self._pending[argument_id] -= 1
+        stack = [argument_id]
+        while stack:
+            current = stack.pop()
+            if self._update(current):
+                stack.extend(self._parents.get(current, ()))
+
+    def needs_vote(self, argument_id: str) -> bool:
+        """
+        Tells whether another vote on an argument can still change the support
+        label of a root argument.
+
+        :param argument_id: (str) The id of the argument.
+        :return: (bool) False if the vote can be skipped.
+        """
+        if self._pending[argument_id] <= 0:
+            return False
+        low, high = self.majority(argument_id)
+        if low == high:
+            return False
+        diff_low, diff_high = self._diffs[argument_id]
+        if not diff_low <= 0 <= diff_high:
+            # the children decide the label, the majority is never used
+            return False
+
+        stack = [argument_id]
+        seen: Set[str] = set()
+        while stack:
+            current = stack.pop()
+            low, high = self._labels[current]
+            if low == high or current in seen:
+                continue
+            seen.add(current)
+            parents = self._parents.get(current)
+            if not parents:
+                # an undecided root
+                return True
+            stack.extend(parents)
+        return False
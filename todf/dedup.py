@@ -0,0 +1,146 @@
+"""This module provides an index of the arguments of a discussion that finds
+near-identical new arguments, by normalized text and optionally by the
+cosine similarity of their embeddings, so they can be merged into the
+existing ones, see `TODF.add_argument`"""
+
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from todf.argument import Argument
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes the text of an argument, so texts differing only in case,
+    punctuation or spacing are identical.
+
+    :param text: the text of an argument
+    :return: the normalized text
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+class HashingEmbedding:
+    """A local embedding without a model: the hashed counts of the character
+    trigrams of the words of a text. It catches reworded sentences that share
+    most of their words, not paraphrases with different words; plug in a
+    sentence embedding model for those."""
+
+    def __init__(self, dimensions: int = 1024, n: int = 3):
+        """
+        :param dimensions: the length of the vectors
+        :param n: the length of the character n-grams
+        """
+        self.dimensions = dimensions
+        self.n = n
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in normalize_text(text).split():
+                word = f" {word} "
+                for i in range(max(len(word) - self.n + 1, 1)):
+                    gram = word[i : i + self.n].encode("utf-8")
+                    vectors[row, zlib.crc32(gram) % self.dimensions] += 1
+        return vectors
+
+
+class DuplicateIndex:
+    """An index of the arguments of a discussion that finds the existing
+    argument a new one duplicates.
+
+    An argument duplicates another one if their normalized texts are equal,
+    or, if an embedding is given, if the cosine similarity of their
+    embeddings is at least the threshold. The embedding is any callable
+    mapping a list of texts to a list of vectors, e.g. `HashingEmbedding` or
+    the ``encode`` method of a local sentence embedding model, or an object
+    with an ``embed_documents`` method like the LangChain embeddings.
+    """
+
+    def __init__(
+        self,
+        embedding: Optional[Any] = None,
+        threshold: float = 0.9,
+        normalize: Callable[[str], str] = normalize_text,
+    ):
+        """
+        :param embedding: an optional embedding of texts; without it only equal normalized texts match
+        :param threshold: the cosine similarity from which embeddings match
+        :param normalize: turns the text of an argument into its hash key
+        """
+        self.embedding = embedding
+        self.threshold = threshold
+        self.normalize = normalize
+        self._texts: Dict[str, str] = {}
+        self._ids: List[str] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._looked_up: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def _embed(self, text: str) -> np.ndarray:
+        embed = getattr(self.embedding, "embed_documents", self.embedding)
+        vector = np.asarray(embed([text])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def find(self, argument: Argument) -> Optional[str]:
+        """
+        Finds the indexed argument the given one duplicates.
+
+        :param argument: a new argument
+        :return: the id of the most similar duplicate, or None
+        """
+        key = self.normalize(argument.text)
+        with self._lock:
+            if key in self._texts:
+                return self._texts[key]
+        if self.embedding is None:
+            return None
+
+        vector = self._embed(argument.text)
+        with self._lock:
+            if self._ids:
+                similarities = self._vectors[: len(self._ids)] @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    return self._ids[best]
+            # an argument without a duplicate is added next, see `add`
+            self._looked_up[argument.id] = vector
+        return None
+
+    def add(self, argument: Argument):
+        """
+        Indexes an argument.
+
+        :param argument: an argument of the discussion
+        """
+        key = self.normalize(argument.text)
+        vector = None
+        if self.embedding is not None:
+            with self._lock:
+                vector = self._looked_up.pop(argument.id, None)
+            if vector is None:
+                vector = self._embed(argument.text)
+
+        with self._lock:
+            self._texts.setdefault(key, argument.id)
+            if vector is None:
+                return
+            count = len(self._ids)
+            if self._vectors is None:
+                self._vectors = np.zeros((16, len(vector)), dtype=np.float32)
+            elif count == len(self._vectors):
+                grown = np.zeros((2 * count, self._vectors.shape[1]), dtype=np.float32)
+                grown[:count] = self._vectors
+                self._vectors = grown
+            self._vectors[count] = vector
+            self._ids.append(argument.id)
@@ -0,0 +1,624 @@
+"""This module provides the distributed execution of discussions: the
+coordinator runs the execution policies, and every language model call they
+make becomes a task of a work queue, which workers on any number of hosts
+lease, run and answer"""
+
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional
+
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain.llms.base import BaseLLM
+from langchain.prompts.base import StringPromptValue
+from langchain.schema import Generation, LLMResult
+from pydantic import PrivateAttr
+
+from todf.metrics import current_request
+from todf.sweep import DiscussionSpec, SweepRunner
+
+
+class TaskFailedError(RuntimeError):
+    """Raised by a QueueLLM call whose task failed on every attempt."""
+
+
+@dataclass(frozen=True)
+class Task:
+    """A leased task of a work queue.
+
+    Attributes:
+    id (str): The id of the task; putting a task with the same id again has no effect.
+    payload (Dict[str, Any]): The JSON serializable description of the work.
+    attempts (int): The number of times the task has been leased, this lease included.
+    worker_id (Optional[str]): The id of the worker holding the lease.
+    """
+
+    id: str
+    payload: Dict[str, Any]
+    attempts: int
+    worker_id: Optional[str] = None
+
+
+class WorkQueue(ABC):
+    """An abstract class base for the work queues shared by a coordinator and
+    its workers.
+
+    Tasks are idempotent: they are identified by the caller, and a task whose
+    id is already queued, leased or answered is not queued again. A worker
+    leases a task for a limited time, which it extends while it runs; a task
+    whose lease expires, e.g. because its worker died, is leased again.
+    """
+
+    @abstractmethod
+    def put(self, task_id: str, payload: Dict[str, Any]) -> bool:
+        """
+        Queues a task, unless a task with the same id exists.
+
+        :param task_id: the id of the task
+        :param payload: the JSON serializable description of the work
+        :return: True if the task was queued
+        """
+
+    @abstractmethod
+    def lease(self, worker_id: str) -> Optional[Task]:
+        """
+        Takes the oldest queued task, if any, for the lease time of the queue.
+
+        :param worker_id: the id of the leasing worker
+        :return: the task, or None if the queue is empty
+        """
+
+    @abstractmethod
+    def renew(self, task: Task):
+        """
+        Extends the lease of a task, while it is running.
+
+        :param task: the leased task
+        """
+
+    @abstractmethod
+    def complete(self, task: Task, result: Dict[str, Any]):
+        """
+        Stores the result of a leased task and ends the lease.
+
+        :param task: the leased task
+        :param result: the JSON serializable result
+        """
+
+    @abstractmethod
+    def fail(self, task: Task, error: str):
+        """
+        Ends the lease of a task that raised an error. The task is queued
+        again, or answered with the error once it has used its attempts.
+
+        :param task: the leased task
+        :param error: the description of the error
+        """
+
+    @abstractmethod
+    def result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        :param task_id: the id of a task
+        :return: its result, or None if it has not been answered yet
+        """
+
+    @abstractmethod
+    def discard(self, task_id: str):
+        """
+        Removes the result of a task once it has been consumed, so the task
+        can be put again.
+
+        :param task_id: the id of the task
+        """
+
+
+class FileQueue(WorkQueue):
+    """A work queue in a directory, e.g. on a file system shared by the hosts.
+
+    Every task is a JSON file that moves from ``tasks/`` to ``leases/`` when
+    it is leased, and is replaced by a file in ``results/`` when it is
+    answered. Leasing relies on the atomicity of renaming a file, so exactly
+    one worker wins a task. A leased file holds the deadline of its lease;
+    a lease also lasts at least `lease_seconds` from the rename, i.e. the
+    status change time of the file, so it cannot expire before its deadline
+    is written. A worker whose lease has expired and been taken by another
+    worker can neither answer the task nor queue it again.
+    """
+
+    def __init__(self, root: str, lease_seconds: float = 60.0, max_attempts: int = 3):
+        """
+        :param root: the directory of the queue, created if needed
+        :param lease_seconds: the seconds a lease lasts without being renewed
+        :param max_attempts: the number of times a task is leased before it fails for good
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        self.root = root
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        for name in ("tasks", "leases", "results", "tmp"):
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    def _path(self, folder: str, task_id: str) -> str:
+        return os.path.join(self.root, folder, f"{task_id}.json")
+
+    def _write(self, path: str, data: Dict[str, Any]):
+        tmp = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, task_id: str, payload: Dict[str, Any]) -> bool:
+        if any(
+            os.path.exists(self._path(folder, task_id))
+            for folder in ("results", "leases", "tasks")
+        ):
+            return False
+        self._write(
+            self._path("tasks", task_id),
+            {"id": task_id, "payload": payload, "attempts": 0},
+        )
+        return True
+
+    def lease(self, worker_id: str) -> Optional[Task]:
+        self.requeue_expired()
+        with os.scandir(os.path.join(self.root, "tasks")) as entries:
+            queued = []
+            for entry in entries:
+                try:
+                    queued.append((entry.stat().st_mtime, entry.name))
+                except FileNotFoundError:
+                    continue
+        for _, name in sorted(queued):
+            leased = os.path.join(self.root, "leases", name)
+            try:
+                os.rename(os.path.join(self.root, "tasks", name), leased)
+            except FileNotFoundError:
+                # another worker was faster
+                continue
+            data = self._read(leased)
+            if data is None:
+                continue
+            data["attempts"] += 1
+            data["worker_id"] = worker_id
+            data["deadline"] = time.time() + self.lease_seconds
+            self._write(leased, data)
+            return Task(
+                id=data["id"],
+                payload=data["payload"],
+                attempts=data["attempts"],
+                worker_id=worker_id,
+            )
+        return None
+
+    def renew(self, task: Task):
+        path = self._path("leases", task.id)
+        data = self._read(path)
+        # the lease may have expired and been taken by another worker
+        if data is None or data.get("worker_id") != task.worker_id:
+            return
+        data["deadline"] = time.time() + self.lease_seconds
+        self._write(path, data)
+
+    def _take_lease(self, task: Task) -> Optional[str]:
+        """Moves the lease file of a task out of ``leases/`` if the worker of
+        the task still holds it, so no other worker can lease, renew or
+        requeue it meanwhile.
+
+        :return: the new path of the lease file, or None if the lease has
+            expired and been taken by another worker
+        """
+        path = self._path("leases", task.id)
+        taken = os.path.join(self.root, "tmp", uuid.uuid4().hex)
+        try:
+            os.rename(path, taken)
+        except FileNotFoundError:
+            return None
+        data = self._read(taken)
+        if data is None or data.get("worker_id") != task.worker_id:
+            # nothing can lease the task while its file is away, so the
+            # lease of the other worker is put back unchanged
+            os.rename(taken, path)
+            return None
+        return taken
+
+    def complete(self, task: Task, result: Dict[str, Any]):
+        # a stale worker drops its result, the new holder of the lease answers
+        taken = self._take_lease(task)
+        if taken is None:
+            return
+        self._write(self._path("results", task.id), dict(result, id=task.id))
+        os.remove(taken)
+
+    def fail(self, task: Task, error: str):
+        if task.attempts >= self.max_attempts:
+            self.complete(task, {"error": error})
+            return
+        taken = self._take_lease(task)
+        if taken is None:
+            return
+        data = self._read(taken)
+        # the worker no longer holds the task once it is queued again
+        del data["worker_id"]
+        self._write(taken, data)
+        os.rename(taken, self._path("tasks", task.id))
+
+    def result(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self._read(self._path("results", task_id))
+
+    def discard(self, task_id: str):
+        try:
+            os.remove(self._path("results", task_id))
+        except FileNotFoundError:
+            pass
+
+    def requeue_expired(self):
+        """Queues the leased tasks whose lease has expired again, or answers
+        them with an error once they have used their attempts."""
+        now = time.time()
+        with os.scandir(os.path.join(self.root, "leases")) as entries:
+            paths = [entry.path for entry in entries]
+        for path in paths:
+            try:
+                renamed = os.stat(path).st_ctime
+            except FileNotFoundError:
+                continue
+            if renamed + self.lease_seconds >= now:
+                continue
+            data = self._read(path)
+            if data is None:
+                continue
+            # a requeued file keeps the deadline of its expired lease until
+            # the new one is written
+            deadline = max(data.get("deadline", 0), renamed + self.lease_seconds)
+            if deadline >= now:
+                continue
+            task = Task(
+                id=data["id"],
+                payload=data["payload"],
+                attempts=data["attempts"],
+                worker_id=data.get("worker_id"),
+            )
+            self.fail(task, f"The lease of worker {task.worker_id} expired")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: the numbers of queued, leased and answered tasks
+        """
+        return {
+            folder: len(os.listdir(os.path.join(self.root, folder)))
+            for folder in ("tasks", "leases", "results")
+        }
+
+
+class QueueLLM(BaseLLM):
+    """A language model whose calls are run by the workers of a work queue.
+
+    Every call becomes a task, and waits for its result, which is removed
+    from the queue once it is read. The id of a task is made of the
+    namespace, e.g. the run id of a discussion, the request the call is made
+    for, see `request_scope`, the number of calls made for that request
+    before, and the prompt. Putting the same call again, e.g. after the
+    coordinator was restarted while the call was in flight, reuses its task
+    instead of paying for it again; the calls answered before the restart
+    are replayed from the log of the discussion, see `DiscussionJournal`.
+    """
+
+    queue: Any
+    namespace: str = ""
+    poll_interval: float = 0.2
+    timeout: Optional[float] = None
+    _counts: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "queue"
+
+    @property
+    def _identifying_params(self) -> Mapping[str, Any]:
+        return {"namespace": self.namespace}
+
+    def task_id(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+        """
+        Computes the id of the task of a call, counting the call for the
+        current request.
+
+        :param prompt: the text of a prompt
+        :param stop: the stop sequences of the call
+        :return: the id of the task
+        """
+        request = current_request()
+        key = json.dumps(
+            [
+                self.namespace,
+                request.agent_id if request else None,
+                request.kind if request else None,
+                list(request.argument_ids) if request else [],
+                request.attempt if request else 0,
+            ],
+            ensure_ascii=False,
+        )
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        payload = json.dumps([key, count, prompt, stop], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+    ) -> LLMResult:
+        request = current_request()
+        task_ids = []
+        for prompt in prompts:
+            task_id = self.task_id(prompt, stop)
+            self.queue.put(
+                task_id,
+                {
+                    "prompt": prompt,
+                    "stop": stop,
+                    "agent_id": request.agent_id if request else None,
+                    "kind": request.kind if request else None,
+                },
+            )
+            task_ids.append(task_id)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        deadline = None if self.timeout is None else time.time() + self.timeout
+        while True:
+            for task_id in task_ids:
+                if task_id not in results:
+                    result = self.queue.result(task_id)
+                    if result is not None:
+                        results[task_id] = result
+                        self.queue.discard(task_id)
+            if len(results) == len(task_ids):
+                break
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError(f"No worker answered within {self.timeout} seconds")
+            time.sleep(self.poll_interval)
+
+        generations = []
+        token_usage: Dict[str, int] = {}
+        for task_id in task_ids:
+            result = results[task_id]
+            if "error" in result:
+                raise TaskFailedError(result["error"])
+            generations.append([Generation(text=result["text"])])
+            usage = (result.get("llm_output") or {}).get("token_usage") or {}
+            for key, value in usage.items():
+                if isinstance(value, int):
+                    token_usage[key] = token_usage.get(key, 0) + value
+        return LLMResult(
+            generations=generations,
+            llm_output={"token_usage": token_usage} if token_usage else None,
+        )
+
+    async def _agenerate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+    ) -> LLMResult:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._generate, prompts, stop)
+
+
+class Worker:
+    """Leases the tasks of a work queue and answers them with a language model.
+
+    Start one or more workers per host, each with its own language model
+    client; they stop when told to, after a number of tasks, or after the
+    queue has been empty for a while.
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        llm,
+        worker_id: Optional[str] = None,
+        max_concurrency: int = 4,
+        poll_interval: float = 1.0,
+        heartbeat: Optional[float] = None,
+    ):
+        """
+        :param queue: the work queue
+        :param llm: the language model or chat model answering the prompts
+        :param worker_id: the id of the worker, default is made of the host name and a random suffix
+        :param max_concurrency: the number of tasks run at once
+        :param poll_interval: the seconds to wait before looking again at an empty queue
+        :param heartbeat: the seconds between the renewals of a lease, default is a third of the lease time
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.queue = queue
+        self.llm = llm
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.heartbeat = (
+            heartbeat
+            if heartbeat is not None
+            else getattr(queue, "lease_seconds", 60.0) / 3
+        )
+        self.completed = 0
+        self.failed = 0
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._remaining: Optional[int] = None
+
+    def stop(self):
+        """Makes `run` return once the running tasks are answered."""
+        self._stopped.set()
+
+    def execute(self, task: Task) -> Dict[str, Any]:
+        """
+        Runs a task.
+
+        :param task: the leased task
+        :return: the text of the answer and the output of the language model
+        """
+        payload = task.payload
+        result = self.llm.generate_prompt(
+            [StringPromptValue(text=payload["prompt"])], stop=payload.get("stop")
+        )
+        return {"text": result.generations[0][0].text, "llm_output": result.llm_output}
+
+    def _claim(self) -> bool:
+        with self._lock:
+            if self._remaining is None:
+                return True
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            if self._remaining is not None:
+                self._remaining += 1
+
+    def _process(self, task: Task):
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.heartbeat):
+                self.queue.renew(task)
+
+        renewer = threading.Thread(target=renew, daemon=True)
+        renewer.start()
+        try:
+            result = self.execute(task)
+        except Exception as e:
+            error = repr(e)
+        else:
+            error = None
+        finally:
+            # the lease is not renewed once the task is answered
+            done.set()
+            renewer.join()
+
+        if error is not None:
+            self.queue.fail(task, error)
+            with self._lock:
+                self.failed += 1
+        else:
+            self.queue.complete(task, result)
+            with self._lock:
+                self.completed += 1
+
+    def _loop(self, idle_timeout: Optional[float]):
+        idle_since = time.time()
+        while not self._stopped.is_set() and self._claim():
+            task = self.queue.lease(self.worker_id)
+            if task is None:
+                self._release()
+                if idle_timeout is not None and time.time() - idle_since > idle_timeout:
+                    return
+                self._stopped.wait(self.poll_interval)
+                continue
+            self._process(task)
+            idle_since = time.time()
+
+    def run(
+        self, max_tasks: Optional[int] = None, idle_timeout: Optional[float] = None
+    ) -> int:
+        """
+        Answers tasks until `stop` is called, `max_tasks` tasks are leased, or
+        the queue has been empty for `idle_timeout` seconds.
+
+        :param max_tasks: the maximum number of tasks, or None for no limit
+        :param idle_timeout: the seconds without a task after which the worker stops, or None to wait forever
+        :return: the number of tasks answered or failed by this call
+        """
+        self._stopped.clear()
+        self._remaining = max_tasks
+        before = self.completed + self.failed
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for future in [
+                pool.submit(self._loop, idle_timeout)
+                for _ in range(self.max_concurrency)
+            ]:
+                future.result()
+        return self.completed + self.failed - before
+
+
+class DistributedSweepRunner(SweepRunner):
+    """Runs the discussions of a sweep on a coordinator whose language model
+    calls are answered by the workers of a work queue.
+
+    The coordinator runs the execution policies, which decide which argument
+    and vote requests are made next; with an executor or concurrent voting,
+    a policy makes several requests at once, which different workers answer.
+    Every run is checkpointed to its own log in `journal_dir`, see
+    `DiscussionJournal`, so a restarted coordinator resumes its runs from
+    their last answered request, and tasks are idempotent, so the requests
+    in flight are not paid for twice.
+    """
+
+    def __init__(
+        self,
+        queue: WorkQueue,
+        checkpoint_path: str,
+        journal_dir: Optional[str] = None,
+        max_workers: int = 32,
+        poll_interval: float = 0.2,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ):
+        """
+        :param queue: the work queue of the workers
+        :param checkpoint_path: the JSON lines file the results are appended to
+        :param journal_dir: the directory of the logs of the runs, default is next to the checkpoint file
+        :param max_workers: the number of discussions run at once on the coordinator
+        :param poll_interval: the seconds between two looks at the results of pending calls
+        :param timeout: the seconds a call waits for its result, or None to wait forever
+        :param kwargs: the other arguments of `SweepRunner`
+        """
+        llm = QueueLLM(queue=queue, poll_interval=poll_interval, timeout=timeout)
+        super().__init__(
+            llm,
+            checkpoint_path,
+            max_workers=max_workers,
+            journal_dir=journal_dir or checkpoint_path + ".journals",
+            **kwargs,
+        )
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def model(self, spec: DiscussionSpec) -> QueueLLM:
+        """
+        :param spec: the parameters of a discussion
+        :return: a QueueLLM whose tasks are those of the run of the spec only
+        """
+        return QueueLLM(
+            queue=self.queue,
+            namespace=spec.run_id,
+            poll_interval=self.poll_interval,
+            timeout=self.timeout,
+        )
@@ -0,0 +1,110 @@
+"""This module provides the events streamed by the execution policies while a
+discussion is running"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, TypeVar
+
+if TYPE_CHECKING:
+    from todf.argument import Argument
+
+ARGUMENTATION = "argumentation"
+VOTING = "voting"
+
+T = TypeVar("T")
+
+
+class DiscussionEvent:
+    """Base class of all discussion events."""
+
+
+@dataclass(frozen=True)
+class PhaseChanged(DiscussionEvent):
+    """A new phase of the discussion has started.
+
+    Attributes:
+    phase (str): ARGUMENTATION or VOTING.
+    """
+
+    phase: str
+
+
+@dataclass(frozen=True)
+class ArgumentCreated(DiscussionEvent):
+    """An agent has added an argument to the discussion.
+
+    Attributes:
+    argument (Argument): The new argument; its creator is the agent.
+    target (Argument): The argument it supports or opposes.
+    """
+
+    argument: Argument
+    target: Argument
+
+
+@dataclass(frozen=True)
+class ArgumentMerged(DiscussionEvent):
+    """An agent has made an argument that duplicates an existing one, which
+    now supports or opposes the target in its place, see `TODF.add_argument`.
+
+    Attributes:
+    argument (Argument): The existing argument.
+    target (Argument): The argument it now supports or opposes.
+    duplicate (Argument): The new argument, which is not added to the discussion.
+    """
+
+    argument: Argument
+    target: Argument
+    duplicate: Argument
+
+
+@dataclass(frozen=True)
+class VoteCast(DiscussionEvent):
+    """An agent has labelled an argument.
+
+    Attributes:
+    agent_id (str): The id of the voting agent.
+    argument_id (str): The id of the labelled argument.
+    label (int): 1 for 'yes', -1 for 'no', and 0 for 'undecided'.
+    """
+
+    agent_id: str
+    argument_id: str
+    label: int
+
+
+@dataclass(frozen=True)
+class ConsensusUpdated(DiscussionEvent):
+    """The support label of the discussion target has changed.
+
+    Attributes:
+    label (int): The new consensus value (-1, 0, or 1).
+    """
+
+    label: int
+
+
+_DONE = object()
+
+
+async def aiterate(events: Iterator[T]) -> AsyncIterator[T]:
+    """
+    Iterates over a blocking iterator from asyncio code, advancing it in the
+    default executor so the event loop is not blocked by LLM calls.
+
+    :param events: a blocking iterator, e.g. `Discussion.stream()`
+    :return: an async iterator over the same items
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            event = await loop.run_in_executor(None, next, events, _DONE)
+            if event is _DONE:
+                return
+            yield event
+    finally:
+        close = getattr(events, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,563 @@
+"""This module provides writers and loaders of discussions: GraphML files, JSON
+lines files with one discussion per line, and a Parquet dataset with tables of
+arguments, edges and votes that many discussions can be appended to"""
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import uuid
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+from todf.argument import Argument
+from todf.scoring import MISSING
+
+if TYPE_CHECKING:
+    from todf.todf import TODF
+
+EDGE_TYPES = {1: ("supports", "green"), -1: ("opposes", "red")}
+
+GRAPHML_HEADER = """<?xml version='1.0' encoding='utf-8'?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">
+  <key id="d0" for="node" attr.name="author" attr.type="string" />
+  <key id="d1" for="node" attr.name="text" attr.type="string" />
+  <key id="d2" for="edge" attr.name="type" attr.type="string" />
+  <key id="d3" for="edge" attr.name="color" attr.type="string" />
+  <graph edgedefault="directed">
+"""
+
+GRAPHML_FOOTER = """  </graph>
+</graphml>
+"""
+
+
+def iter_edges(framework: TODF) -> Iterator[tuple]:
+    """
+    Iterates over the edges of a discussion, from the responding argument to
+    the argument it responds to.
+
+    :param framework: (TODF) The discussion framework.
+    :return: (Iterator[tuple]) (child id, parent id, sign) triples, the sign is 1 for
+             support and -1 for opposition.
+    """
+    store = framework.arguments
+    for argument in store:
+        for child_id in argument.supported_by:
+            yield child_id, argument.id, 1
+        for child_id in argument.opposed_by:
+            yield child_id, argument.id, -1
+
+
+def to_networkx(framework: TODF):
+    """
+    Builds the graph of a discussion.
+
+    :param framework: (TODF) The discussion framework.
+    :return: (nx.DiGraph) A graph with a node per argument id, with author and text
+             attributes, and an edge from every argument to the one it responds to.
+    """
+    import networkx as nx
+
+    G = nx.DiGraph()
+    G.add_nodes_from(
+        (argument.id, {"author": argument.creator, "text": argument.text})
+        for argument in framework.arguments
+    )
+    G.add_edges_from(
+        (child_id, parent_id, {"type": EDGE_TYPES[sign][0], "color": EDGE_TYPES[sign][1]})
+        for child_id, parent_id, sign in iter_edges(framework)
+    )
+    return G
+
+
+def write_graphml(framework: TODF, path: str):
+    """
+    Writes the graph of a discussion, see `to_networkx`, to a GraphML file
+    without building it in memory first.
+
+    :param framework: (TODF) The discussion framework.
+    :param path: (str) The path of the file.
+    """
+    store = framework.arguments
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(GRAPHML_HEADER)
+        for argument in store:
+            f.write(f"    <node id={quoteattr(argument.id)}>\n")
+            if argument.creator is not None:
+                f.write(f'      <data key="d0">{escape(argument.creator)}</data>\n')
+            f.write(f'      <data key="d1">{escape(argument.text)}</data>\n')
+            f.write("    </node>\n")
+        # ids that are responded to by an argument but were never added; the
+        # ids of merged duplicates have a slot but no edges
+        _, children, _ = store.edge_arrays()
+        for slot in np.unique(children):
+            if store.records[slot] is None:
+                f.write(f"    <node id={quoteattr(store.ids[slot])} />\n")
+        for child_id, parent_id, sign in iter_edges(framework):
+            edge_type, color = EDGE_TYPES[sign]
+            f.write(
+                f"    <edge source={quoteattr(child_id)} target={quoteattr(parent_id)}>\n"
+                f'      <data key="d2">{edge_type}</data>\n'
+                f'      <data key="d3">{color}</data>\n'
+                "    </edge>\n"
+            )
+        f.write(GRAPHML_FOOTER)
+
+
+def discussion_record(framework: TODF) -> Dict[str, Any]:
+    """
+    Describes a discussion as a JSON serializable dict.
+
+    :param framework: (TODF) The discussion framework.
+    :return: (Dict[str, Any]) The consensus, and the arguments in order with their
+             supporters, opposers and labelling.
+    """
+    return {
+        "consensus": framework.consensus_engine.support_label(framework.target.id),
+        "arguments": [
+            {
+                "id": argument.id,
+                "text": argument.text,
+                "creator": argument.creator,
+                "is_target": argument.is_target,
+                "supported_by": list(argument.supported_by),
+                "opposed_by": list(argument.opposed_by),
+                "labelling": dict(argument.labelling),
+            }
+            for argument in framework.arguments
+        ],
+    }
+
+
+def build_framework(arguments: List[Dict[str, Any]]) -> TODF:
+    """
+    Rebuilds a discussion framework from the arguments of a `discussion_record`.
+    The framework has no agents.
+
+    :param arguments: (List[Dict[str, Any]]) The arguments, the target first.
+    :return: (TODF) The discussion framework.
+    """
+    from todf.todf import TODF
+
+    built = []
+    for fields in arguments:
+        argument = Argument(
+            id=fields["id"],
+            text=fields["text"],
+            creator=fields.get("creator"),
+            is_target=fields.get("is_target", not built),
+        )
+        argument.supported_by = fields.get("supported_by", [])
+        argument.opposed_by = fields.get("opposed_by", [])
+        argument.labelling = fields.get("labelling", {})
+        built.append(argument)
+
+    framework = TODF(target=built[0], agents=[])
+    framework.arguments.extend(built[1:])
+    return framework
+
+
+class LazyDiscussion:
+    """A stored discussion whose framework is only rebuilt when it is used.
+
+    Attributes:
+    discussion_id (str): The id the discussion was written with.
+    metadata (Dict[str, Any]): The metadata written with it.
+    """
+
+    def __init__(
+        self,
+        discussion_id: str,
+        load: Callable[[], List[Dict[str, Any]]],
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        :param discussion_id: (str) The id of the discussion.
+        :param load: (Callable) Returns the arguments of the discussion, see `build_framework`.
+        :param metadata: (Dict[str, Any], optional) The metadata of the discussion.
+        """
+        self.discussion_id = discussion_id
+        self.metadata = metadata or {}
+        self._load = load
+        self._framework: Optional[TODF] = None
+
+    def __repr__(self):
+        return f"LazyDiscussion({self.discussion_id!r})"
+
+    @property
+    def framework(self) -> TODF:
+        """The discussion framework, rebuilt on first access."""
+        if self._framework is None:
+            self._framework = build_framework(self._load())
+        return self._framework
+
+    def consensus(self) -> int:
+        """
+        :return: (int) The consensus value (-1, 0, or 1) of the discussion.
+        """
+        framework = self.framework
+        return framework.consensus_engine.support_label(framework.target.id)
+
+
+class JSONLinesWriter:
+    """Appends discussions to a JSON lines file, one `discussion_record` per
+    line, so a corpus is written one discussion at a time."""
+
+    def __init__(self, path: str):
+        """
+        :param path: (str) The path of the file; discussions are appended to it.
+        """
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(
+        self, framework: TODF, discussion_id: Optional[str] = None, **metadata
+    ) -> str:
+        """
+        Appends a discussion.
+
+        :param framework: (TODF) The discussion framework.
+        :param discussion_id: (str, optional) The id of the discussion. Default is a new random id.
+        :param metadata: JSON serializable values stored with the discussion.
+        :return: (str) The id of the discussion.
+        """
+        discussion_id = discussion_id or uuid.uuid4().hex
+        record = {"discussion_id": discussion_id, "metadata": metadata}
+        record.update(discussion_record(framework))
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        return discussion_id
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_jsonl(path: str) -> Iterator[LazyDiscussion]:
+    """
+    Reads the discussions of a JSON lines file written by `JSONLinesWriter`.
+
+    :param path: (str) The path of the file.
+    :return: (Iterator[LazyDiscussion]) The discussions, in the order they were written.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            arguments = record["arguments"]
+            yield LazyDiscussion(
+                record.get("discussion_id", ""),
+                lambda arguments=arguments: arguments,
+                record.get("metadata"),
+            )
+
+
+TABLES = ("arguments", "edges", "votes")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Writing and reading Parquet datasets requires pyarrow, "
+            "install it with `pipenv install pyarrow`"
+        ) from e
+    return pyarrow
+
+
+def _schemas(pa) -> Dict[str, Any]:
+    return {
+        "arguments": pa.schema(
+            [
+                ("discussion_id", pa.string()),
+                ("position", pa.int32()),
+                ("id", pa.string()),
+                ("text", pa.string()),
+                ("creator", pa.string()),
+                ("is_target", pa.bool_()),
+            ]
+        ),
+        "edges": pa.schema(
+            [
+                ("discussion_id", pa.string()),
+                ("parent", pa.string()),
+                ("child", pa.string()),
+                ("sign", pa.int8()),
+            ]
+        ),
+        "votes": pa.schema(
+            [
+                ("discussion_id", pa.string()),
+                ("argument_id", pa.string()),
+                ("agent_id", pa.string()),
+                ("label", pa.int8()),
+            ]
+        ),
+    }
+
+
+class ParquetWriter:
+    """Appends discussions to a Parquet dataset: a directory with an
+    `arguments`, an `edges` and a `votes` table, each a directory of Parquet
+    files. Every writer adds its own file to each table, so a dataset can be
+    extended by many writers and sweeps.
+
+    The columns are taken from the arrays of the `ArgumentStore` and buffered
+    until `row_group_size` rows are collected. Requires pyarrow.
+    """
+
+    def __init__(self, path: str, row_group_size: int = 65536):
+        """
+        :param path: (str) The directory of the dataset; it is created if needed.
+        :param row_group_size: (int) The number of argument rows buffered before a row group is written.
+        """
+        self.pa = _pyarrow()
+        self.path = path
+        self.row_group_size = row_group_size
+        self.schemas = _schemas(self.pa)
+
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        self._writers = {}
+        for table in TABLES:
+            os.makedirs(os.path.join(path, table), exist_ok=True)
+            self._writers[table] = self.pa.parquet.ParquetWriter(
+                os.path.join(path, table, name), self.schemas[table]
+            )
+        self._buffers: Dict[str, List[Any]] = {table: [] for table in TABLES}
+        self._rows = 0
+
+    def write(self, framework: TODF, discussion_id: Optional[str] = None) -> str:
+        """
+        Appends a discussion.
+
+        :param framework: (TODF) The discussion framework.
+        :param discussion_id: (str, optional) The id of the discussion. Default is a new random id.
+        :return: (str) The id of the discussion.
+        """
+        pa = self.pa
+        discussion_id = discussion_id or uuid.uuid4().hex
+        store = framework.arguments
+        ids = np.array(store.ids, dtype=object)
+        order = np.frombuffer(store.order, dtype=np.int32)
+
+        records = [store.records[slot] for slot in order]
+        count = len(order)
+        self._buffers["arguments"].append(
+            pa.record_batch(
+                [
+                    pa.array([discussion_id] * count, pa.string()),
+                    pa.array(np.arange(count, dtype=np.int32)),
+                    pa.array(ids[order], pa.string()),
+                    pa.array([argument.text for argument in records], pa.string()),
+                    pa.array([argument.creator for argument in records], pa.string()),
+                    pa.array([argument.is_target for argument in records], pa.bool_()),
+                ],
+                schema=self.schemas["arguments"],
+            )
+        )
+
+        parents, children, signs = store.edge_arrays()
+        self._buffers["edges"].append(
+            pa.record_batch(
+                [
+                    pa.array([discussion_id] * len(parents), pa.string()),
+                    pa.array(ids[parents], pa.string()),
+                    pa.array(ids[children], pa.string()),
+                    pa.array(signs),
+                ],
+                schema=self.schemas["edges"],
+            )
+        )
+
+        votes = store.votes
+        agents, slots = np.nonzero(votes != MISSING)
+        self._buffers["votes"].append(
+            pa.record_batch(
+                [
+                    pa.array([discussion_id] * len(slots), pa.string()),
+                    pa.array(ids[slots], pa.string()),
+                    pa.array(np.array(store.agent_ids, dtype=object)[agents], pa.string()),
+                    pa.array(votes[agents, slots]),
+                ],
+                schema=self.schemas["votes"],
+            )
+        )
+
+        self._rows += count
+        if self._rows >= self.row_group_size:
+            self.flush()
+        return discussion_id
+
+    def flush(self):
+        """Writes the buffered discussions."""
+        for table in TABLES:
+            if self._buffers[table]:
+                self._writers[table].write_table(
+                    self.pa.Table.from_batches(
+                        self._buffers[table], schema=self.schemas[table]
+                    )
+                )
+                self._buffers[table] = []
+        self._rows = 0
+
+    def close(self):
+        self.flush()
+        for writer in self._writers.values():
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ParquetCorpus:
+    """Reads a Parquet dataset written by `ParquetWriter`.
+
+    The tables are exposed as `pyarrow.dataset.Dataset`s for columnar scans;
+    single discussions are rebuilt lazily. Requires pyarrow.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: (str) The directory of the dataset.
+        """
+        self.pa = _pyarrow()
+        import pyarrow.dataset
+
+        self.path = path
+        schemas = _schemas(self.pa)
+        self.arguments, self.edges, self.votes = (
+            pyarrow.dataset.dataset(
+                os.path.join(path, table), schema=schemas[table], format="parquet"
+            )
+            for table in TABLES
+        )
+
+    def discussion_ids(self) -> List[str]:
+        """
+        :return: (List[str]) The ids of the discussions in the dataset.
+        """
+        column = self.arguments.to_table(columns=["discussion_id"]).column(0)
+        return self.pa.compute.unique(column).to_pylist()
+
+    def discussion(self, discussion_id: str) -> LazyDiscussion:
+        """
+        :param discussion_id: (str) The id of a discussion.
+        :return: (LazyDiscussion) The discussion, read from the dataset when it is used.
+        """
+        import pyarrow.dataset
+
+        condition = pyarrow.dataset.field("discussion_id") == discussion_id
+        return LazyDiscussion(
+            discussion_id,
+            lambda: _arguments_from_tables(
+                self.arguments.to_table(filter=condition),
+                self.edges.to_table(filter=condition),
+                self.votes.to_table(filter=condition),
+            ),
+        )
+
+    def __iter__(self) -> Iterator[LazyDiscussion]:
+        """
+        Streams the tables one file and record batch at a time and yields
+        every discussion, rebuilt lazily from its rows, in the order the
+        discussions were written. Only the rows of one discussion are held
+        at a time; the rows keep their file order and the arguments their
+        ``position``.
+        """
+        schemas = _schemas(self.pa)
+        files = [
+            {os.path.basename(fragment.path): fragment for fragment in dataset.get_fragments()}
+            for dataset in (self.arguments, self.edges, self.votes)
+        ]
+        for name, fragment in files[0].items():
+            others = [
+                (_discussion_rows(self.pa, table.get(name)), schemas[key], [])
+                for table, key in zip(files[1:], TABLES[1:])
+            ]
+            for discussion_id, arguments in _discussion_rows(self.pa, fragment):
+                slices = [arguments]
+                for rows, schema, pending in others:
+                    slices.append(_take_rows(rows, pending, discussion_id, schema))
+                yield LazyDiscussion(
+                    discussion_id,
+                    lambda slices=slices: _arguments_from_tables(*slices),
+                )
+
+
+def _discussion_rows(pa, fragment) -> Iterator[tuple]:
+    """Yields the id and rows of each run of rows of one discussion in a file."""
+    if fragment is None:
+        return
+    current, batches = None, []
+    for batch in fragment.to_batches():
+        values = batch.column("discussion_id").to_pylist()
+        start = 0
+        for i in range(1, len(values) + 1):
+            if i == len(values) or values[i] != values[start]:
+                if values[start] != current and batches:
+                    yield current, pa.Table.from_batches(batches)
+                    batches = []
+                current = values[start]
+                batches.append(batch.slice(start, i - start))
+                start = i
+    if batches:
+        yield current, pa.Table.from_batches(batches)
+
+
+def _take_rows(rows: Iterator[tuple], pending: List[tuple], discussion_id: str, schema):
+    # The tables of a file list the discussions in the same order, but a
+    # discussion without edges or votes has no rows in those tables.
+    if not pending:
+        pending.extend(itertools.islice(rows, 1))
+    if pending and pending[0][0] == discussion_id:
+        return pending.pop()[1]
+    return schema.empty_table()
+
+
+def _arguments_from_tables(arguments, edges, votes) -> List[Dict[str, Any]]:
+    rows = sorted(arguments.to_pylist(), key=lambda row: row["position"])
+    fields = {
+        row["id"]: {
+            "id": row["id"],
+            "text": row["text"],
+            "creator": row["creator"],
+            "is_target": row["is_target"],
+            "supported_by": [],
+            "opposed_by": [],
+            "labelling": {},
+        }
+        for row in rows
+    }
+    for edge in edges.to_pylist():
+        parent = fields.get(edge["parent"])
+        if parent is not None:
+            key = "supported_by" if edge["sign"] > 0 else "opposed_by"
+            parent[key].append(edge["child"])
+    for vote in votes.to_pylist():
+        argument = fields.get(vote["argument_id"])
+        if argument is not None:
+            argument["labelling"][vote["agent_id"]] = vote["label"]
+    return [fields[row["id"]] for row in rows]
@@ -0,0 +1,141 @@
+"""This module provides a fake language model that answers the prompts of the
+agents offline, with simulated latency and failures, for examples,
+benchmarks and debugging"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from langchain.callbacks.manager import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain.llms.base import LLM
+from pydantic import PrivateAttr
+
+STANCES = ("support", "oppose", "pass")
+LABELS = ("YES", "NO", "UNDECIDED")
+
+
+class FakeLLMError(RuntimeError):
+    """Raised by a FakeLLM call that is chosen to fail."""
+
+
+class FakeLLM(LLM):
+    """A language model that answers the argument, voting and batch voting
+    prompts of `AgentEngine` without calling a real model.
+
+    Answers are drawn from a generator seeded with the seed and the prompt,
+    so the same prompt always gets the same answer, whatever the order of the
+    calls. Scripted responses, if any, are returned first, in order. Any
+    other prompt, e.g. a summary, gets a short placeholder text.
+
+    Attributes:
+    calls (int): The number of calls, including the failed ones.
+    failures (int): The number of calls that raised a FakeLLMError.
+    """
+
+    seed: int = 0
+    latency: float = 0.0
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    responses: List[str] = []
+    stance_weights: Tuple[float, float, float] = (0.4, 0.4, 0.2)
+    label_weights: Tuple[float, float, float] = (0.45, 0.45, 0.1)
+    calls: int = 0
+    failures: int = 0
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _rng: random.Random = PrivateAttr()
+    _script: List[str] = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        """
+        :param seed: the seed of the answers, failures and latencies
+        :param latency: the seconds every call takes
+        :param jitter: the maximum number of seconds added at random to the latency
+        :param failure_rate: the probability that a call raises a FakeLLMError
+        :param responses: scripted responses returned by the first calls
+        :param stance_weights: the weights of the [support], [oppose] and [pass] answers
+        :param label_weights: the weights of the YES, NO and UNDECIDED answers
+        """
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+        self._script = list(reversed(self.responses))
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> Mapping[str, Any]:
+        return {"seed": self.seed}
+
+    def _begin(self) -> Tuple[float, Optional[str]]:
+        """
+        Counts a call and draws its latency, failure and scripted response.
+
+        :return: the seconds the call takes and its scripted response, if any
+        :raises FakeLLMError: if the call fails
+        """
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            if self._rng.random() < self.failure_rate:
+                self.failures += 1
+                raise FakeLLMError(f"Simulated failure of call {self.calls}")
+            scripted = self._script.pop() if self._script else None
+        return delay, scripted
+
+    def answer(self, prompt: str) -> str:
+        """
+        The seeded answer to a prompt.
+
+        :param prompt: the text of the prompt
+        :return: the answer
+        """
+        rng = random.Random(f"{self.seed}\n{prompt}")
+        if "Final Answer:" in prompt:
+            stance = rng.choices(STANCES, weights=self.stance_weights)[0]
+            if stance == "pass":
+                return "Final Answer: [pass]"
+            return f"Final Answer: [{stance}] Argument {rng.getrandbits(32):08x}."
+        if "numbered arguments" in prompt:
+            count = len(re.findall(r"^\s*\d+\. ", prompt, re.MULTILINE))
+            labels = rng.choices(LABELS, weights=self.label_weights, k=count)
+            return "\n".join(
+                f"{i}. {label}" for i, label in enumerate(labels, start=1)
+            )
+        if "YES, NO or UNDECIDED" in prompt:
+            return rng.choices(LABELS, weights=self.label_weights)[0]
+        return f"Summary {rng.getrandbits(32):08x}."
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+    ) -> str:
+        delay, scripted = self._begin()
+        if delay:
+            time.sleep(delay)
+        return scripted if scripted is not None else self.answer(prompt)
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+    ) -> str:
+        delay, scripted = self._begin()
+        if delay:
+            await asyncio.sleep(delay)
+        return scripted if scripted is not None else self.answer(prompt)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: the numbers of calls and failures so far
+        """
+        return {"calls": self.calls, "failures": self.failures}
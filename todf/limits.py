@@ -0,0 +1,300 @@
+"""This module provides a request rate limiter and a token budget shared by
+language model calls, a language model wrapper that enforces them, and a
+callback handler that caps the calls and tokens of a discussion"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.callbacks.manager import Callbacks
+from langchain.schema import LLMResult, PromptValue
+from pydantic import PrivateAttr
+
+from todf.llm import LLMWrapper
+from todf.tokens import count_tokens
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised when a call is made after the token budget has been spent."""
+
+
+class TokenBudget:
+    """A number of tokens that the calls sharing it may spend in total.
+
+    A call is refused once the budget is spent; the call that spends the last
+    tokens may overshoot it, as its length is only known afterwards.
+    """
+
+    def __init__(self, max_tokens: int):
+        """
+        :param max_tokens: the number of tokens that may be spent
+        """
+        self.max_tokens = max_tokens
+        self.used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        return max(self.max_tokens - self.used, 0)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.used >= self.max_tokens
+
+    def check(self):
+        """
+        :raises BudgetExceededError: if the budget has been spent
+        """
+        if self.exhausted:
+            raise BudgetExceededError(
+                f"The token budget of {self.max_tokens} tokens has been spent"
+            )
+
+    def charge(self, tokens: int):
+        """
+        :param tokens: the number of tokens a call has spent
+        """
+        with self._lock:
+            self.used += tokens
+
+
+class RateLimiter:
+    """A token bucket that spaces out requests to at most
+    ``requests_per_minute``, allowing bursts of up to ``burst`` requests.
+
+    Waiting requests are served in the order they arrived.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        """
+        :param requests_per_minute: the sustained number of requests per minute
+        :param burst: the number of requests that may be made at once after an idle period
+        """
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # the request takes its token now, so the bucket may go into debt
+            # that later requests have to wait out
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self):
+        """Blocks until a request may be made."""
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self):
+        """Waits without blocking the event loop until a request may be made."""
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class CallBudget(BaseCallbackHandler):
+    """Counts the language model calls reported to it as a callback handler,
+    and the tokens of their prompts and responses, against optional caps.
+
+    The tokens are counted from the texts rather than taken from the usage
+    reported by the model, so responses served by a `CachedLLM` count the
+    same as fresh ones and a cached rerun stops at the same point.
+
+    Attributes:
+    calls (int): The number of calls so far.
+    tokens (int): The number of tokens so far.
+    """
+
+    def __init__(
+        self, max_calls: Optional[int] = None, max_tokens: Optional[int] = None
+    ):
+        """
+        :param max_calls: the maximum number of calls, or None for no limit
+        :param max_tokens: the maximum number of tokens, or None for no limit
+        """
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining_calls(self) -> Optional[int]:
+        """The number of calls left, or None if they are not limited."""
+        if self.max_calls is None:
+            return None
+        return max(self.max_calls - self.calls, 0)
+
+    @property
+    def remaining_tokens(self) -> Optional[int]:
+        """The number of tokens left, or None if they are not limited."""
+        if self.max_tokens is None:
+            return None
+        return max(self.max_tokens - self.tokens, 0)
+
+    @property
+    def exhausted(self) -> bool:
+        """True once either cap has been reached."""
+        return (self.max_calls is not None and self.calls >= self.max_calls) or (
+            self.max_tokens is not None and self.tokens >= self.max_tokens
+        )
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any
+    ):
+        tokens = sum(count_tokens(prompt) for prompt in prompts)
+        with self._lock:
+            self.calls += len(prompts)
+            self.tokens += tokens
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any):
+        tokens = sum(
+            count_tokens(generation.text)
+            for generations in response.generations
+            for generation in generations
+        )
+        with self._lock:
+            self.tokens += tokens
+
+
+class RequestCost:
+    """The average number of calls and tokens of a kind of agent request, e.g.
+    an argument or a vote, measured on a CallBudget, to size the next batch
+    of requests so it fits into the caps of the budget.
+
+    A request may make several calls, e.g. when the agent uses tools. Until a
+    request has been measured, batches have a single request if a cap is set.
+    The sizes are estimates, so the caps are soft: a batch of requests that
+    cost more than the average may overshoot them.
+    """
+
+    def __init__(self, budget: CallBudget):
+        """
+        :param budget: the budget the calls of the requests are counted on
+        """
+        self.budget = budget
+        self.requests = 0
+        self.calls = 0
+        self.tokens = 0
+
+    @contextmanager
+    def measure(self, requests: int) -> Iterator[None]:
+        """
+        Attributes the calls and tokens counted in the block to requests.
+
+        :param requests: the number of requests made in the block
+        """
+        calls, tokens = self.budget.calls, self.budget.tokens
+        try:
+            yield
+        finally:
+            self.requests += requests
+            self.calls += self.budget.calls - calls
+            self.tokens += self.budget.tokens - tokens
+
+    def affordable(self, wanted: int) -> int:
+        """
+        :param wanted: the number of requests to be made
+        :return: how many of them fit into the remaining calls and tokens, at their average cost
+        """
+        count = wanted
+        for remaining, spent in (
+            (self.budget.remaining_calls, self.calls),
+            (self.budget.remaining_tokens, self.tokens),
+        ):
+            if remaining is None:
+                continue
+            if not self.requests:
+                count = min(count, 1 if remaining > 0 else 0)
+            elif spent > 0:
+                count = min(count, int(remaining * self.requests / spent))
+        return max(count, 0)
+
+
+def count_usage(prompts: List[PromptValue], result: LLMResult) -> int:
+    """
+    Counts the tokens of a call, as reported by the model if it reports them.
+
+    :param prompts: the prompts of the call
+    :param result: the result of the call
+    :return: the number of prompt and completion tokens
+    """
+    usage = (result.llm_output or {}).get("token_usage") or {}
+    if "total_tokens" in usage:
+        return usage["total_tokens"]
+    return sum(count_tokens(prompt.to_string()) for prompt in prompts) + sum(
+        count_tokens(generation.text)
+        for generations in result.generations
+        for generation in generations
+    )
+
+
+class LimitedLLM(LLMWrapper):
+    """Wraps a language model, waiting for the rate limiter before every call
+    and charging the tokens of every call to the token budget.
+
+    Attributes:
+    requests (int): The number of calls made through this wrapper.
+    tokens (int): The number of tokens they spent.
+    """
+
+    limiter: Optional[RateLimiter] = None
+    budget: Optional[TokenBudget] = None
+    requests: int = 0
+    tokens: int = 0
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _record(self, prompts: List[PromptValue], result: LLMResult):
+        tokens = count_usage(prompts, result)
+        with self._lock:
+            self.requests += 1
+            self.tokens += tokens
+        if self.budget is not None:
+            self.budget.charge(tokens)
+
+    def generate_prompt(
+        self,
+        prompts: List[PromptValue],
+        stop: Optional[List[str]] = None,
+        callbacks: Callbacks = None,
+    ) -> LLMResult:
+        if self.budget is not None:
+            self.budget.check()
+        if self.limiter is not None:
+            self.limiter.acquire()
+        result = self.llm.generate_prompt(prompts, stop=stop, callbacks=callbacks)
+        self._record(prompts, result)
+        return result
+
+    async def agenerate_prompt(
+        self,
+        prompts: List[PromptValue],
+        stop: Optional[List[str]] = None,
+        callbacks: Callbacks = None,
+    ) -> LLMResult:
+        if self.budget is not None:
+            self.budget.check()
+        if self.limiter is not None:
+            await self.limiter.aacquire()
+        result = await self.llm.agenerate_prompt(
+            prompts, stop=stop, callbacks=callbacks
+        )
+        self._record(prompts, result)
+        return result
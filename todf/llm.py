@@ -0,0 +1,60 @@
+"""This module provides a base class for language models that wrap another
+language model"""
+
+from typing import Any, List, Mapping, Optional, Sequence
+
+from langchain.base_language import BaseLanguageModel
+from langchain.callbacks.manager import Callbacks
+from langchain.prompts.base import StringPromptValue
+from langchain.prompts.chat import ChatPromptValue
+from langchain.schema import AIMessage, BaseMessage
+
+
+class LLMWrapper(BaseLanguageModel):
+    """An abstract class base for language models that forward prompts to a
+    wrapped language model or chat model.
+
+    Subclasses implement `generate_prompt` and `agenerate_prompt`; text and
+    message predictions go through `generate_prompt`.
+    """
+
+    llm: BaseLanguageModel
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def wrapped(self) -> BaseLanguageModel:
+        """The language model at the end of the chain of wrappers, whose
+        model name and temperature identify the responses."""
+        llm = self.llm
+        while isinstance(llm, LLMWrapper):
+            llm = llm.llm
+        return llm
+
+    @property
+    def _identifying_params(self) -> Mapping[str, Any]:
+        return getattr(self.wrapped, "_identifying_params", {})
+
+    def predict(self, text: str, *, stop: Optional[Sequence[str]] = None) -> str:
+        _stop = list(stop) if stop else None
+        result = self.generate_prompt([StringPromptValue(text=text)], stop=_stop)
+        return result.generations[0][0].text
+
+    def predict_messages(
+        self, messages: List[BaseMessage], *, stop: Optional[Sequence[str]] = None
+    ) -> BaseMessage:
+        _stop = list(stop) if stop else None
+        result = self.generate_prompt([ChatPromptValue(messages=messages)], stop=_stop)
+        return AIMessage(content=result.generations[0][0].text)
+
+    def __call__(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        callbacks: Callbacks = None,
+    ) -> str:
+        result = self.generate_prompt(
+            [StringPromptValue(text=prompt)], stop=stop, callbacks=callbacks
+        )
+        return result.generations[0][0].text
@@ -0,0 +1,185 @@
+"""This module provides a bounded, token-aware conversation memory, meant to
+be given to every agent on its own"""
+
+import re
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from todf.tokens import count_tokens
+
+SUMMARY_TEMPLATE = """Progressively summarize the lines of conversation provided, adding onto the previous summary and returning a new summary of at most {max_tokens} tokens.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+
+def word_overlap(query: str, text: str) -> float:
+    """
+    Scores how relevant a text is to a query by the share of the query's
+    words that appear in the text.
+
+    :param query: the text being answered
+    :param text: a history entry
+    :return: a score between 0 and 1
+    """
+    query_words = set(re.findall(r"\w+", query.lower()))
+    if not query_words:
+        return 0.0
+    return len(query_words & set(re.findall(r"\w+", text.lower()))) / len(
+        query_words
+    )
+
+
+class AgentMemory:
+    """Conversation memory of a single agent that keeps its history within a
+    token budget, so prompts do not grow with the length of the discussion.
+
+    The most recent turns are kept verbatim in a sliding window. Turns that
+    leave the window are folded into a rolling summary, if a summarization
+    model is given, and archived so that the ones relevant to the argument
+    being answered can be brought back into the prompt.
+
+    Implements the `load_memory_variables`/`save_context` interface of
+    LangChain memories used by `Agent`.
+    """
+
+    memory_key = "history"
+
+    def __init__(
+        self,
+        max_tokens: int = 500,
+        llm=None,
+        summary_tokens: int = 100,
+        relevant_tokens: int = 0,
+        max_archive: int = 200,
+        scorer: Callable[[str, str], float] = word_overlap,
+        human_prefix: str = "Human",
+        ai_prefix: str = "AI",
+        encoding: Optional[str] = None,
+    ):
+        """
+        :param max_tokens: the token budget of the whole history
+        :param llm: an optional language model that writes the rolling summary
+        :param summary_tokens: the length the summary is asked to stay within
+        :param relevant_tokens: the part of the budget reserved for archived
+                                turns relevant to the input, 0 to disable retrieval
+        :param max_archive: the number of old turns kept for retrieval
+        :param scorer: scores the relevance of a turn to the input, see `word_overlap`
+        :param human_prefix: the prefix of the input lines
+        :param ai_prefix: the prefix of the output lines
+        :param encoding: the tiktoken encoding used to count tokens
+        """
+        self.max_tokens = max_tokens
+        self.llm = llm
+        self.summary_tokens = summary_tokens
+        self.relevant_tokens = relevant_tokens
+        self.scorer = scorer
+        self.human_prefix = human_prefix
+        self.ai_prefix = ai_prefix
+        self.encoding = encoding
+
+        self.summary = ""
+        self.window: Deque[Tuple[str, int]] = deque()
+        self.archive: Deque[Tuple[str, int]] = deque(maxlen=max_archive)
+        self._window_tokens = 0
+        self._summary_tokens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def _summary_text(self) -> str:
+        return f"Summary of the earlier conversation: {self.summary}"
+
+    def _window_budget(self) -> int:
+        return self.max_tokens - self._summary_tokens - self.relevant_tokens
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Returns the history to put into the prompt for the given inputs.
+
+        :param inputs: the inputs of the prompt; their text is used to retrieve relevant turns
+        :return: a dict with the history under `memory_key`
+        """
+        query = " ".join(str(value) for value in inputs.values())
+        with self._lock:
+            lines = []
+            if self.summary:
+                lines.append(self._summary_text())
+            lines.extend(self._relevant(query))
+            lines.extend(turn for turn, _ in self.window)
+        return {self.memory_key: "\n".join(lines)}
+
+    def _relevant(self, query: str) -> List[str]:
+        if not self.relevant_tokens or not query or not self.archive:
+            return []
+        scores = [self.scorer(query, turn) for turn, _ in self.archive]
+        budget = self.relevant_tokens
+        chosen = []
+        for i in sorted(range(len(scores)), key=scores.__getitem__, reverse=True):
+            tokens = self.archive[i][1]
+            if scores[i] <= 0:
+                break
+            if tokens > budget:
+                continue
+            chosen.append(i)
+            budget -= tokens
+        # keep the retrieved turns in chronological order
+        return [self.archive[i][0] for i in sorted(chosen)]
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]):
+        """
+        Adds a turn to the history, moving the oldest turns out of the window
+        when it exceeds its budget.
+
+        :param inputs: the inputs of the prompt, with a single value
+        :param outputs: the outputs of the language model, with a single value
+        """
+        human = " ".join(str(value) for value in inputs.values())
+        ai = " ".join(str(value) for value in outputs.values())
+        turn = f"{self.human_prefix}: {human}\n{self.ai_prefix}: {ai}"
+        tokens = count_tokens(turn, self.encoding)
+
+        with self._lock:
+            self.window.append((turn, tokens))
+            self._window_tokens += tokens
+
+            evicted = self._evict()
+            while evicted and self.llm is not None:
+                self.summary = self.llm.predict(
+                    SUMMARY_TEMPLATE.format(
+                        max_tokens=self.summary_tokens,
+                        summary=self.summary,
+                        lines="\n".join(evicted),
+                    )
+                ).strip()
+                self._summary_tokens = count_tokens(
+                    self._summary_text(), self.encoding
+                )
+                # a longer summary leaves less room for the window
+                evicted = self._evict()
+
+    def _evict(self) -> List[str]:
+        evicted = []
+        while self.window and self._window_tokens > self._window_budget():
+            turn, tokens = self.window.popleft()
+            self._window_tokens -= tokens
+            self.archive.append((turn, tokens))
+            evicted.append(turn)
+        return evicted
+
+    def clear(self):
+        """Forgets the whole history."""
+        with self._lock:
+            self.summary = ""
+            self.window.clear()
+            self.archive.clear()
+            self._window_tokens = 0
+            self._summary_tokens = 0
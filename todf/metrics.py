@@ -0,0 +1,462 @@
+"""This module provides the instrumentation of discussions: a callback handler
+that records the wall time, queue time, tokens, cost and retries of every
+language model and tool call together with the agent, phase and arguments it
+was made for, and exports them as spans"""
+
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.schema import LLMResult
+
+from todf.concurrency import current_attempt
+from todf.events import ARGUMENTATION, VOTING, DiscussionEvent, PhaseChanged
+from todf.tokens import count_tokens
+
+SUMMARY = "summary"
+
+# the phase of each kind of request
+PHASES = {
+    "argument": ARGUMENTATION,
+    "vote": VOTING,
+    "votes": VOTING,
+    "summary": SUMMARY,
+}
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    """What an agent request is made for; see `request_scope`.
+
+    Attributes:
+    agent_id (Optional[str]): The id of the requesting agent, None for a summary.
+    kind (str): The kind of request, "argument", "vote", "votes" or "summary".
+    argument_ids (Tuple[str, ...]): The ids of the arguments of the request.
+    attempt (int): The attempt number of the request, 0 unless it is retried.
+    queued (float): The time.perf_counter() value at which the request was queued.
+    """
+
+    agent_id: Optional[str]
+    kind: str
+    argument_ids: Tuple[str, ...]
+    attempt: int
+    queued: float
+
+    @property
+    def phase(self) -> str:
+        return PHASES.get(self.kind, self.kind)
+
+
+_current_request: ContextVar[Optional[RequestContext]] = ContextVar(
+    "current_request", default=None
+)
+
+
+def current_request() -> Optional[RequestContext]:
+    """
+    :return: the request the calls of the current context are made for, if any
+    """
+    return _current_request.get()
+
+
+@contextmanager
+def request_scope(
+    agent_id: Optional[str], kind: str, argument_ids: Sequence[str]
+):
+    """
+    Marks the calls made in the block as made for a request, so the
+    `DiscussionMetrics` handler can attribute them.
+
+    :param agent_id: the id of the requesting agent, None for a summary
+    :param kind: the kind of request, "argument", "vote", "votes" or "summary"
+    :param argument_ids: the ids of the arguments of the request
+    """
+    attempt, queued = current_attempt.get()
+    token = _current_request.set(
+        RequestContext(
+            agent_id=agent_id,
+            kind=kind,
+            argument_ids=tuple(argument_ids),
+            attempt=attempt,
+            queued=time.perf_counter() if queued is None else queued,
+        )
+    )
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
+
+
+@dataclass(frozen=True)
+class CallRecord:
+    """A language model or tool call of a discussion.
+
+    Attributes:
+    kind (str): "llm" or "tool".
+    name (str): The name of the model or tool.
+    agent_id (Optional[str]): The id of the agent the call was made for.
+    phase (Optional[str]): ARGUMENTATION, VOTING or SUMMARY; None outside of requests.
+    argument_ids (Tuple[str, ...]): The ids of the arguments of the request.
+    start (float): The wall clock time at which the call started, in seconds since the epoch.
+    seconds (float): The duration of the call.
+    queue_seconds (float): The time between queueing the request and starting the call,
+        i.e. waiting for a worker, a rate limiter or the steps before it.
+    prompt_tokens (int): The tokens of the prompts, or of the tool input.
+    completion_tokens (int): The tokens of the completions, or of the tool output.
+    attempt (int): The attempt number of the request, 0 unless it was retried.
+    cached (bool): True if the response came from a response cache.
+    error (Optional[str]): The error of a failed call.
+    span_id (str): The id of the call.
+    """
+
+    kind: str
+    name: str
+    agent_id: Optional[str]
+    phase: Optional[str]
+    argument_ids: Tuple[str, ...]
+    start: float
+    seconds: float
+    queue_seconds: float
+    prompt_tokens: int
+    completion_tokens: int
+    attempt: int = 0
+    cached: bool = False
+    error: Optional[str] = None
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass(frozen=True)
+class PhaseRecord:
+    """A phase of a discussion, as announced by its PhaseChanged events.
+
+    Attributes:
+    phase (str): ARGUMENTATION, VOTING or SUMMARY.
+    start (float): The wall clock time at which the phase started.
+    seconds (float): The duration of the phase.
+    span_id (str): The id of the phase.
+    """
+
+    phase: str
+    start: float
+    seconds: float
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+
+
+class DiscussionMetrics(BaseCallbackHandler):
+    """Records the calls of a discussion as a callback handler of its agents
+    and of its summary, see `Discussion.metrics`.
+
+    Calls are attributed to the request of an agent by `request_scope`, so
+    concurrent requests are told apart. Tokens are counted from the texts,
+    so cached responses count the same as fresh ones and are flagged instead.
+
+    Attributes:
+    records (List[CallRecord]): The finished calls, in the order they finished.
+    phases (List[PhaseRecord]): The finished phases, in order.
+    """
+
+    def __init__(
+        self,
+        prompt_price: float = 0.0,
+        completion_price: float = 0.0,
+    ):
+        """
+        :param prompt_price: the cost of 1000 prompt tokens
+        :param completion_price: the cost of 1000 completion tokens
+        """
+        self.prompt_price = prompt_price
+        self.completion_price = completion_price
+        self.records: List[CallRecord] = []
+        self.phases: List[PhaseRecord] = []
+        self.trace_id = uuid.uuid4().hex
+        self._open: Dict[Any, Tuple] = {}
+        self._phase: Optional[Tuple[str, float, float]] = None
+        self._lock = threading.Lock()
+
+    # calls
+
+    def _start(self, run_id, kind: str, name: str, tokens: int):
+        self._open[run_id] = (
+            kind,
+            name,
+            tokens,
+            _current_request.get(),
+            time.time(),
+            time.perf_counter(),
+        )
+
+    def _end(self, run_id, completion_tokens: int, cached=False, error=None):
+        opened = self._open.pop(run_id, None)
+        if opened is None:
+            return
+        kind, name, prompt_tokens, request, start, started = opened
+        record = CallRecord(
+            kind=kind,
+            name=name,
+            agent_id=request.agent_id if request else None,
+            phase=request.phase if request else None,
+            argument_ids=request.argument_ids if request else (),
+            start=start,
+            seconds=time.perf_counter() - started,
+            queue_seconds=max(started - request.queued, 0.0) if request else 0.0,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            attempt=request.attempt if request else 0,
+            cached=cached,
+            error=error,
+        )
+        with self._lock:
+            self.records.append(record)
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], *, run_id, **kwargs: Any
+    ):
+        name = serialized.get("name") or serialized.get("id", ["llm"])[-1]
+        self._start(run_id, "llm", name, sum(map(count_tokens, prompts)))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs: Any):
+        name = serialized.get("name") or serialized.get("id", ["chat_model"])[-1]
+        tokens = sum(
+            count_tokens(message.content) for batch in messages for message in batch
+        )
+        self._start(run_id, "llm", name, tokens)
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs: Any):
+        tokens = sum(
+            count_tokens(generation.text)
+            for generations in response.generations
+            for generation in generations
+        )
+        cached = bool((response.llm_output or {}).get("cached"))
+        self._end(run_id, tokens, cached=cached)
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, 0, error=repr(error))
+
+    def on_tool_start(
+        self, serialized: Dict[str, Any], input_str: str, *, run_id, **kwargs: Any
+    ):
+        name = serialized.get("name", "tool")
+        self._start(run_id, "tool", name, count_tokens(input_str))
+
+    def on_tool_end(self, output: str, *, run_id, **kwargs: Any):
+        self._end(run_id, count_tokens(str(output)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any):
+        self._end(run_id, 0, error=repr(error))
+
+    # phases
+
+    def _close_phase(self):
+        if self._phase is not None:
+            phase, start, started = self._phase
+            self.phases.append(
+                PhaseRecord(phase, start, time.perf_counter() - started)
+            )
+            self._phase = None
+
+    def enter_phase(self, phase: Optional[str]):
+        """
+        Ends the current phase, if any, and starts a new one.
+
+        :param phase: the new phase, or None to only end the current one
+        """
+        self._close_phase()
+        if phase is not None:
+            self._phase = (phase, time.time(), time.perf_counter())
+
+    def observe(self, events: Iterator[DiscussionEvent]) -> Iterator[DiscussionEvent]:
+        """
+        Times the phases of a stream of discussion events.
+
+        :param events: the events of a discussion
+        :return: the same events
+        """
+        try:
+            for event in events:
+                if isinstance(event, PhaseChanged) and (
+                    self._phase is None or self._phase[0] != event.phase
+                ):
+                    self.enter_phase(event.phase)
+                yield event
+        finally:
+            self.enter_phase(None)
+
+    # reports
+
+    def cost(self, records: Optional[List[CallRecord]] = None) -> float:
+        """
+        :param records: the calls to price, default is all of them
+        :return: the cost of the tokens of the calls, see the prices; cached
+                 and failed calls cost nothing
+        """
+        records = self.records if records is None else records
+        return sum(
+            record.prompt_tokens * self.prompt_price / 1000
+            + record.completion_tokens * self.completion_price / 1000
+            for record in records
+            if not record.cached and record.error is None
+        )
+
+    def breakdown(self, by: str = "phase") -> Dict[Any, Dict[str, Any]]:
+        """
+        Aggregates the calls by a field of their records.
+
+        With ``by="phase"`` the time of a phase is its wall time, as concurrent
+        calls overlap; otherwise it is the total time of the calls. The share
+        is the fraction of the total time.
+
+        :param by: a field of CallRecord, e.g. "phase", "agent_id", "kind" or "name"
+        :return: for every value of the field, its calls, failed calls, retries,
+                 cached calls, seconds, share, queue seconds, tokens and cost
+        """
+        groups: Dict[Any, List[CallRecord]] = defaultdict(list)
+        for record in list(self.records):
+            groups[getattr(record, by)].append(record)
+
+        seconds: Dict[Any, float] = defaultdict(float)
+        if by == "phase":
+            for phase in self.phases:
+                seconds[phase.phase] += phase.seconds
+                groups.setdefault(phase.phase, [])
+        for key, records in groups.items():
+            if by != "phase" or key not in seconds:
+                seconds[key] = sum(record.seconds for record in records)
+        total = sum(seconds.values()) or 1.0
+
+        return {
+            key: {
+                "calls": len(records),
+                "errors": sum(record.error is not None for record in records),
+                "retries": sum(record.attempt > 0 for record in records),
+                "cached": sum(record.cached for record in records),
+                "seconds": seconds[key],
+                "share": seconds[key] / total,
+                "queue_seconds": sum(record.queue_seconds for record in records),
+                "prompt_tokens": sum(record.prompt_tokens for record in records),
+                "completion_tokens": sum(
+                    record.completion_tokens for record in records
+                ),
+                "cost": self.cost(records),
+            }
+            for key, records in groups.items()
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        :return: the totals of all calls, see `breakdown`
+        """
+        records = list(self.records)
+        return {
+            "calls": len(records),
+            "errors": sum(record.error is not None for record in records),
+            "retries": sum(record.attempt > 0 for record in records),
+            "cached": sum(record.cached for record in records),
+            "seconds": sum(phase.seconds for phase in self.phases),
+            "call_seconds": sum(record.seconds for record in records),
+            "prompt_tokens": sum(record.prompt_tokens for record in records),
+            "completion_tokens": sum(record.completion_tokens for record in records),
+            "cost": self.cost(records),
+        }
+
+    def report(self, by: str = "phase") -> str:
+        """
+        Formats `breakdown` as a table, e.g. to see that 70% of the time is spent voting.
+
+        :param by: the field the calls are grouped by
+        :return: one line per group, the largest share first
+        """
+        rows = sorted(
+            self.breakdown(by).items(), key=lambda item: item[1]["share"], reverse=True
+        )
+        lines = [
+            f"{by:<16} {'share':>6} {'seconds':>9} {'calls':>6} {'retries':>7} "
+            f"{'cached':>6} {'tokens':>8} {'cost':>8}"
+        ]
+        for key, row in rows:
+            lines.append(
+                f"{str(key):<16} {row['share']:>6.1%} {row['seconds']:>9.2f} "
+                f"{row['calls']:>6} {row['retries']:>7} {row['cached']:>6} "
+                f"{row['prompt_tokens'] + row['completion_tokens']:>8} "
+                f"{row['cost']:>8.4f}"
+            )
+        return "\n".join(lines)
+
+    def export_spans(self, path: str):
+        """
+        Appends the phases and calls as OpenTelemetry-style spans to a JSON
+        lines file, one span per line. Calls are children of the discussion
+        span, and so are phases.
+
+        :param path: the path of the file
+        """
+        root = uuid.uuid4().hex[:16]
+        spans = []
+        starts = [phase.start for phase in self.phases] + [
+            record.start for record in self.records
+        ]
+        ends = [phase.start + phase.seconds for phase in self.phases] + [
+            record.start + record.seconds for record in self.records
+        ]
+        if starts:
+            spans.append(
+                self._span("discussion", root, None, min(starts), max(ends), {})
+            )
+        for phase in self.phases:
+            spans.append(
+                self._span(
+                    f"phase {phase.phase}",
+                    phase.span_id,
+                    root,
+                    phase.start,
+                    phase.start + phase.seconds,
+                    {"todf.phase": phase.phase},
+                )
+            )
+        for record in self.records:
+            attributes = {
+                f"todf.{key}": value
+                for key, value in asdict(record).items()
+                if key not in ("start", "seconds", "span_id", "error")
+                and value is not None
+            }
+            attributes["todf.argument_ids"] = list(record.argument_ids)
+            spans.append(
+                self._span(
+                    f"{record.kind} {record.name}",
+                    record.span_id,
+                    root,
+                    record.start,
+                    record.start + record.seconds,
+                    attributes,
+                    record.error,
+                )
+            )
+        with open(path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, ensure_ascii=False) + "\n")
+
+    def _span(self, name, span_id, parent_id, start, end, attributes, error=None):
+        return {
+            "name": name,
+            "trace_id": self.trace_id,
+            "span_id": span_id,
+            "parent_span_id": parent_id,
+            "start_time_unix_nano": int(start * 1e9),
+            "end_time_unix_nano": int(end * 1e9),
+            "attributes": attributes,
+            "status": {"code": "ERROR", "message": error}
+            if error
+            else {"code": "OK"},
+        }
@@ -1,13 +1,29 @@
 """This module provides various execution policies for discussions in a target-oriented discussion framework"""
 from __future__ import annotations
 
+import math
 import random
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Dict
-
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
+
+from todf.concurrency import BoundedExecutor
+from todf.events import (
+    ARGUMENTATION,
+    VOTING,
+    ArgumentCreated,
+    ArgumentMerged,
+    ConsensusUpdated,
+    DiscussionEvent,
+    PhaseChanged,
+    VoteCast,
+)
+from todf.limits import CallBudget, RequestCost
 from todf.utils import print_verbose
+from todf.voting import SerialVoting, VotingStrategy
 
 if TYPE_CHECKING:
+    from todf.agent import Agent
+    from todf.argument import Argument
     from todf.todf import TODF
 
 
@@ -22,7 +38,6 @@ class DiscussionExecutionPolicy(ABC):
     name: str
     description: str
 
-    @abstractmethod
     def exec(self, framework: TODF, verbose: bool = False):
         """
         Executes the discussion following a specific policy.
@@ -30,6 +45,44 @@ class DiscussionExecutionPolicy(ABC):
         :param framework: (TODF) The target-oriented discussion framework instance.
         :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
         """
+        for _ in self.stream(framework, verbose):
+            pass
+
+    def stream(
+        self, framework: TODF, verbose: bool = False
+    ) -> Iterator[DiscussionEvent]:
+        """
+        Executes the discussion like `exec`, yielding its events while it runs.
+        A ConsensusUpdated event follows every argument, merge or vote that changes the
+        support label of the target. Closing the iterator stops the discussion.
+
+        :param framework: (TODF) The target-oriented discussion framework instance.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Iterator[DiscussionEvent]) The events of the discussion.
+        """
+        consensus = None
+        for event in self.generate_events(framework, verbose):
+            yield event
+            if isinstance(event, (ArgumentCreated, ArgumentMerged, VoteCast)):
+                label = framework.consensus_engine.support_label(
+                    framework.target.id
+                )
+                if label != consensus:
+                    consensus = label
+                    yield ConsensusUpdated(label=label)
+
+    @abstractmethod
+    def generate_events(
+        self, framework: TODF, verbose: bool = False
+    ) -> Iterator[DiscussionEvent]:
+        """
+        Executes the discussion following a specific policy, as a generator of
+        PhaseChanged, ArgumentCreated, ArgumentMerged and VoteCast events.
+
+        :param framework: (TODF) The target-oriented discussion framework instance.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Iterator[DiscussionEvent]) The events of the discussion.
+        """
         pass
 
 
@@ -61,6 +114,61 @@ def register_execution_policy(subclass):
     return subclass
 
 
+def make_rng(seed: Optional[int] = None):
+    """
+    Creates the random number generator of a discussion.
+
+    :param seed: (int, optional) The seed of the discussion. Default is None.
+    :return: (random.Random) A generator of its own if a seed is given, otherwise the
+             shared generator of the `random` module, so `random.seed` still applies.
+    """
+    if seed is None:
+        return random
+    return random.Random(seed)
+
+
+def argue_pairs(
+    pairs: List[Tuple[Agent, Argument]],
+    executor: Optional[BoundedExecutor] = None,
+    verbose: bool = False,
+) -> Iterator[Tuple[Agent, Argument, Argument]]:
+    """
+    Lets each agent argue on its argument.
+
+    In a parallel wave every agent responds to the memory it had at the start
+    of the wave, and the responses are recorded in the order of the pairs.
+
+    :param pairs: (List[Tuple[Agent, Argument]]) The arguments each agent responds to.
+    :param executor: (BoundedExecutor, optional) If given, all arguments are requested at once
+                     with it, as a parallel wave. Default is None, one after another.
+    :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+    :return: (Iterator[Tuple[Agent, Argument, Argument]]) The new arguments with their creators and
+             the arguments they respond to, in the order of the pairs.
+    """
+    for agent, argument in pairs:
+        print_verbose(
+            f"\nAgent {agent} sees argument {argument}",
+            verbose=verbose,
+            color="green",
+        )
+        agent.see_argument(argument)
+        if executor is None:
+            new_arg = agent.argue(argument=argument)
+            if new_arg is not None:
+                yield agent, argument, new_arg
+
+    if executor is None:
+        return
+
+    responses = executor.map(
+        lambda pair: pair[0].request_argument(pair[1]), pairs
+    )
+    for (agent, argument), response in zip(pairs, responses):
+        new_arg = agent.record_argument(argument, response)
+        if new_arg is not None:
+            yield agent, argument, new_arg
+
+
 @register_execution_policy
 class SequentialExecutionPolicy(DiscussionExecutionPolicy):
     """Sequential Execution Policy Executes discussions in a sequential order."""
@@ -68,14 +176,29 @@ class SequentialExecutionPolicy(DiscussionExecutionPolicy):
     name = "SEQUENTIAL"
     description = "Executes discussions in a sequential order."
 
-    def __init__(self, max_arguments: int = 10):
+    def __init__(
+        self,
+        max_arguments: int = 10,
+        voting: Optional[VotingStrategy] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param max_arguments: (int) The maximum number of arguments in the discussion.
+        :param voting: (VotingStrategy, optional) How the labelling phase is executed. Default is SerialVoting.
+        :param seed: (int, optional) The seed of the order of the agents, see `make_rng`. Default is None.
+        """
         self.max_arguments = max_arguments
+        self.voting = voting or SerialVoting()
+        self.seed = seed
 
-    def exec(self, framework: TODF, verbose: bool = False):
+    def generate_events(
+        self, framework: TODF, verbose: bool = False
+    ) -> Iterator[DiscussionEvent]:
         """Executes the discussion sequentially.
 
         :param framework: (TODF) The target-oriented discussion framework instance.
         :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Iterator[DiscussionEvent]) The events of the discussion.
         """
         print_verbose("Discussion topic:", verbose)
         print_verbose(framework.target.text, verbose, "green")
@@ -89,18 +212,25 @@ class SequentialExecutionPolicy(DiscussionExecutionPolicy):
             verbose,
         )
 
+        rng = make_rng(self.seed)
+
         # Argumentation
-        random.shuffle(framework.agents)
+        yield PhaseChanged(phase=ARGUMENTATION)
+        rng.shuffle(framework.agents)
+        # position of the first argument each agent has not visited yet
+        cursors = {agent.id: 0 for agent in framework.agents}
         has_new_arguments = True
         while (
             len(framework.arguments) < self.max_arguments and has_new_arguments
         ):
             has_new_arguments = False
             for agent in framework.agents:
-                for argument in framework.arguments:
+                while cursors[agent.id] < len(framework.arguments):
+                    argument = framework.arguments[cursors[agent.id]]
+                    cursors[agent.id] += 1
                     if (
                         agent.id == argument.creator
-                        or argument in agent.seen_arguments
+                        or argument.id in agent.seen_arguments
                     ):
                         continue
                     print_verbose(
@@ -112,34 +242,20 @@ class SequentialExecutionPolicy(DiscussionExecutionPolicy):
                     new_arg = agent.argue(argument=argument)
                     if new_arg is None:
                         continue
-                    else:
+                    event = framework.add_argument(new_arg, argument)
+                    if isinstance(event, ArgumentCreated):
                         has_new_arguments = True
-                    framework.arguments.append(new_arg)
+                    yield event
 
                     if len(framework.arguments) >= self.max_arguments:
                         break
 
         # Labelling/Voting
-        random.shuffle(framework.agents)
-        for agent in framework.agents:
-            for arg in framework.arguments:
-                # if agent has already a label in that argument continue
-                # on counter argument generation, a label is instantly applied
-                # depending if it supports or opposes
-                if agent.id in arg.labelling.keys():
-                    print_verbose(
-                        f"\nAgent {agent} already voted argument {arg.id} : {arg.labelling[agent.id]}",
-                        verbose=verbose,
-                        color="yellow",
-                    )
-                    continue
-
-                arg.labelling[agent.id] = agent.vote(arg)
-                print_verbose(
-                    f"\nAgent {agent} voted argument {arg.id} : {arg.labelling[agent.id]}",
-                    verbose=verbose,
-                    color="yellow",
-                )
+        yield PhaseChanged(phase=VOTING)
+        rng.shuffle(framework.agents)
+        yield from self.voting.stream(
+            framework.agents, framework.arguments, verbose
+        )
 
 
 @register_execution_policy
@@ -149,15 +265,34 @@ class RoundExecutionPolicy(DiscussionExecutionPolicy):
     name = "ROUNDS"
     description = "Executes discussions in rounds."
 
-    def __init__(self, max_depth: int = 1):
+    def __init__(
+        self,
+        max_depth: int = 1,
+        voting: Optional[VotingStrategy] = None,
+        executor: Optional[BoundedExecutor] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param max_depth: (int) The number of rounds after the first one.
+        :param voting: (VotingStrategy, optional) How the labelling phase is executed. Default is SerialVoting.
+        :param executor: (BoundedExecutor, optional) If given, all arguments of a round are requested
+                         at once with it, as a parallel wave. Default is None, one after another.
+        :param seed: (int, optional) The seed of the order of the agents, see `make_rng`. Default is None.
+        """
         self.max_depth = max_depth
+        self.voting = voting or SerialVoting()
+        self.executor = executor
+        self.seed = seed
 
-    def exec(self, framework: TODF, verbose: bool = False):
+    def generate_events(
+        self, framework: TODF, verbose: bool = False
+    ) -> Iterator[DiscussionEvent]:
         """
         Executes the discussion in rounds.
 
         :param framework: (TODF) The target-oriented discussion framework instance.
         :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Iterator[DiscussionEvent]) The events of the discussion.
         """
 
         print_verbose("Discussion topic:", verbose)
@@ -172,78 +307,405 @@ class RoundExecutionPolicy(DiscussionExecutionPolicy):
             verbose=verbose,
         )
 
+        rng = make_rng(self.seed)
         depth = 0
         discussion: Dict[int, Dict] = {}
 
         # Argumentation
+        yield PhaseChanged(phase=ARGUMENTATION)
         while depth <= self.max_depth:
-            random.shuffle(framework.agents)
-            if depth == 0:
-                discussion[depth] = {}
-                proposition = framework.arguments[0]
-                for agent in framework.agents:
-                    discussion[depth][agent.id] = []
-                    print_verbose(
-                        f"\nAgent {agent} sees argument {proposition}",
-                        verbose=verbose,
-                        color="green",
-                    )
-                    agent.see_argument(proposition)
-                    new_arg = agent.argue(argument=proposition)
-                    if new_arg is None:
-                        continue
-                    framework.arguments.append(new_arg)
-                    discussion[depth][agent.id].append(new_arg)
-                depth += 1
-                continue
-
-            # Let agents argue on other agents' arguments
+            rng.shuffle(framework.agents)
             discussion[depth] = {}
+            pairs: List[Tuple[Agent, Argument]] = []
             for agent in framework.agents:
                 discussion[depth][agent.id] = []
+                if depth == 0:
+                    pairs.append((agent, framework.arguments[0]))
+                    continue
+
+                # Let agents argue on other agents' arguments
                 for prev_id, prev_args in discussion[depth - 1].items():
                     if agent.id == prev_id:
                         continue
                     for prev_arg in prev_args:
-                        print_verbose(
-                            f"\nAgent {agent} sees argument {prev_arg}",
-                            verbose=verbose,
-                            color="green",
-                        )
-                        agent.see_argument(prev_arg)
-                        new_arg = agent.argue(argument=prev_arg)
-                        if new_arg is None:
-                            continue
-                        framework.arguments.append(new_arg)
-                        discussion[depth][agent.id].append(new_arg)
+                        pairs.append((agent, prev_arg))
+
+            for agent, argument, new_arg in self.argue_round(pairs, verbose):
+                event = framework.add_argument(new_arg, argument)
+                if isinstance(event, ArgumentCreated):
+                    discussion[depth][agent.id].append(new_arg)
+                yield event
 
             depth += 1
 
         # Labelling/Voting
-        random.shuffle(framework.agents)
-        for agent in framework.agents:
-            for arg in framework.arguments:
-                # if agent has already a label in that argument continue
-                if agent.id in arg.labelling.keys():
+        yield PhaseChanged(phase=VOTING)
+        rng.shuffle(framework.agents)
+        yield from self.voting.stream(
+            framework.agents, framework.arguments, verbose
+        )
+
+    def argue_round(
+        self, pairs: List[Tuple[Agent, Argument]], verbose: bool = False
+    ) -> Iterator[Tuple[Agent, Argument, Argument]]:
+        """
+        Lets each agent argue on its argument, see `argue_pairs`.
+
+        :param pairs: (List[Tuple[Agent, Argument]]) The arguments each agent sees this round.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Iterator[Tuple[Agent, Argument, Argument]]) The new arguments with their creators and
+                 the arguments they respond to, in the order of the pairs.
+        """
+        return argue_pairs(pairs, self.executor, verbose)
+
+
+@register_execution_policy
+class AdaptiveExecutionPolicy(DiscussionExecutionPolicy):
+    """Adaptive Execution Policy Interleaves argumentation and voting, and stops
+    as soon as further arguments are unlikely or unable to change the consensus."""
+
+    name = "ADAPTIVE"
+    description = "Interleaves argumentation and voting and stops once the consensus settles."
+
+    def __init__(
+        self,
+        max_arguments: int = 10,
+        patience: int = 3,
+        voting: Optional[VotingStrategy] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param max_arguments: (int) The maximum number of arguments in the discussion.
+        :param patience: (int) The number of new arguments after which the discussion stops
+                         if none of them has changed the consensus.
+        :param voting: (VotingStrategy, optional) How each new argument is labelled. Default is SerialVoting.
+        :param seed: (int, optional) The seed of the order of the agents, see `make_rng`. Default is None.
+        """
+        self.max_arguments = max_arguments
+        self.patience = patience
+        self.voting = voting or SerialVoting()
+        self.seed = seed
+
+    def generate_events(
+        self, framework: TODF, verbose: bool = False
+    ) -> Iterator[DiscussionEvent]:
+        """
+        Executes the discussion adaptively. The agents take turns to respond to
+        the next argument they have not seen, and every new argument is labelled
+        by all agents right away. The discussion stops when the consensus has
+        not changed for `patience` arguments, when the target's margin is too
+        large for the remaining arguments to overturn, when `max_arguments` is
+        reached, or when no agent has an argument left to respond to.
+
+        :param framework: (TODF) The target-oriented discussion framework instance.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Iterator[DiscussionEvent]) The events of the discussion.
+        """
+        print_verbose("Discussion topic:", verbose)
+        print_verbose(framework.target.text, verbose, "green")
+        print_verbose("Introducing the agents:", verbose)
+        for a in framework.agents:
+            print_verbose(f"\n{a.name}", verbose=verbose, color="cyan")
+            print_verbose(a.persona, verbose, "cyan")
+
+        print_verbose(
+            "\nExecuting discussion adaptively. Labelling the topic...",
+            verbose,
+        )
+
+        rng = make_rng(self.seed)
+        rng.shuffle(framework.agents)
+        yield PhaseChanged(phase=VOTING)
+        yield from self.voting.stream(
+            framework.agents, [framework.target], verbose
+        )
+        consensus = framework.consensus_engine.support_label(framework.target.id)
+        unchanged = 0
+        yield PhaseChanged(phase=ARGUMENTATION)
+
+        # position of the first argument each agent has not visited yet
+        cursors = {agent.id: 0 for agent in framework.agents}
+        while len(framework.arguments) < self.max_arguments:
+            has_new_arguments = False
+            for agent in framework.agents:
+                pair = self.next_argument(framework, agent, cursors, verbose)
+                if pair is None:
+                    continue
+                argument, new_arg = pair
+                has_new_arguments = True
+
+                event = framework.add_argument(new_arg, argument)
+                yield event
+                if isinstance(event, ArgumentMerged):
+                    # the merged argument has been voted on already
+                    continue
+                yield PhaseChanged(phase=VOTING)
+                yield from self.voting.stream(framework.agents, [new_arg], verbose)
+
+                label = framework.consensus_engine.support_label(
+                    framework.target.id
+                )
+                unchanged = unchanged + 1 if label == consensus else 0
+                consensus = label
+                if unchanged >= self.patience:
                     print_verbose(
-                        f"\nAgent {agent} already voted argument {arg.id} : {arg.labelling[agent.id]}",
+                        f"\nThe consensus has not changed for {unchanged} arguments.",
                         verbose,
-                        color="yellow",
                     )
-                    continue
-                arg.labelling[agent.id] = agent.vote(arg)
-                print_verbose(
-                    f"\nAgent {agent} voted argument {arg.id} : {arg.labelling[agent.id]}",
-                    verbose=verbose,
-                    color="yellow",
-                )
+                    return
+                remaining = self.max_arguments - len(framework.arguments)
+                if (
+                    framework.index is None
+                    and abs(self.root_margin(framework)) > 2 * remaining
+                ):
+                    print_verbose(
+                        "\nThe remaining arguments cannot change the consensus.",
+                        verbose,
+                    )
+                    return
+                if remaining <= 0:
+                    return
+                yield PhaseChanged(phase=ARGUMENTATION)
+
+            if not has_new_arguments:
+                return
+
+    def next_argument(
+        self,
+        framework: TODF,
+        agent: Agent,
+        cursors: Dict[str, int],
+        verbose: bool = False,
+    ) -> Optional[Tuple[Argument, Argument]]:
+        """
+        Lets the agent respond to the arguments it has not seen yet, in the
+        order of the discussion, until it makes a new argument.
+
+        :param framework: (TODF) The target-oriented discussion framework instance.
+        :param agent: (Agent) The agent whose turn it is.
+        :param cursors: (Dict[str, int]) The position of the next argument of each agent, advanced in place.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Optional[Tuple[Argument, Argument]]) The argument responded to and the new argument,
+                 or None if the agent has seen every argument without responding.
+        """
+        while cursors[agent.id] < len(framework.arguments):
+            argument = framework.arguments[cursors[agent.id]]
+            cursors[agent.id] += 1
+            if agent.id == argument.creator or argument.id in agent.seen_arguments:
+                continue
+            print_verbose(
+                f"\nAgent {agent} sees argument {argument}",
+                verbose=verbose,
+                color="green",
+            )
+            agent.see_argument(argument)
+            new_arg = agent.argue(argument=argument)
+            if new_arg is not None:
+                return argument, new_arg
+        return None
+
+    @staticmethod
+    def root_margin(framework: TODF) -> int:
+        """
+        Computes how many more children of the target are in favour of it
+        than against it. In a tree, a new argument changes the support label
+        of at most one child of the target, so it moves the margin by at most
+        two. Merged duplicates can descend from several children, so the
+        bound does not hold if the framework has a duplicate index.
+
+        :param framework: (TODF) The target-oriented discussion framework instance.
+        :return: (int) The number of pro minus the number of con children of the target.
+        """
+        target = framework.target
+        engine = framework.consensus_engine
+        margin = 0
+        for child_id in target.supported_by:
+            margin += engine.support_label(child_id)
+        for child_id in target.opposed_by:
+            margin -= engine.support_label(child_id)
+        return margin
 
 
 @register_execution_policy
 class RandomExecutionPolicy(DiscussionExecutionPolicy):
+    """Random Execution Policy Lets randomly drawn agents respond to randomly
+    drawn arguments, within a budget of language model calls and tokens."""
+
     name = "RANDOM"
     description = "Executes discussions randomly."
 
-    @classmethod
-    def exec(cls, framework: TODF, verbose: bool = False):
-        print("Executing discussion randomly.")
+    weightings = ("uniform", "recency", "contested")
+
+    def __init__(
+        self,
+        max_arguments: int = 10,
+        max_calls: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        weighting: str = "recency",
+        decay: float = 0.5,
+        voting: Optional[VotingStrategy] = None,
+        executor: Optional[BoundedExecutor] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param max_arguments: (int) The maximum number of arguments in the discussion.
+        :param max_calls: (int, optional) The soft maximum number of language model calls of the
+                          agents, for arguments and votes. Default is None, no limit.
+        :param max_tokens: (int, optional) The soft maximum number of tokens of these calls. Default
+                           is None, no limit.
+        :param weighting: (str) How likely an argument is to be drawn: "uniform", "recency" to favour
+                          recent arguments, or "contested" to favour arguments with both pro and con
+                          votes and children. Default is "recency".
+        :param decay: (float) The factor by which the weight of an argument shrinks with each newer
+                      argument, if the weighting is "recency". Default is 0.5.
+        :param voting: (VotingStrategy, optional) How the labelling phase is executed. Default is SerialVoting.
+        :param executor: (BoundedExecutor, optional) If given, a wave of up to `max_concurrency` pairs is
+                         drawn and requested at once with it. Default is None, one pair at a time.
+        :param seed: (int, optional) The seed of the draws, see `make_rng`. Default is None.
+        """
+        if weighting not in self.weightings:
+            raise ValueError(f"weighting must be one of {self.weightings}")
+
+        self.max_arguments = max_arguments
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.weighting = weighting
+        self.decay = decay
+        self.voting = voting or SerialVoting()
+        self.executor = executor
+        self.seed = seed
+
+    def generate_events(
+        self, framework: TODF, verbose: bool = False
+    ) -> Iterator[DiscussionEvent]:
+        """
+        Executes the discussion randomly. Pairs of an agent and an argument it
+        has not seen are drawn, weighted by the argument, until `max_arguments`
+        is reached, the budget is spent, or every agent has seen every argument.
+        The votes are then cast, or a random share of them if the remaining
+        budget does not allow all of them.
+
+        The caps of the budget are soft, like those of `TokenBudget`: a call
+        cannot be refused once its request has started, so every wave of
+        requests is sized to fit into the rest of the budget at the average
+        cost of the requests so far, see `RequestCost`. Requests costlier
+        than the average, e.g. agents using more tools, may overshoot it.
+
+        With a seed and a response cache, a rerun makes the same draws and
+        produces the same discussion.
+
+        :param framework: (TODF) The target-oriented discussion framework instance.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Iterator[DiscussionEvent]) The events of the discussion.
+        """
+        print_verbose("Discussion topic:", verbose)
+        print_verbose(framework.target.text, verbose, "green")
+        print_verbose("Introducing the agents:", verbose)
+        for a in framework.agents:
+            print_verbose(f"\n{a.name}", verbose=verbose, color="cyan")
+            print_verbose(a.persona, verbose, "cyan")
+
+        print_verbose(
+            "\nExecuting discussion randomly. Argumentation phase is starting...",
+            verbose,
+        )
+
+        rng = make_rng(self.seed)
+        budget = CallBudget(self.max_calls, self.max_tokens)
+        callbacks = {agent.id: agent.callbacks for agent in framework.agents}
+        for agent in framework.agents:
+            agent.callbacks = (agent.callbacks or []) + [budget]
+        try:
+            # Argumentation
+            yield PhaseChanged(phase=ARGUMENTATION)
+            rng.shuffle(framework.agents)
+            wave = self.executor.max_concurrency if self.executor else 1
+            arguing = RequestCost(budget)
+            while not budget.exhausted:
+                size = min(wave, self.max_arguments - len(framework.arguments))
+                pairs = self.draw(framework, rng, arguing.affordable(size))
+                if not pairs:
+                    break
+                with arguing.measure(len(pairs)):
+                    for agent, argument, new_arg in argue_pairs(
+                        pairs, self.executor, verbose
+                    ):
+                        yield framework.add_argument(new_arg, argument)
+
+            # Labelling/Voting
+            yield PhaseChanged(phase=VOTING)
+            rng.shuffle(framework.agents)
+            if budget.exhausted:
+                return
+            pairs = self.voting.pairs(
+                framework.agents, framework.arguments, verbose
+            )
+            if budget.max_calls is not None or budget.max_tokens is not None:
+                # a random share of the votes is cast if the budget does not
+                # allow all of them
+                rng.shuffle(pairs)
+            voting = RequestCost(budget)
+            while pairs:
+                size = voting.affordable(len(pairs))
+                if size == 0:
+                    break
+                chunk, pairs = pairs[:size], pairs[size:]
+                with voting.measure(len(chunk)):
+                    votes = self.voting.collect(chunk, verbose)
+                    for vote in votes:
+                        yield vote
+                        if budget.exhausted:
+                            votes.close()
+                            return
+        finally:
+            for agent in framework.agents:
+                agent.callbacks = callbacks[agent.id]
+
+    def weight(self, framework: TODF, position: int) -> float:
+        """
+        Computes how likely the argument at a position is to be drawn.
+
+        :param framework: (TODF) The target-oriented discussion framework instance.
+        :param position: (int) The position of the argument in the discussion.
+        :return: (float) The relative weight of the argument.
+        """
+        if self.weighting == "recency":
+            return self.decay ** (len(framework.arguments) - 1 - position)
+        if self.weighting == "contested":
+            argument = framework.arguments[position]
+            labels = argument.labelling.values()
+            yes = sum(1 for label in labels if label > 0)
+            no = sum(1 for label in labels if label < 0)
+            return 1 + min(yes, no) + min(
+                len(argument.supported_by), len(argument.opposed_by)
+            )
+        return 1.0
+
+    def draw(
+        self, framework: TODF, rng, size: int
+    ) -> List[Tuple[Agent, Argument]]:
+        """
+        Draws up to `size` distinct pairs of an agent and an argument it has
+        neither made nor seen, without replacement and weighted by the argument.
+
+        :param framework: (TODF) The target-oriented discussion framework instance.
+        :param rng: (random.Random) The random number generator of the discussion.
+        :param size: (int) The number of pairs to draw.
+        :return: (List[Tuple[Agent, Argument]]) The drawn pairs, in the order they were drawn.
+        """
+        if size <= 0:
+            return []
+        keys = []
+        for position, argument in enumerate(framework.arguments):
+            weight = self.weight(framework, position)
+            for agent in framework.agents:
+                if (
+                    agent.id == argument.creator
+                    or argument.id in agent.seen_arguments
+                ):
+                    continue
+                # weighted sampling without replacement by exponential keys
+                key = math.log(1.0 - rng.random())
+                keys.append((key / weight if weight > 0 else -math.inf, agent, argument))
+        keys.sort(key=lambda item: item[0], reverse=True)
+        return [(agent, argument) for _, agent, argument in keys[:size]]
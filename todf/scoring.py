@@ -0,0 +1,225 @@
+"""This module provides vectorized computation of majority and support labels
+for many discussions, and many variants of their votes, at once"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from todf.store import ArgumentStore
+
+MISSING = -128
+"""Marks a missing vote in a vote matrix."""
+
+Edges = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def majority_labels(votes: np.ndarray) -> np.ndarray:
+    """
+    Computes majority labels from vote matrices, see `compute_majority_label`.
+
+    :param votes: (np.ndarray) An int8 array of shape (..., agents, arguments),
+                  with `MISSING` for absent votes.
+    :return: (np.ndarray) An int8 array of labels (-1, 0, or 1) of shape (..., arguments).
+    """
+    totals = np.where(votes == MISSING, 0, votes).sum(axis=-2, dtype=np.int64)
+    return np.sign(totals).astype(np.int8)
+
+
+class SupportPlan:
+    """The level order of a discussion graph, computed once and reused to
+    compute support labels for any number of vote matrices.
+
+    Arguments are labelled level by level: the leaves first, then the
+    arguments all of whose children are in lower levels.
+    """
+
+    def __init__(
+        self,
+        parents: np.ndarray,
+        children: np.ndarray,
+        signs: np.ndarray,
+        size: int,
+    ):
+        """
+        :param parents: (np.ndarray) The parent argument of every edge.
+        :param children: (np.ndarray) The child argument of every edge.
+        :param signs: (np.ndarray) 1 if the child supports the parent, -1 if it opposes it.
+        :param size: (int) The number of arguments.
+        :raises ValueError: if an argument supports or opposes itself, directly or not.
+        """
+        parents = np.asarray(parents, dtype=np.int64)
+        children = np.asarray(children, dtype=np.int64)
+        signs = np.asarray(signs, dtype=np.int8)
+
+        self.size = size
+        self.steps: List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = []
+
+        by_parent = _group(parents, size)
+        for level in _levels(parents, children, size)[1:]:
+            edges, starts = _members(by_parent, level)
+            self.steps.append((level, children[edges], signs[edges], starts))
+
+    def support_labels(self, votes: np.ndarray) -> np.ndarray:
+        """
+        Computes support labels, see `compute_support_label`.
+
+        :param votes: (np.ndarray) An int8 array of shape (..., agents, arguments),
+                      with `MISSING` for absent votes.
+        :return: (np.ndarray) An int8 array of labels (-1, 0, or 1) of shape (..., arguments).
+        """
+        labels = majority_labels(votes)
+        for level, children, signs, starts in self.steps:
+            contributions = labels[..., children] * signs
+            # every argument of a level above the leaves has children, so no
+            # segment is empty
+            margins = np.add.reduceat(
+                contributions.astype(np.int64), starts, axis=-1
+            )
+            labels[..., level] = np.where(
+                margins != 0, np.sign(margins), labels[..., level]
+            )
+        return labels
+
+
+def support_labels(
+    votes: np.ndarray,
+    parents: np.ndarray,
+    children: np.ndarray,
+    signs: np.ndarray,
+) -> np.ndarray:
+    """
+    Computes support labels, see `SupportPlan`.
+
+    :param votes: (np.ndarray) An int8 array of shape (..., agents, arguments).
+    :param parents: (np.ndarray) The parent argument of every edge.
+    :param children: (np.ndarray) The child argument of every edge.
+    :param signs: (np.ndarray) 1 if the child supports the parent, -1 if it opposes it.
+    :return: (np.ndarray) An int8 array of labels (-1, 0, or 1) of shape (..., arguments).
+    """
+    plan = SupportPlan(parents, children, signs, votes.shape[-1])
+    return plan.support_labels(votes)
+
+
+class DiscussionBatch:
+    """Many discussions scored together as one graph made of disjoint parts.
+
+    The arguments of all discussions are concatenated along the last axis of
+    the vote matrix, and the agents of each discussion share the rows in the
+    order of their vote matrix, padded with `MISSING`. Any array of variants of
+    `votes` with extra leading dimensions, e.g. with an agent dropped or noisy
+    votes flipped, can be scored with the same plan.
+    """
+
+    def __init__(
+        self,
+        votes: Sequence[np.ndarray],
+        edges: Sequence[Edges],
+        roots: Sequence[int],
+    ):
+        """
+        :param votes: (Sequence[np.ndarray]) The agents x arguments vote matrix of each discussion.
+        :param edges: (Sequence[Edges]) The parents, children and signs arrays of each discussion.
+        :param roots: (Sequence[int]) The target argument of each discussion.
+        """
+        sizes = np.array([matrix.shape[1] for matrix in votes], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+        self.size = int(sizes.sum())
+
+        agents = max((matrix.shape[0] for matrix in votes), default=0)
+        self.votes = np.full((agents, self.size), MISSING, dtype=np.int8)
+        for matrix, offset in zip(votes, self.offsets):
+            self.votes[: matrix.shape[0], offset : offset + matrix.shape[1]] = matrix
+
+        def concatenate(position, dtype):
+            return np.concatenate(
+                [np.zeros(0, dtype=dtype)]
+                + [
+                    np.asarray(arrays[position], dtype=dtype)
+                    + (offset if position < 2 else 0)
+                    for arrays, offset in zip(edges, self.offsets)
+                ]
+            )
+
+        self.parents = concatenate(0, np.int64)
+        self.children = concatenate(1, np.int64)
+        self.signs = concatenate(2, np.int8)
+        self.roots = np.asarray(roots, dtype=np.int64) + self.offsets
+        self.plan = SupportPlan(self.parents, self.children, self.signs, self.size)
+
+    @classmethod
+    def from_stores(cls, stores: Sequence[ArgumentStore]) -> "DiscussionBatch":
+        """
+        Collects the votes and edges of the given discussions.
+
+        :param stores: (Sequence[ArgumentStore]) The arguments of each discussion,
+                       whose first argument is the target.
+        :return: (DiscussionBatch) The batch of discussions.
+        """
+        return cls(
+            votes=[store.votes for store in stores],
+            edges=[store.edge_arrays() for store in stores],
+            roots=[store.order[0] for store in stores],
+        )
+
+    def majority_labels(self, votes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        :param votes: (np.ndarray, optional) Variants of `votes`, of shape (..., agents, arguments).
+        :return: (np.ndarray) The majority label of every argument, of shape (..., arguments).
+        """
+        return majority_labels(self.votes if votes is None else votes)
+
+    def support_labels(self, votes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        :param votes: (np.ndarray, optional) Variants of `votes`, of shape (..., agents, arguments).
+        :return: (np.ndarray) The support label of every argument, of shape (..., arguments).
+        """
+        return self.plan.support_labels(self.votes if votes is None else votes)
+
+    def consensus(self, votes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Computes the consensus of every discussion, see `Discussion.consensus`.
+
+        :param votes: (np.ndarray, optional) Variants of `votes`, of shape (..., agents, arguments).
+        :return: (np.ndarray) The support label of every target, of shape (..., discussions).
+        """
+        return self.support_labels(votes)[..., self.roots]
+
+
+def _group(keys: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Groups the positions of ``keys`` by key, as a permutation and the start
+    of each key's segment in it."""
+    order = np.argsort(keys, kind="stable")
+    starts = np.searchsorted(keys[order], np.arange(size + 1))
+    return order, starts
+
+
+def _members(
+    groups: Tuple[np.ndarray, np.ndarray], keys: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the positions grouped under the given keys, key after key, and
+    the start of each key's segment among them."""
+    order, starts = groups
+    counts = starts[keys + 1] - starts[keys]
+    ends = np.cumsum(counts)
+    offsets = np.repeat(starts[keys] - ends + counts, counts)
+    return order[offsets + np.arange(ends[-1] if ends.size else 0)], ends - counts
+
+
+def _levels(parents: np.ndarray, children: np.ndarray, size: int) -> List[np.ndarray]:
+    """Splits the nodes into levels: the leaves first, then the nodes all of
+    whose children are in lower levels."""
+    remaining = np.bincount(parents, minlength=size)
+    by_child = _group(children, size)
+    levels = []
+    frontier = np.flatnonzero(remaining == 0)
+    while frontier.size:
+        levels.append(frontier)
+        finished = parents[_members(by_child, frontier)[0]]
+        np.subtract.at(remaining, finished, 1)
+        candidates = np.unique(finished)
+        frontier = candidates[remaining[candidates] == 0]
+    if sum(level.size for level in levels) < size:
+        raise ValueError("The discussion contains a cycle")
+    return levels
@@ -0,0 +1,332 @@
+"""This module provides checkpoints of running discussions: an append-only log
+of the responses of the agents and of the events of the discussion, from which
+an interrupted discussion is resumed without asking the language model again
+for the responses it already gave"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import threading
+from collections import defaultdict, deque
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from todf.argument import Argument
+from todf.events import (
+    ArgumentCreated,
+    ArgumentMerged,
+    ConsensusUpdated,
+    DiscussionEvent,
+    PhaseChanged,
+    VoteCast,
+)
+
+if TYPE_CHECKING:
+    from todf.policies import DiscussionExecutionPolicy
+    from todf.todf import TODF
+
+SNAPSHOT_VERSION = 1
+
+
+def event_to_dict(event: DiscussionEvent) -> Dict[str, Any]:
+    """
+    Describes an event as a JSON serializable dict.
+
+    :param event: (DiscussionEvent) The event.
+    :return: (Dict[str, Any]) The fields of the event, with its class name under "event".
+    """
+    if isinstance(event, ArgumentCreated):
+        argument = event.argument
+        return {
+            "event": "ArgumentCreated",
+            "argument": {
+                "id": argument.id,
+                "text": argument.text,
+                "creator": argument.creator,
+            },
+            "target": event.target.id,
+            "sign": _sign(argument.id, event.target),
+        }
+    if isinstance(event, ArgumentMerged):
+        duplicate = event.duplicate
+        return {
+            "event": "ArgumentMerged",
+            "argument": event.argument.id,
+            "target": event.target.id,
+            "duplicate": {
+                "id": duplicate.id,
+                "text": duplicate.text,
+                "creator": duplicate.creator,
+            },
+            "sign": event.target.labelling[duplicate.creator],
+        }
+    if isinstance(event, VoteCast):
+        return {
+            "event": "VoteCast",
+            "agent_id": event.agent_id,
+            "argument_id": event.argument_id,
+            "label": event.label,
+        }
+    if isinstance(event, PhaseChanged):
+        return {"event": "PhaseChanged", "phase": event.phase}
+    if isinstance(event, ConsensusUpdated):
+        return {"event": "ConsensusUpdated", "label": event.label}
+    return {"event": event.__class__.__name__}
+
+
+def _sign(argument_id: str, target: Argument) -> int:
+    # an argument whose stance was not understood has no edge to its target
+    if argument_id in target.supported_by:
+        return 1
+    if argument_id in target.opposed_by:
+        return -1
+    return 0
+
+
+def _read_lines(path: str) -> List[Dict[str, Any]]:
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # the last line of an interrupted run may be incomplete
+            f.truncate(end)
+    for line in data[:end].decode("utf-8").splitlines():
+        if line.strip():
+            entries.append(json.loads(line))
+    return entries
+
+
+class DiscussionJournal:
+    """An append-only JSON lines log of a running discussion.
+
+    The first line describes the discussion and the state of the random
+    number generator at its start. It is followed by the responses of the
+    agents to their requests and by the events of the discussion, each written
+    as soon as it happens.
+
+    A discussion restarted with the same agents, policy and log makes the same
+    requests again. The logged responses are returned without calling the
+    language model, and the agents, their memories, the arguments and the
+    position of the policy are rebuilt on the way. Responses are matched by
+    agent, kind of request and arguments, so waves of concurrent requests are
+    replayed correctly too.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: (str) The path of the log; an existing log is resumed.
+        """
+        self.path = path
+        self.header: Optional[Dict[str, Any]] = None
+        self.replayed = 0
+        self._responses: Dict[Tuple, Deque[str]] = defaultdict(deque)
+        self._logged_events = 0
+        self._lock = threading.Lock()
+
+        for entry in _read_lines(path):
+            if entry["type"] == "start":
+                self.header = entry
+            elif entry["type"] == "response":
+                key = (entry["agent_id"], entry["kind"], tuple(entry["arguments"]))
+                self._responses[key].append(entry["response"])
+            elif entry["type"] == "event":
+                self._logged_events += 1
+        self._file = open(path, "a", encoding="utf-8")
+
+    @property
+    def resuming(self) -> bool:
+        """True if the log has responses that are not replayed yet."""
+        return any(self._responses.values())
+
+    def _write(self, entry: Dict[str, Any]):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def start(self, framework: TODF, policy: DiscussionExecutionPolicy):
+        """
+        Writes the first line of a new log, or checks that a resumed log
+        belongs to the discussion and restores the random number generator.
+
+        :param framework: (TODF) The discussion framework, before the discussion starts.
+        :param policy: (DiscussionExecutionPolicy) The execution policy of the discussion.
+        :raises ValueError: if the log belongs to another discussion.
+        """
+        agent_ids = sorted(agent.id for agent in framework.agents)
+        if self.header is None:
+            self.header = {
+                "type": "start",
+                "version": SNAPSHOT_VERSION,
+                "target": {
+                    "id": framework.target.id,
+                    "text": framework.target.text,
+                    "creator": framework.target.creator,
+                },
+                "agents": agent_ids,
+                "policy": policy.name,
+                # the policies without a seed draw from the shared generator
+                "random_state": random.getstate()
+                if getattr(policy, "seed", None) is None
+                else None,
+            }
+            with self._lock:
+                self._write(self.header)
+            return
+
+        if (
+            self.header["target"]["id"] != framework.target.id
+            or self.header["target"]["text"] != framework.target.text
+            or self.header["agents"] != agent_ids
+            or self.header["policy"] != policy.name
+        ):
+            raise ValueError(f"{self.path} is the log of another discussion")
+        state = self.header.get("random_state")
+        if state is not None:
+            version, internal, gauss = state
+            random.setstate((version, tuple(internal), gauss))
+
+    def request(
+        self,
+        agent_id: str,
+        kind: str,
+        argument_ids: List[str],
+        call: Callable[[], str],
+    ) -> str:
+        """
+        Returns the logged response to a request, or makes the request and logs its response.
+
+        :param agent_id: (str) The id of the requesting agent.
+        :param kind: (str) The kind of request, e.g. "argument" or "vote".
+        :param argument_ids: (List[str]) The ids of the arguments of the request.
+        :param call: (Callable[[], str]) Makes the request.
+        :return: (str) The response.
+        """
+        key = (agent_id, kind, tuple(argument_ids))
+        with self._lock:
+            logged = self._responses.get(key)
+            if logged:
+                self.replayed += 1
+                return logged.popleft()
+
+        response = call()
+        with self._lock:
+            self._write(
+                {
+                    "type": "response",
+                    "agent_id": agent_id,
+                    "kind": kind,
+                    "arguments": list(argument_ids),
+                    "response": response,
+                }
+            )
+        return response
+
+    def record(self, events: Iterator[DiscussionEvent]) -> Iterator[DiscussionEvent]:
+        """
+        Logs the events of the discussion that are not logged yet.
+
+        :param events: (Iterator[DiscussionEvent]) The events of the discussion.
+        :return: (Iterator[DiscussionEvent]) The same events.
+        """
+        count = 0
+        for event in events:
+            count += 1
+            if count > self._logged_events:
+                with self._lock:
+                    self._write({"type": "event", **event_to_dict(event)})
+            yield event
+        self._logged_events = max(self._logged_events, count)
+
+    def close(self):
+        self._file.close()
+
+
+class Snapshot:
+    """The state of a discussion as recorded in its log, see `read_snapshot`.
+
+    Attributes:
+    header (Dict[str, Any]): The first line of the log.
+    framework (TODF): The arguments and labels of the discussion so far. It has no agents.
+    seen_arguments (Dict[str, Set[str]]): The ids of the arguments each agent has responded to.
+    created_arguments (Dict[str, int]): The number of arguments each agent has made.
+    responses (int): The number of logged responses.
+    events (int): The number of logged events.
+    """
+
+    def __init__(self, header: Dict[str, Any], framework: TODF):
+        self.header = header
+        self.framework = framework
+        self.seen_arguments: Dict[str, Set[str]] = defaultdict(set)
+        self.created_arguments: Dict[str, int] = defaultdict(int)
+        self.responses = 0
+        self.events = 0
+
+    @property
+    def random_state(self):
+        """The state of the shared random number generator at the start, or None."""
+        return self.header.get("random_state")
+
+
+def read_snapshot(path: str) -> Snapshot:
+    """
+    Reads the state of a discussion from its log, without resuming it.
+
+    :param path: (str) The path of the log, see `DiscussionJournal`.
+    :return: (Snapshot) The state of the discussion.
+    :raises ValueError: if the log has no header.
+    """
+    from todf.todf import TODF
+
+    entries = _read_lines(path)
+    if not entries or entries[0]["type"] != "start":
+        raise ValueError(f"{path} is not a discussion log")
+    header = entries[0]
+    target = Argument(is_target=True, **header["target"])
+    snapshot = Snapshot(header, TODF(target=target, agents=[]))
+    store = snapshot.framework.arguments
+
+    for entry in entries[1:]:
+        if entry["type"] == "response":
+            snapshot.responses += 1
+            if entry["kind"] == "argument":
+                snapshot.seen_arguments[entry["agent_id"]].update(entry["arguments"])
+            continue
+        snapshot.events += 1
+        if entry["event"] == "ArgumentCreated":
+            argument = Argument(**entry["argument"])
+            parent = store.get(entry["target"])
+            if entry["sign"] > 0:
+                parent.supported_by.append(argument.id)
+            elif entry["sign"] < 0:
+                parent.opposed_by.append(argument.id)
+            if entry["sign"] != 0:
+                parent.labelling[argument.creator] = entry["sign"]
+            store.append(argument)
+            snapshot.created_arguments[argument.creator] += 1
+        elif entry["event"] == "ArgumentMerged":
+            creator = entry["duplicate"]["creator"]
+            parent = store.get(entry["target"])
+            edges = parent.supported_by if entry["sign"] > 0 else parent.opposed_by
+            if (
+                entry["argument"] not in parent.supported_by
+                and entry["argument"] not in parent.opposed_by
+            ):
+                edges.append(entry["argument"])
+            parent.labelling[creator] = entry["sign"]
+            snapshot.created_arguments[creator] += 1
+        elif entry["event"] == "VoteCast":
+            store.get(entry["argument_id"]).labelling[entry["agent_id"]] = entry["label"]
+    return snapshot
@@ -0,0 +1,365 @@
+"""This module provides the ArgumentStore class, an array-backed container of
+the arguments of a discussion with O(1) id lookup, integer adjacency arrays
+for the supporters/opposers of each argument and an int8 agents x arguments
+vote matrix"""
+
+from array import array
+from collections.abc import Mapping, MutableMapping, MutableSequence
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from todf.argument import Argument
+from todf.scoring import MISSING, majority_labels, support_labels
+
+
+class ArgumentStore:
+    """Stores the arguments of a discussion in insertion order.
+
+    Every argument id gets a slot the first time it is seen, either when its
+    argument is appended or when another argument is supported or opposed by
+    it. Slots index the adjacency arrays, the columns of the vote matrix and
+    the arrays returned by the vectorized methods.
+
+    The arguments appended to the store become records whose `supported_by`,
+    `opposed_by` and `labelling` are views over the arrays of the store.
+    """
+
+    def __init__(self, arguments: Iterable[Argument] = ()):
+        """
+        :param arguments: (Iterable[Argument]) The initial arguments of the store.
+        """
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.records: List[Optional[Argument]] = []
+        self.order = array("i")
+        self.agent_ids: List[str] = []
+        self.agent_index: Dict[str, int] = {}
+        self._supporters: List[Optional[array]] = []
+        self._opposers: List[Optional[array]] = []
+        self._votes = np.full((4, 16), MISSING, dtype=np.int8)
+        self._listeners: List[Callable[[Argument], None]] = []
+
+        for argument in arguments:
+            self.append(argument)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __iter__(self) -> Iterator[Argument]:
+        records = self.records
+        return (records[slot] for slot in self.order)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.records[slot] for slot in self.order[position]]
+        return self.records[self.order[position]]
+
+    def __contains__(self, argument) -> bool:
+        return isinstance(argument, Argument) and argument._store is self
+
+    def __repr__(self):
+        return f"ArgumentStore({[argument.id for argument in self]})"
+
+    def append(self, argument: Argument):
+        """
+        Adds an argument to the store. Its supporters, opposers and labelling
+        are moved into the arrays of the store.
+
+        :param argument: (Argument) The argument to add.
+        :raises ValueError: if the argument is already in a store or its id is taken.
+        """
+        if argument._store is not None:
+            raise ValueError(f"Argument {argument.id} is already in a store")
+
+        slot = self.slot(argument.id)
+        if self.records[slot] is not None:
+            raise ValueError(f"Duplicate argument id {argument.id}")
+
+        supported_by = argument._supported_by
+        opposed_by = argument._opposed_by
+        labelling = argument._labelling
+
+        self.records[slot] = argument
+        self.order.append(slot)
+        argument._store = self
+        argument._slot = slot
+        argument._supported_by = None
+        argument._opposed_by = None
+        argument._labelling = None
+
+        if supported_by:
+            self._supporters[slot] = array("i", map(self.slot, supported_by))
+        if opposed_by:
+            self._opposers[slot] = array("i", map(self.slot, opposed_by))
+        for agent_id, label in labelling.items():
+            row = self.agent_slot(agent_id)
+            self._votes[row, slot] = _check_label(label)
+
+        self.changed(slot)
+
+    def extend(self, arguments: Iterable[Argument]):
+        """
+        Adds several arguments to the store, see `append`.
+
+        :param arguments: (Iterable[Argument]) The arguments to add.
+        """
+        for argument in arguments:
+            self.append(argument)
+
+    def get(self, argument_id: str) -> Argument:
+        """
+        Returns the argument with the given id.
+
+        :param argument_id: (str) The id of the argument.
+        :return: (Argument) The argument.
+        :raises KeyError: if no argument with that id was appended.
+        """
+        slot = self.index.get(argument_id)
+        if slot is None or self.records[slot] is None:
+            raise KeyError(argument_id)
+        return self.records[slot]
+
+    @property
+    def by_id(self) -> Mapping:
+        """A read-only mapping from argument ids to the arguments of the store."""
+        return ArgumentIndex(self)
+
+    def slot(self, argument_id: str) -> int:
+        """
+        Returns the slot of an argument id, assigning a new one if needed.
+
+        :param argument_id: (str) The id of the argument.
+        :return: (int) The slot of the argument.
+        """
+        slot = self.index.get(argument_id)
+        if slot is None:
+            slot = len(self.ids)
+            self.ids.append(argument_id)
+            self.index[argument_id] = slot
+            self.records.append(None)
+            self._supporters.append(None)
+            self._opposers.append(None)
+            if slot >= self._votes.shape[1]:
+                self._grow(self._votes.shape[0], 2 * slot)
+        return slot
+
+    def agent_slot(self, agent_id: str) -> int:
+        """
+        Returns the row of an agent in the vote matrix, assigning a new one if needed.
+
+        :param agent_id: (str) The id of the agent.
+        :return: (int) The row of the agent.
+        """
+        row = self.agent_index.get(agent_id)
+        if row is None:
+            row = len(self.agent_ids)
+            self.agent_ids.append(agent_id)
+            self.agent_index[agent_id] = row
+            if row >= self._votes.shape[0]:
+                self._grow(2 * row, self._votes.shape[1])
+        return row
+
+    def _grow(self, rows: int, columns: int):
+        votes = np.full((rows, columns), MISSING, dtype=np.int8)
+        old_rows, old_columns = self._votes.shape
+        votes[:old_rows, :old_columns] = self._votes
+        self._votes = votes
+
+    def supported_by(self, slot: int) -> "EdgeView":
+        """Returns a view of the ids supporting the argument in the given slot."""
+        return EdgeView(self, slot, self._supporters)
+
+    def opposed_by(self, slot: int) -> "EdgeView":
+        """Returns a view of the ids opposing the argument in the given slot."""
+        return EdgeView(self, slot, self._opposers)
+
+    def labelling(self, slot: int) -> "LabellingView":
+        """Returns a view of the votes on the argument in the given slot."""
+        return LabellingView(self, slot)
+
+    def subscribe(self, listener: Callable[[Argument], None]):
+        """
+        Calls the listener with an argument of the store whenever its
+        supporters, opposers or labelling change, and with every newly
+        appended argument.
+
+        :param listener: the callable to notify
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[Argument], None]):
+        """
+        Stops notifying a listener added with `subscribe`.
+
+        :param listener: the callable to remove
+        """
+        self._listeners.remove(listener)
+
+    def changed(self, slot: int):
+        """Notifies the listeners that the argument in the given slot has changed."""
+        argument = self.records[slot]
+        for listener in self._listeners:
+            listener(argument)
+
+    @property
+    def votes(self) -> np.ndarray:
+        """The agents x slots vote matrix, with `MISSING` for absent votes.
+        This is a view; it is replaced when the store grows."""
+        return self._votes[: len(self.agent_ids), : len(self.ids)]
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the edges of the discussion as parallel arrays.
+
+        :return: (Tuple[np.ndarray, np.ndarray, np.ndarray]) The parent slots, the child
+                 slots and the signs, 1 if the child supports the parent and -1 if it opposes it.
+        """
+        parents = array("i")
+        children = array("i")
+        signs = array("b")
+        for table, sign in ((self._supporters, 1), (self._opposers, -1)):
+            for parent, adjacency in enumerate(table):
+                if adjacency:
+                    parents.extend([parent] * len(adjacency))
+                    children.extend(adjacency)
+                    signs.extend([sign] * len(adjacency))
+        return (
+            np.array(parents, dtype=np.int64),
+            np.array(children, dtype=np.int64),
+            np.array(signs, dtype=np.int8),
+        )
+
+    def majority_labels(self) -> np.ndarray:
+        """
+        Computes the majority label of every slot at once, see `compute_majority_label`.
+
+        :return: (np.ndarray) An int8 array of labels (-1, 0, or 1) indexed by slot.
+        """
+        return majority_labels(self.votes)
+
+    def support_labels(self) -> np.ndarray:
+        """
+        Computes the support label of every slot at once, see `compute_support_label`.
+
+        :return: (np.ndarray) An int8 array of labels (-1, 0, or 1) indexed by slot.
+        :raises ValueError: if an argument supports or opposes itself, directly or not.
+        """
+        return support_labels(self.votes, *self.edge_arrays())
+
+
+def _check_label(label: int) -> int:
+    if not -127 <= label <= 127:
+        raise ValueError(f"Label {label} does not fit the vote matrix")
+    return label
+
+
+class ArgumentIndex(Mapping):
+    """A read-only mapping from argument ids to the arguments of a store."""
+
+    def __init__(self, store: ArgumentStore):
+        self.store = store
+
+    def __getitem__(self, argument_id: str) -> Argument:
+        return self.store.get(argument_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return (argument.id for argument in self.store)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+class EdgeView(MutableSequence):
+    """The ids supporting or opposing an argument, stored as slots in an
+    integer adjacency array of its store."""
+
+    def __init__(self, store: ArgumentStore, slot: int, table: List[Optional[array]]):
+        self.store = store
+        self.slot = slot
+        self.table = table
+
+    def _adjacency(self) -> array:
+        adjacency = self.table[self.slot]
+        if adjacency is None:
+            adjacency = self.table[self.slot] = array("i")
+        return adjacency
+
+    def __len__(self) -> int:
+        adjacency = self.table[self.slot]
+        return 0 if adjacency is None else len(adjacency)
+
+    def __getitem__(self, index):
+        ids = self.store.ids
+        adjacency = self.table[self.slot] or array("i")
+        if isinstance(index, slice):
+            return [ids[slot] for slot in adjacency[index]]
+        return ids[adjacency[index]]
+
+    def __iter__(self) -> Iterator[str]:
+        ids = self.store.ids
+        return (ids[slot] for slot in self.table[self.slot] or ())
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self._adjacency()[index] = array("i", map(self.store.slot, value))
+        else:
+            self._adjacency()[index] = self.store.slot(value)
+        self.store.changed(self.slot)
+
+    def __delitem__(self, index):
+        del self._adjacency()[index]
+        self.store.changed(self.slot)
+
+    def insert(self, index: int, value: str):
+        self._adjacency().insert(index, self.store.slot(value))
+        self.store.changed(self.slot)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, EdgeView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class LabellingView(MutableMapping):
+    """The votes of the agents on an argument, stored in a column of the
+    vote matrix of its store."""
+
+    def __init__(self, store: ArgumentStore, slot: int):
+        self.store = store
+        self.slot = slot
+
+    def _column(self) -> np.ndarray:
+        return self.store._votes[: len(self.store.agent_ids), self.slot]
+
+    def __getitem__(self, agent_id: str) -> int:
+        row = self.store.agent_index.get(agent_id)
+        if row is None:
+            raise KeyError(agent_id)
+        label = self.store._votes[row, self.slot]
+        if label == MISSING:
+            raise KeyError(agent_id)
+        return int(label)
+
+    def __setitem__(self, agent_id: str, label: int):
+        row = self.store.agent_slot(agent_id)
+        self.store._votes[row, self.slot] = _check_label(label)
+        self.store.changed(self.slot)
+
+    def __delitem__(self, agent_id: str):
+        self[agent_id]
+        self.store._votes[self.store.agent_index[agent_id], self.slot] = MISSING
+        self.store.changed(self.slot)
+
+    def __iter__(self) -> Iterator[str]:
+        agent_ids = self.store.agent_ids
+        return (agent_ids[row] for row in np.flatnonzero(self._column() != MISSING))
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._column() != MISSING))
+
+    def __repr__(self):
+        return repr(dict(self))
@@ -0,0 +1,306 @@
+"""This module provides the summarization of discussions. Discussions that fit
+into the token budget of a prompt are summarized with a single call; larger
+ones are summarized by subtree of the target, concurrently, and the partial
+summaries are reduced until they fit"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from todf.concurrency import BoundedExecutor
+from todf.tokens import count_tokens
+
+if TYPE_CHECKING:
+    from todf.argument import Argument
+    from todf.todf import TODF
+
+SUMMARY_TEMPLATE = """Given the discussion below:
+
+        Topic: {topic}
+
+        {arguments}
+
+        Consensus decision: {consensus}
+
+        Provide a summary of the discussion, presenting the main arguments provided and comment on the consensus reached."""
+
+SUBTREE_TEMPLATE = """Given the following part of a discussion about the topic: {topic}
+
+{arguments}
+
+Summarize the main arguments of this part of the discussion in a few sentences, \
+keeping which arguments support or oppose which."""
+
+REDUCE_TEMPLATE = """Given the following summaries of parts of a discussion about the topic: {topic}
+
+{summaries}
+
+Combine them into a single summary of a few sentences, keeping the main arguments \
+for and against."""
+
+CONSENSUS_NAMES = {1: "YES", 0: "UNDECIDED", -1: "NO"}
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """
+    Shortens a text to about the given number of tokens.
+
+    :param text: the text
+    :param max_tokens: the maximum number of tokens
+    :return: the text, cut at a proportional number of characters if it is too long
+    """
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    return text[: max(len(text) * max_tokens // tokens - 3, 0)] + "..."
+
+
+class DiscussionSummarizer:
+    """Summarizes discussions within a token budget per prompt.
+
+    A discussion whose whole prompt fits into the budget is summarized with a
+    single call, exactly like before. Otherwise every subtree of the target
+    that fits is summarized on its own, concurrently; a subtree that does not
+    fit is summarized from its root argument and the summaries of its own
+    subtrees. The summaries of the target's subtrees are then combined,
+    group by group, until they fit into the final prompt.
+
+    Responses are cached by prompt, so summarizing a discussion again after
+    new arguments were added only summarizes the subtrees that changed.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        executor: Optional[BoundedExecutor] = None,
+        cache_size: int = 4096,
+    ):
+        """
+        :param max_tokens: the maximum number of tokens of a prompt
+        :param executor: runs the calls of one level concurrently, default is 4 at a time
+        :param cache_size: the maximum number of cached summaries
+        """
+        self.max_tokens = max_tokens
+        self.executor = executor if executor is not None else BoundedExecutor(4)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _complete(self, prompt: str, complete: Callable[[str], str]) -> str:
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        summary = complete(prompt)
+        with self._lock:
+            self._cache[key] = summary
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return summary
+
+    def _room(self, template: str, **fields: str) -> int:
+        """The tokens left for the variable part of a prompt."""
+        empty = {name: "" for name in ("arguments", "summaries", "consensus")}
+        empty.update(fields)
+        return self.max_tokens - count_tokens(template.format(**empty))
+
+    def summarize(
+        self, framework: TODF, consensus: int, complete: Callable[[str], str]
+    ) -> str:
+        """
+        Summarizes a discussion.
+
+        :param framework: the discussion framework
+        :param consensus: the consensus of the discussion, -1, 0 or 1
+        :param complete: sends a prompt to the language model and returns its answer
+        :return: the summary
+        """
+        # assumption: first argument is the target and arguments are chronologically sorted
+        topic = framework.target.text
+        label = CONSENSUS_NAMES[consensus]
+        arguments = "\n\n".join(
+            argument.creator + ": " + argument.text
+            for argument in framework.arguments[1:]
+        )
+        prompt = SUMMARY_TEMPLATE.format(
+            topic=topic, arguments=arguments, consensus=label
+        )
+        if count_tokens(prompt) <= self.max_tokens:
+            return complete(prompt)
+
+        summaries = self._summarize_subtrees(framework, complete)
+        room = self._room(SUMMARY_TEMPLATE, topic=topic, consensus=label)
+        summaries = self._reduce(summaries, topic, room, complete)
+        prompt = SUMMARY_TEMPLATE.format(
+            topic=topic, arguments="\n\n".join(summaries), consensus=label
+        )
+        return complete(prompt)
+
+    def _summarize_subtrees(
+        self, framework: TODF, complete: Callable[[str], str]
+    ) -> List[str]:
+        """
+        :return: the summaries of the subtrees of the target, in the order of its children
+        """
+        store = framework.arguments
+        topic = framework.target.text
+        room = self._room(SUBTREE_TEMPLATE, topic=topic)
+
+        def children(argument: Argument) -> List[Tuple[Argument, int]]:
+            return [(store.get(i), 1) for i in argument.supported_by] + [
+                (store.get(i), -1) for i in argument.opposed_by
+            ]
+
+        def line(argument: Argument, parent: Argument, sign: int) -> str:
+            relation = "supports" if sign > 0 else "opposes"
+            text = f"[{argument.id}] {argument.creator} {relation} [{parent.id}]: "
+            return text + truncate(argument.text, room // 2)
+
+        # the tokens of every subtree, computed bottom up
+        sizes: Dict[str, int] = {}
+        lines: Dict[str, str] = {}
+        stack = [
+            (child, framework.target, sign, False)
+            for child, sign in children(framework.target)
+        ]
+        while stack:
+            argument, parent, sign, expanded = stack.pop()
+            if argument.id in sizes:
+                continue
+            below = [child for child, _ in children(argument) if child.id not in sizes]
+            if below and not expanded:
+                stack.append((argument, parent, sign, True))
+                stack.extend(
+                    (child, argument, child_sign, False)
+                    for child, child_sign in children(argument)
+                    if child.id not in sizes
+                )
+                continue
+            lines[argument.id] = line(argument, parent, sign)
+            sizes[argument.id] = count_tokens(lines[argument.id]) + 1 + sum(
+                sizes.get(child.id, 0) for child, _ in children(argument)
+            )
+
+        def subtree_text(argument: Argument) -> str:
+            texts, pending = [], [argument]
+            while pending:
+                current = pending.pop()
+                texts.append(lines[current.id])
+                pending.extend(reversed([child for child, _ in children(current)]))
+            return "\n\n".join(texts)
+
+        # Subtrees that fit are summarized whole, packing siblings together
+        # up to the budget. Larger ones are summarized from their root
+        # argument and the summaries of their own subtrees, deepest first.
+        packs: List[List[Argument]] = []
+        parts: Dict[str, List[Tuple[str, object]]] = {}
+        split: List[List[Argument]] = []
+        pending = [(framework.target, -1)]
+        while pending:
+            owner, depth = pending.pop()
+            items = parts[owner.id] = []
+            pack: List[Argument] = []
+            used = 0
+            for child, _ in children(owner):
+                size = sizes[child.id]
+                if size > room:
+                    items.append(("split", child.id))
+                    while len(split) <= depth + 1:
+                        split.append([])
+                    split[depth + 1].append(child)
+                    pending.append((child, depth + 1))
+                    continue
+                if not pack or used + size > room:
+                    pack = []
+                    packs.append(pack)
+                    items.append(("pack", len(packs) - 1))
+                    used = 0
+                pack.append(child)
+                used += size
+
+        pack_summaries = self.executor.map(
+            lambda pack: self._complete(
+                SUBTREE_TEMPLATE.format(
+                    topic=topic,
+                    arguments="\n\n".join(map(subtree_text, pack)),
+                ),
+                complete,
+            ),
+            packs,
+        )
+        summaries: Dict[str, str] = {}
+
+        def resolve(owner: Argument) -> List[str]:
+            return [
+                pack_summaries[key] if kind == "pack" else summaries[key]
+                for kind, key in parts[owner.id]
+            ]
+
+        def summarize_split(argument: Argument) -> str:
+            own = lines[argument.id]
+            replies = [
+                f"Summary of replies to [{argument.id}]: {summary}"
+                for summary in resolve(argument)
+            ]
+            replies = self._reduce(
+                replies, topic, room - count_tokens(own) - 1, complete
+            )
+            text = "\n\n".join([own] + replies)
+            return self._complete(
+                SUBTREE_TEMPLATE.format(topic=topic, arguments=text), complete
+            )
+
+        for level in reversed(split):
+            results = self.executor.map(summarize_split, level)
+            summaries.update(zip((argument.id for argument in level), results))
+
+        return resolve(framework.target)
+
+    def _reduce(
+        self,
+        texts: List[str],
+        topic: str,
+        room: int,
+        complete: Callable[[str], str],
+    ) -> List[str]:
+        """
+        Combines texts group by group until they fit into the given number of tokens.
+
+        :param texts: the summaries to combine
+        :param topic: the topic of the discussion
+        :param room: the number of tokens the texts must fit into
+        :param complete: sends a prompt to the language model and returns its answer
+        :return: the combined texts
+        """
+        chunk_room = self._room(REDUCE_TEMPLATE, topic=topic)
+        room = max(room, 1)
+        while sum(count_tokens(text) + 1 for text in texts) > room:
+            if len(texts) == 1:
+                return [truncate(texts[0], room)]
+
+            # the groups have two texts or more, except maybe the last one,
+            # so every pass shortens the list
+            texts = [truncate(text, chunk_room // 2) for text in texts]
+            groups: List[List[str]] = [[]]
+            used = 0
+            for text in texts:
+                tokens = count_tokens(text) + 1
+                if len(groups[-1]) >= 2 and used + tokens > chunk_room:
+                    groups.append([])
+                    used = 0
+                groups[-1].append(text)
+                used += tokens
+
+            def combine(group: List[str]) -> str:
+                if len(group) == 1:
+                    return group[0]
+                prompt = REDUCE_TEMPLATE.format(
+                    topic=topic, summaries="\n\n".join(group)
+                )
+                return self._complete(prompt, complete)
+
+            texts = self.executor.map(combine, groups)
+        return texts
@@ -0,0 +1,284 @@
+"""This module provides a runner for parameter sweeps, which executes many
+discussions concurrently and checkpoints their results to a JSON lines file"""
+
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from todf.agent import Agent, AgentEngine
+from todf.argument import Argument
+from todf.cache import ResponseCache
+from todf.export import discussion_record
+from todf.limits import BudgetExceededError, LimitedLLM, RateLimiter, TokenBudget
+from todf.memory import AgentMemory
+from todf.policies import ExecutionPolicies
+from todf.todf import Discussion
+from todf.tools import ToolCache
+
+
+@dataclass(frozen=True)
+class DiscussionSpec:
+    """The parameters of a single discussion of a sweep.
+
+    Attributes:
+    proposition (str): The text of the discussion target.
+    panel (Tuple[Tuple[str, str], ...]): The name and persona of every agent.
+    policy (str): The name of a registered execution policy, see `ExecutionPolicies`.
+    policy_kwargs (Dict[str, Any]): The JSON serializable arguments of the policy.
+    seed (int): The seed of the policy, if it takes one; also distinguishes repeated runs.
+    """
+
+    proposition: str
+    panel: Tuple[Tuple[str, str], ...]
+    policy: str = "ROUNDS"
+    policy_kwargs: Dict[str, Any] = field(default_factory=dict)
+    seed: int = 0
+
+    @property
+    def run_id(self) -> str:
+        """A stable identifier of the discussion, used to resume a sweep."""
+        payload = json.dumps(asdict(self), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def grid(
+    propositions: Iterable[str],
+    panels: Iterable[Sequence[Tuple[str, str]]],
+    policies: Iterable[Union[str, Tuple[str, Dict[str, Any]]]],
+    seeds: Iterable[int] = (0,),
+) -> List[DiscussionSpec]:
+    """
+    Builds the specs of every combination of the given parameters.
+
+    :param propositions: the texts of the discussion targets
+    :param panels: the agent panels, each a sequence of (name, persona) pairs
+    :param policies: policy names, or (name, kwargs) pairs
+    :param seeds: the seeds of the repeated runs
+    :return: the specs, in the order of the cartesian product
+    """
+    policies = [
+        (policy, {}) if isinstance(policy, str) else policy for policy in policies
+    ]
+    return [
+        DiscussionSpec(
+            proposition=proposition,
+            panel=tuple(tuple(member) for member in panel),
+            policy=policy,
+            policy_kwargs=dict(policy_kwargs),
+            seed=seed,
+        )
+        for proposition, panel, (policy, policy_kwargs), seed in itertools.product(
+            propositions, list(panels), policies, list(seeds)
+        )
+    ]
+
+
+class SweepRunner:
+    """Runs the discussions of a sweep concurrently on a pool of worker threads.
+
+    All language model calls of the sweep share one rate limiter and one token
+    budget, so there should be enough workers to keep the rate limit busy while
+    calls are in flight. Every finished run is appended to the checkpoint file
+    right away; running the same specs again skips the runs found there.
+    Runs stopped by the token budget are not recorded and run again on resume.
+    """
+
+    def __init__(
+        self,
+        llm,
+        checkpoint_path: str,
+        max_workers: int = 8,
+        requests_per_minute: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        tools: Sequence = (),
+        memory_factory: Optional[Callable[[], Any]] = AgentMemory,
+        cache: Optional[ResponseCache] = None,
+        summarize: bool = False,
+        tool_cache: Optional[ToolCache] = None,
+        journal_dir: Optional[str] = None,
+    ):
+        """
+        :param llm: the language model of the agents, and of the summaries
+        :param checkpoint_path: the JSON lines file the results are appended to
+        :param max_workers: the number of discussions run at once
+        :param requests_per_minute: the rate limit of all language model calls, or None for no limit
+        :param max_tokens: the token budget of the whole sweep, or None for no limit
+        :param tools: the tools of the agents
+        :param memory_factory: creates the memory of each agent, see `AgentEngine`
+        :param cache: an optional ResponseCache shared by all runs; cached calls are not rate limited
+        :param summarize: if True, every run is also summarized
+        :param tool_cache: an optional ToolCache shared by all runs, default is a new one
+        :param journal_dir: if given, every run is checkpointed to its own log in this directory,
+            see `DiscussionJournal`, and an interrupted run resumes from it
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.llm = llm
+        self.checkpoint_path = checkpoint_path
+        self.max_workers = max_workers
+        self.limiter = (
+            RateLimiter(requests_per_minute) if requests_per_minute else None
+        )
+        self.budget = TokenBudget(max_tokens) if max_tokens is not None else None
+        self.tools = list(tools)
+        self.memory_factory = memory_factory
+        self.cache = cache
+        self.summarize = summarize
+        self.tool_cache = tool_cache if tool_cache is not None else ToolCache()
+        self.journal_dir = journal_dir
+        if journal_dir is not None:
+            os.makedirs(journal_dir, exist_ok=True)
+
+    def completed(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Reads the records of the finished runs from the checkpoint file.
+
+        :return: the records of successful runs by run id
+        """
+        records = {}
+        if not os.path.exists(self.checkpoint_path):
+            return records
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line of an interrupted sweep may be incomplete
+                    continue
+                if record.get("status") == "done":
+                    records[record["run_id"]] = record
+        return records
+
+    def build(self, spec: DiscussionSpec, llm) -> Discussion:
+        """
+        Creates the discussion of a spec.
+
+        :param spec: the parameters of the discussion
+        :param llm: the language model of the run
+        :return: a Discussion ready to be executed
+        """
+        engine = AgentEngine(
+            llm,
+            None,
+            self.tools,
+            cache=self.cache,
+            memory_factory=self.memory_factory,
+            tool_cache=self.tool_cache,
+        )
+        agents = [
+            Agent(id=f"ag{i}", name=name, persona=persona, engine=engine)
+            for i, (name, persona) in enumerate(spec.panel, start=1)
+        ]
+        proposition = Argument(
+            id="t", text=spec.proposition, is_target=True, creator="system"
+        )
+        policy_cls = ExecutionPolicies.get_policy(spec.policy)
+        policy_kwargs = dict(spec.policy_kwargs)
+        if "seed" in inspect.signature(policy_cls).parameters:
+            policy_kwargs.setdefault("seed", spec.seed)
+        policy = policy_cls(**policy_kwargs)
+        return Discussion(
+            proposition=proposition,
+            agents=agents,
+            policy=policy,
+            summarization_llm=engine.llm,
+            verbose=False,
+            checkpoint=self.journal_path(spec),
+        )
+
+    def journal_path(self, spec: DiscussionSpec) -> Optional[str]:
+        """
+        :param spec: the parameters of a discussion
+        :return: the path of the log of its run, or None if runs are not checkpointed
+        """
+        if self.journal_dir is None:
+            return None
+        return os.path.join(self.journal_dir, f"{spec.run_id}.jsonl")
+
+    def model(self, spec: DiscussionSpec):
+        """
+        :param spec: the parameters of a discussion
+        :return: the language model of its run, before the rate limit and the token budget
+        """
+        return self.llm
+
+    def run_spec(self, spec: DiscussionSpec) -> Dict[str, Any]:
+        """
+        Executes the discussion of a spec.
+
+        :param spec: the parameters of the discussion
+        :return: the result record of the run
+        :raises BudgetExceededError: if the token budget is spent during the run
+        """
+        llm = LimitedLLM(
+            llm=self.model(spec), limiter=self.limiter, budget=self.budget
+        )
+        record = {"run_id": spec.run_id, "spec": asdict(spec)}
+        start = time.time()
+        try:
+            discussion = self.build(spec, llm)
+            discussion.argue()
+            record.update(discussion_record(discussion.framework))
+            if self.summarize:
+                record["summary"] = discussion.summarize()
+            record["metrics"] = discussion.metrics.summary()
+            record["status"] = "done"
+        except BudgetExceededError:
+            raise
+        except Exception as e:
+            record["status"] = "failed"
+            record["error"] = repr(e)
+        record["seconds"] = time.time() - start
+        record["requests"] = llm.requests
+        record["tokens"] = llm.tokens
+        return record
+
+    def _checkpoint(self, record: Dict[str, Any]):
+        with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def run(self, specs: Iterable[DiscussionSpec]) -> List[Dict[str, Any]]:
+        """
+        Executes the discussions of the specs that have not finished before.
+        Failed runs are recorded and run again when the sweep is resumed.
+
+        :param specs: the parameters of the discussions
+        :return: the records of the finished runs, in the order of the specs
+        """
+        specs = list(specs)
+        records = self.completed()
+        pending = {spec.run_id: spec for spec in specs if spec.run_id not in records}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self.run_spec, spec) for spec in pending.values()]
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except BudgetExceededError:
+                    for other in futures:
+                        other.cancel()
+                    continue
+                self._checkpoint(record)
+                if record["status"] == "done":
+                    records[record["run_id"]] = record
+
+        return [records[spec.run_id] for spec in specs if spec.run_id in records]
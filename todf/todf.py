@@ -1,79 +1,121 @@
 """This module provides classes and functions to simulate the model
  discussions in a target-oriented discussion framework"""
 
-from typing import List, Dict
+from __future__ import annotations
 
-from todf.agent import Agent
-from todf.argument import Argument
-from todf.policies import DiscussionExecutionPolicy
-from todf.utils import print_verbose
+from typing import TYPE_CHECKING, Iterator, List, Optional
 
-import networkx as nx
+from todf.argument import Argument
+from todf.consensus import (
+    ConsensusEngine,
+    compute_majority_label,
+    compute_support_label,
+)
+from todf.events import ArgumentCreated, ArgumentMerged, DiscussionEvent
+from todf.export import to_networkx, write_graphml
+from todf.snapshot import DiscussionJournal
+from todf.store import ArgumentStore
+from todf.summary import DiscussionSummarizer
+
+# The agent layer loads LangChain, so it is only imported once a discussion
+# is created; scoring and loading saved frameworks do not need it.
+if TYPE_CHECKING:
+    from todf.agent import Agent
+    from todf.cache import ResponseCache
+    from todf.dedup import DuplicateIndex
+    from todf.metrics import DiscussionMetrics
+    from todf.policies import DiscussionExecutionPolicy
 
 
 class TODF:
     """Represents a target-oriented discussion framework instance."""
 
-    def __init__(self, target: Argument, agents: List[Agent]):
-        self.target = target
+    def __init__(
+        self,
+        target: Argument,
+        agents: List[Agent],
+        index: Optional[DuplicateIndex] = None,
+    ):
+        """
+        :param target: (Argument) The discussion target. The framework works on a
+            copy of it, so the same target can start several discussions.
+        :param agents: (List[Agent]) The agents of the discussion.
+        :param index: (Optional[DuplicateIndex]) If given, new arguments that
+            duplicate existing ones are merged into them, see `add_argument`.
+        """
+        self.target = Argument(
+            id=target.id,
+            text=target.text,
+            creator=target.creator,
+            is_target=target.is_target,
+        )
+        self.target.supported_by = list(target.supported_by)
+        self.target.opposed_by = list(target.opposed_by)
+        self.target.labelling = dict(target.labelling)
         self.agents = agents
-        self.arguments: List[Argument] = [target]
-
-
-def compute_majority_label(argument: Argument):
-    """Computes the majority label of an argument.
-
-    :param argument: (Argument) The argument to compute the majority label for.
-    :return: (int) The majority label for the argument.
-    """
-    total_sum = sum(argument.labelling.values())
-    if total_sum > 0:
-        return 1
-    elif total_sum == 0:
-        return 0
-    else:
-        return -1
-
-
-def compute_support_label(
-    argument: Argument, arguments: Dict[str, Argument]
-) -> int:
-    """Computes the support label for an argument in discussion.
-
-    :param argument: (Argument) The argument to compute the support for.
-    :param arguments: (Dict[str, Argument]) A dictionary of arguments in the
-                    discussion.
-    :return: (int) The computed support value for the argument.
-    """
-    if len(argument.supported_by) == 0 and len(argument.opposed_by) == 0:
-        # leaf
-        return compute_majority_label(argument)
-
-    pro = 0
-    con = 0
-
-    for child_argument_id in argument.supported_by:
-        child_argument = arguments[child_argument_id]
-        child_support = compute_support_label(child_argument, arguments)
-        if child_support == 1:
-            pro += 1
-        elif child_support == -1:
-            con += 1
-
-    for child_argument_id in argument.opposed_by:
-        child_argument = arguments[child_argument_id]
-        child_support = compute_support_label(child_argument, arguments)
-        if child_support == 1:
-            con += 1
-        elif child_support == -1:
-            pro += 1
-
-    if pro > con:
-        return 1
-    elif pro < con:
-        return -1
-    else:
-        return compute_majority_label(argument)
+        self.arguments = ArgumentStore([self.target])
+        self.consensus_engine = ConsensusEngine(self.arguments)
+        self.index = index
+        if index is not None:
+            index.add(self.target)
+
+    def add_argument(self, argument: Argument, target: Argument) -> DiscussionEvent:
+        """
+        Adds a new argument, made by its creator in response to the target.
+
+        If the index finds an existing argument it duplicates, the new argument
+        is not added; the existing one takes its place as a supporter or
+        opponent of the target instead, unless it already is one. Arguments
+        that would create a cycle, i.e. duplicates of the target or of one of
+        its ancestors, are added like any other.
+
+        :param argument: (Argument) The new argument, already linked to the target.
+        :param target: (Argument) The argument it supports or opposes.
+        :return: (DiscussionEvent) ArgumentCreated, or ArgumentMerged if it was merged.
+        """
+        if self.index is not None:
+            duplicate_id = self.index.find(argument)
+            if duplicate_id is not None and self._merge(
+                argument, target, duplicate_id
+            ):
+                return ArgumentMerged(
+                    argument=self.arguments.get(duplicate_id),
+                    target=target,
+                    duplicate=argument,
+                )
+        self.arguments.append(argument)
+        if self.index is not None:
+            self.index.add(argument)
+        return ArgumentCreated(argument=argument, target=target)
+
+    def _merge(self, argument: Argument, target: Argument, existing_id: str) -> bool:
+        """Replaces the edge from the new argument to the target by an edge
+        from the existing one, if there is one and that does not create a
+        cycle."""
+        pending, visited = [existing_id], set()
+        while pending:
+            current = pending.pop()
+            if current == target.id:
+                return False
+            if current not in visited:
+                visited.add(current)
+                existing = self.arguments.get(current)
+                pending.extend(existing.supported_by)
+                pending.extend(existing.opposed_by)
+
+        if argument.id in target.supported_by:
+            edges = target.supported_by
+        elif argument.id in target.opposed_by:
+            edges = target.opposed_by
+        else:
+            # a stance that was not understood leaves no edge to replace
+            return False
+        position = edges.index(argument.id)
+        if existing_id in target.supported_by or existing_id in target.opposed_by:
+            del edges[position]
+        else:
+            edges[position] = existing_id
+        return True
 
 
 class Discussion:
@@ -87,42 +129,123 @@ class Discussion:
         policy: DiscussionExecutionPolicy,
         summarization_llm,
         verbose: bool = True,
+        cache: Optional[ResponseCache] = None,
+        checkpoint: Optional[str] = None,
+        metrics: Optional[DiscussionMetrics] = None,
+        summarizer: Optional[DiscussionSummarizer] = None,
+        dedup: Optional[DuplicateIndex] = None,
     ):
+        """
+        :param proposition: (Argument) The discussion target.
+        :param agents: (List[Agent]) The agents of the discussion.
+        :param policy: (DiscussionExecutionPolicy) The execution policy.
+        :param summarization_llm: The language model of the summary.
+        :param verbose: (bool) If True, the discussion is printed while it runs.
+        :param cache: (Optional[ResponseCache]) An optional cache of the summary.
+        :param checkpoint: (Optional[str]) The path of a log the discussion is
+            checkpointed to, see `DiscussionJournal`. If the log exists, the
+            discussion resumes from it; the agents and the policy must be
+            created the same way as for the interrupted run.
+        :param metrics: (Optional[DiscussionMetrics]) Records the calls of the
+            discussion, e.g. with the prices of the model. Default is a new one.
+        :param summarizer: (Optional[DiscussionSummarizer]) Summarizes the
+            discussion within a token budget. Default is a new one.
+        :param dedup: (Optional[DuplicateIndex]) If given, arguments that
+            duplicate existing ones are merged into them, see `TODF.add_argument`.
+        """
+        from todf.cache import CachedLLM
+        from todf.metrics import DiscussionMetrics
+
         self.proposition = proposition
-        self.framework = TODF(target=proposition, agents=agents)
+        self.framework = TODF(target=proposition, agents=agents, index=dedup)
         self.execution_policy = policy
         self.verbose = verbose
+        if cache is not None:
+            summarization_llm = CachedLLM(llm=summarization_llm, cache=cache)
         self.summarization_llm = summarization_llm
+        self.checkpoint = checkpoint
+        self.metrics = metrics if metrics is not None else DiscussionMetrics()
+        self.summarizer = (
+            summarizer if summarizer is not None else DiscussionSummarizer()
+        )
 
     def __repr__(self):
         return self.proposition
 
     def argue(self):
         """Executes the discussion."""
-        self.execution_policy.exec(
+        for _ in self.stream():
+            pass
+
+    def stream(self) -> Iterator[DiscussionEvent]:
+        """
+        Executes the discussion like `argue`, yielding its events while it runs.
+        Stop iterating, or close the iterator, to end the discussion early.
+        Use `todf.events.aiterate` to consume it from asyncio code.
+
+        :return: (Iterator[DiscussionEvent]) The events of the discussion.
+        """
+        events = self.execution_policy.stream(
             framework=self.framework, verbose=self.verbose
         )
+        return self._instrumented(events)
+
+    def _instrumented(
+        self, events: Iterator[DiscussionEvent]
+    ) -> Iterator[DiscussionEvent]:
+        agents = self.framework.agents
+        callbacks = {agent.id: agent.callbacks for agent in agents}
+        journal = None
+        try:
+            if self.checkpoint is not None:
+                journal = DiscussionJournal(self.checkpoint)
+                # the policy starts running on the first event, after the
+                # random number generator is restored
+                journal.start(self.framework, self.execution_policy)
+            for agent in agents:
+                agent.callbacks = (agent.callbacks or []) + [self.metrics]
+                agent.journal = journal
+            events = self.metrics.observe(events)
+            if journal is not None:
+                events = journal.record(events)
+            yield from events
+        finally:
+            for agent in agents:
+                agent.callbacks = callbacks[agent.id]
+                agent.journal = None
+            if journal is not None:
+                journal.close()
 
     def summarize(self):
-        # assumption: first argument is the target and arguments are chronologically sorted
-
-        arguments = "\n\n".join(map(lambda arg: arg.creator + ": " + arg.text, self.framework.arguments[1:]))
-
-        topic = self.framework.target.text
-
-        consensus = {1: "YES", 0: "UNDECIDED", -1: "NO"}[self.consensus()]
-
-        prompt = f"""Given the discussion below:
+        """
+        Summarizes the discussion, by subtree of the target if it does not fit
+        into a single prompt, see `DiscussionSummarizer`.
 
-        Topic: {topic}
+        :return: (str) The summary.
+        """
+        from langchain.base_language import BaseLanguageModel
 
-        {arguments}
+        from todf.metrics import SUMMARY, request_scope
 
-        Consensus decision: {consensus}
+        target_id = self.framework.target.id
+        # a plain callable model takes only the prompt, and is not metered
+        kwargs = (
+            {"callbacks": [self.metrics]}
+            if isinstance(self.summarization_llm, BaseLanguageModel)
+            else {}
+        )
 
-        Provide a summary of the discussion, presenting the main arguments provided and comment on the consensus reached."""
+        def complete(prompt: str) -> str:
+            with request_scope(None, "summary", [target_id]):
+                return self.summarization_llm(prompt, **kwargs)
 
-        return self.summarization_llm(prompt)
+        self.metrics.enter_phase(SUMMARY)
+        try:
+            return self.summarizer.summarize(
+                self.framework, self.consensus(), complete
+            )
+        finally:
+            self.metrics.enter_phase(None)
 
     def get_graph(self):
         """
@@ -130,34 +253,15 @@ class Discussion:
 
         :return: (nx.DiGraph) The discussion graph.
         """
-        G = nx.DiGraph()
-
-        # create the nodes
-        for argument in self.framework.arguments:
-            # initialize support function label with 2
-            G.add_node(
-                argument.id,
-                author=argument.creator,
-                text=argument.text,
-            )
-
-        # create the edges
-        for argument in self.framework.arguments:
-            for arg_from in argument.supported_by:
-                G.add_edge(arg_from, argument, type="supports", color="green")
-
-            for arg_from in argument.opposed_by:
-                G.add_edge(arg_from, argument, type="opposes", color="red")
-
-        return G
+        return to_networkx(self.framework)
 
     def save(self, path: str):
         """
-        Saves the discussion graph to a file.
+        Saves the discussion graph to a GraphML file.
 
         :param path: (str) The path to save the graph file.
         """
-        return nx.write_graphml(self.get_graph(), path)
+        write_graphml(self.framework, path)
 
     def consensus(self) -> int:
         """
@@ -165,12 +269,8 @@ class Discussion:
 
         :return: (int) The consensus value (-1, 0, or 1) for the discussion.
         """
-        arguments = {}
-        for argument in self.framework.arguments:
-            arguments[argument.id] = argument
-
         target = self.framework.target
-        return compute_support_label(target, arguments)
+        return self.framework.consensus_engine.support_label(target.id)
 
     def run(self) -> str:
         """
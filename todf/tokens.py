@@ -0,0 +1,34 @@
+"""This module provides token counting with tiktoken"""
+
+from functools import lru_cache
+from typing import Optional
+
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(name: str):
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(name)
+    except Exception:
+        # tiktoken downloads its encodings on first use, which fails offline
+        return None
+
+
+def count_tokens(text: str, encoding: Optional[str] = None) -> int:
+    """
+    Counts the tokens of a text.
+
+    If the tiktoken encoding cannot be loaded, the count is estimated as one
+    token per four characters.
+
+    :param text: the text to count
+    :param encoding: the name of the tiktoken encoding, default is cl100k_base
+    :return: the number of tokens
+    """
+    tokenizer = _get_encoding(encoding or DEFAULT_ENCODING)
+    if tokenizer is None:
+        return (len(text) + 3) // 4
+    return len(tokenizer.encode(text, disallowed_special=()))
@@ -0,0 +1,178 @@
+"""This module provides a cache of tool results that can be shared by the agent
+engines of a discussion or a sweep, so identical tool queries, e.g. web
+searches for the same proposition, are only sent once"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain.agents import Tool
+from langchain.tools import BaseTool
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a tool query, so queries differing only in case, spacing or
+    surrounding punctuation share a cache entry.
+
+    :param query: the query sent to the tool
+    :return: the normalized query
+    """
+    return " ".join(query.lower().split()).strip(" \"'.?!")
+
+
+@dataclass
+class ToolStats:
+    """The usage of a tool through a ToolCache.
+
+    Attributes:
+    calls (int): The number of queries.
+    hits (int): The queries answered from the cache.
+    coalesced (int): The queries that waited for an identical query in flight.
+    misses (int): The queries sent to the tool.
+    errors (int): The queries the tool failed on.
+    seconds (float): The total time the tool took on the queries sent to it.
+    """
+
+    calls: int = 0
+    hits: int = 0
+    coalesced: int = 0
+    misses: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of queries that were not sent to the tool."""
+        return (self.hits + self.coalesced) / self.calls if self.calls else 0.0
+
+    @property
+    def mean_seconds(self) -> float:
+        """The mean time the tool took on a query sent to it."""
+        return self.seconds / self.misses if self.misses else 0.0
+
+
+class ToolCache:
+    """A thread-safe cache of tool results by tool name and normalized query.
+
+    Results expire after ``ttl`` seconds, and the least recently used ones are
+    evicted once there are more than ``max_size``. While a query is in
+    flight, identical queries wait for its result instead of calling the tool
+    again. Failed queries are not cached; their error is raised to every
+    waiting caller.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = 3600.0,
+        normalize: Callable[[str], str] = normalize_query,
+    ):
+        """
+        :param max_size: the maximum number of cached results
+        :param ttl: the seconds a result is kept, or None to keep it until it is evicted
+        :param normalize: turns a query into its cache key
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.normalize = normalize
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        self._stats: Dict[str, ToolStats] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def call(self, name: str, query: str, run: Callable[[str], str]) -> str:
+        """
+        Returns the cached result of a query, or runs it.
+
+        :param name: the name of the tool
+        :param query: the query
+        :param run: sends the query to the tool
+        :return: the result of the tool
+        """
+        key = (name, self.normalize(query))
+        with self._lock:
+            stats = self._stats.setdefault(name, ToolStats())
+            stats.calls += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    stats.hits += 1
+                    return result
+                del self._entries[key]
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                stats.misses += 1
+            else:
+                stats.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        start = time.perf_counter()
+        try:
+            result = run(query)
+        except BaseException as e:
+            with self._lock:
+                stats.errors += 1
+                stats.seconds += time.perf_counter() - start
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            stats.seconds += time.perf_counter() - start
+            expires = float("inf") if self.ttl is None else time.monotonic() + self.ttl
+            self._entries[key] = (expires, result)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            del self._in_flight[key]
+        future.set_result(result)
+        return result
+
+    def wrap(self, tool: BaseTool) -> Tool:
+        """
+        Creates a tool that answers through the cache.
+
+        :param tool: the tool to wrap
+        :return: a tool with the same name and description
+        """
+        return Tool(
+            name=tool.name,
+            description=tool.description,
+            func=lambda query: self.call(tool.name, query, tool.run),
+            return_direct=tool.return_direct,
+        )
+
+    def wrap_all(self, tools: Sequence[BaseTool]) -> List[Tool]:
+        """
+        :param tools: the tools to wrap, see `wrap`
+        :return: the wrapped tools
+        """
+        return [self.wrap(tool) for tool in tools]
+
+    def stats(self) -> Dict[str, ToolStats]:
+        """
+        :return: a copy of the usage of every tool, by tool name
+        """
+        with self._lock:
+            return {name: replace(stats) for name, stats in self._stats.items()}
+
+    def clear(self):
+        """Drops all cached results; the stats are kept."""
+        with self._lock:
+            self._entries.clear()
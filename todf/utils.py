@@ -1,15 +1,129 @@
+import atexit
+import logging
+import queue
+import sys
+import threading
 import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional, TextIO
 
-from termcolor import colored
+logger = logging.getLogger("todf")
+"""The logger of the verbose output. Its records carry a ``color`` attribute."""
 
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
 
-def print_typing(text, color="white"):
-    for char in text:
-        print(colored(char, color), end="", flush=True)
-        time.sleep(0.001)
-    print()
+
+def colored(text: str, color: str) -> str:
+    """Colors a text for the terminal; termcolor is only imported on first use."""
+    from termcolor import colored
+
+    return colored(text, color)
+
+
+class ColoredStreamHandler(logging.StreamHandler):
+    """Writes each record in the color given by its ``color`` attribute."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        color = getattr(record, "color", None)
+        return colored(text, color) if color else text
+
+
+class TypingStreamHandler(logging.StreamHandler):
+    """Writes each record character by character, like someone typing."""
+
+    def __init__(self, stream: Optional[TextIO] = None, delay: float = 0.001):
+        super().__init__(stream)
+        self.delay = delay
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            text = self.format(record)
+            color = getattr(record, "color", None) or "white"
+            for char in text:
+                self.stream.write(colored(char, color))
+                self.stream.flush()
+                time.sleep(self.delay)
+            self.stream.write(self.terminator)
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+def configure_verbose_output(
+    typing: bool = False,
+    stream: Optional[TextIO] = None,
+    delay: float = 0.001,
+    handlers: Optional[List[logging.Handler]] = None,
+):
+    """
+    Sets where verbose output is written. The handlers run on a background
+    thread, so neither writing nor the typing effect slows down a discussion.
+
+    :param typing: if True, messages are typed out character by character
+    :param stream: the stream to write to, default is sys.stdout
+    :param delay: the pause after each typed character, in seconds
+    :param handlers: handlers to use instead of the default one, e.g. to write structured records to a file
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+
+        if handlers is None:
+            stream = stream or sys.stdout
+            handler = (
+                TypingStreamHandler(stream, delay)
+                if typing
+                else ColoredStreamHandler(stream)
+            )
+            handlers = [handler]
+
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(QueueHandler(records))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        _listener = QueueListener(records, *handlers)
+        _listener.start()
+
+
+def flush_verbose_output():
+    """Waits until all verbose output so far has been written."""
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+
+
+def _stop_verbose_output():
+    """Writes the remaining verbose output and stops the background thread;
+    no thread can be started again at interpreter shutdown."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(_stop_verbose_output)
+
+
+def print_message(text: str, color: str = "white"):
+    """
+    Writes a message to the verbose output without waiting for it.
+
+    :param text: the message
+    :param color: the termcolor color of the message
+    """
+    if _listener is None:
+        configure_verbose_output()
+    logger.info(text, extra={"color": color})
 
 
 def print_verbose(text: str, verbose: bool = False, color: str = "white"):
     if verbose:
-        print_typing(text, color)
+        print_message(text, color)
@@ -0,0 +1,267 @@
+"""This module provides voting strategies for the labelling phase of the
+execution policies in a target-oriented discussion framework"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence, Tuple
+
+from todf.concurrency import BoundedExecutor
+from todf.consensus import LabelBounds
+from todf.events import VoteCast
+from todf.utils import print_verbose
+
+if TYPE_CHECKING:
+    from todf.agent import Agent
+    from todf.argument import Argument
+
+
+class VotingStrategy(ABC):
+    """An abstract class base for all voting strategies.
+
+    A voting strategy lets every agent label every argument it has not
+    labelled yet and stores the labels in `Argument.labelling`.
+    """
+
+    def vote(
+        self,
+        agents: List[Agent],
+        arguments: List[Argument],
+        verbose: bool = False,
+    ):
+        """
+        Collects the missing labels of the given agents on the given arguments.
+
+        :param agents: (List[Agent]) The voting agents, in voting order.
+        :param arguments: (List[Argument]) The arguments to be labelled.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        """
+        for _ in self.stream(agents, arguments, verbose):
+            pass
+
+    def stream(
+        self,
+        agents: List[Agent],
+        arguments: List[Argument],
+        verbose: bool = False,
+    ) -> Iterator[VoteCast]:
+        """
+        Collects the missing labels like `vote`, yielding each vote once it is stored.
+
+        :param agents: (List[Agent]) The voting agents, in voting order.
+        :param arguments: (List[Argument]) The arguments to be labelled.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Iterator[VoteCast]) The votes, in the order they are stored.
+        """
+        yield from self.collect(self.pairs(agents, arguments, verbose), verbose)
+
+    def pairs(
+        self,
+        agents: List[Agent],
+        arguments: List[Argument],
+        verbose: bool = False,
+    ) -> List[Tuple[Agent, Argument]]:
+        """
+        Lists the votes to be cast, skipping the arguments an agent has already labelled.
+
+        :param agents: (List[Agent]) The voting agents, in voting order.
+        :param arguments: (List[Argument]) The arguments to be labelled.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (List[Tuple[Agent, Argument]]) The agent and argument of every missing label.
+        """
+        pairs = []
+        for agent in agents:
+            for arg in arguments:
+                # if agent has already a label in that argument continue
+                # on counter argument generation, a label is instantly applied
+                # depending if it supports or opposes
+                if agent.id in arg.labelling.keys():
+                    print_verbose(
+                        f"\nAgent {agent} already voted argument {arg.id} : {arg.labelling[agent.id]}",
+                        verbose=verbose,
+                        color="yellow",
+                    )
+                    continue
+                pairs.append((agent, arg))
+        return pairs
+
+    @abstractmethod
+    def collect(
+        self, pairs: List[Tuple[Agent, Argument]], verbose: bool = False
+    ) -> Iterator[VoteCast]:
+        """
+        Lets each agent label its argument, in the order of the pairs.
+
+        :param pairs: (List[Tuple[Agent, Argument]]) The votes to be cast.
+        :param verbose: (bool, optional) Indicates whether to print verbose output. Default is False.
+        :return: (Iterator[VoteCast]) The votes, in the order they are stored.
+        """
+        pass
+
+
+def _store_vote(agent: Agent, arg: Argument, label: int, verbose: bool) -> VoteCast:
+    arg.labelling[agent.id] = label
+    print_verbose(
+        f"\nAgent {agent} voted argument {arg.id} : {label}",
+        verbose=verbose,
+        color="yellow",
+    )
+    return VoteCast(agent_id=agent.id, argument_id=arg.id, label=label)
+
+
+class SerialVoting(VotingStrategy):
+    """Casts the votes one after another."""
+
+    def collect(
+        self, pairs: List[Tuple[Agent, Argument]], verbose: bool = False
+    ) -> Iterator[VoteCast]:
+        for agent, arg in pairs:
+            yield _store_vote(agent, arg, agent.vote(arg), verbose)
+
+
+class ConcurrentVoting(VotingStrategy):
+    """Requests the votes from the language model concurrently.
+
+    The responses are recorded in the same order as `SerialVoting` records
+    them, so both strategies produce the same labelling and agent memories.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+    ):
+        """
+        :param max_concurrency: (int) The maximum number of votes requested at once.
+        :param timeout: (float, optional) The number of seconds a single request may take.
+        :param retries: (int) How many times a failed or timed out request is repeated.
+        """
+        self.executor = BoundedExecutor(
+            max_concurrency=max_concurrency, timeout=timeout, retries=retries
+        )
+
+    def collect(
+        self, pairs: List[Tuple[Agent, Argument]], verbose: bool = False
+    ) -> Iterator[VoteCast]:
+        responses = self.executor.map(
+            lambda pair: pair[0].request_vote(pair[1]), pairs
+        )
+        for (agent, arg), response in zip(pairs, responses):
+            yield _store_vote(agent, arg, agent.record_vote(arg, response), verbose)
+
+
+class BatchVoting(VotingStrategy):
+    """Lets each agent label up to ``batch_size`` arguments with a single
+    numbered prompt, see `Agent.vote_batch`.
+
+    The batches of different agents are independent and can be requested
+    concurrently; they are recorded in the order of the pairs.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 10,
+        max_concurrency: int = 1,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+    ):
+        """
+        :param batch_size: (int) The maximum number of arguments in one prompt.
+        :param max_concurrency: (int) The maximum number of batches requested at once.
+        :param timeout: (float, optional) The number of seconds a single request may take.
+        :param retries: (int) How many times a failed or timed out request is repeated.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        self.batch_size = batch_size
+        self.executor = BoundedExecutor(
+            max_concurrency=max_concurrency, timeout=timeout, retries=retries
+        )
+
+    def collect(
+        self, pairs: List[Tuple[Agent, Argument]], verbose: bool = False
+    ) -> Iterator[VoteCast]:
+        batches: List[Tuple[Agent, List[Argument]]] = []
+        for agent, arg in pairs:
+            if (
+                batches
+                and batches[-1][0] is agent
+                and len(batches[-1][1]) < self.batch_size
+            ):
+                batches[-1][1].append(arg)
+            else:
+                batches.append((agent, [arg]))
+
+        responses = self.executor.map(
+            lambda batch: batch[0].request_votes(batch[1]), batches
+        )
+        for (agent, args), response in zip(batches, responses):
+            labels = agent.record_votes(args, response)
+            for arg, label in zip(args, labels):
+                yield _store_vote(agent, arg, label, verbose)
+
+
+class LazyVoting(VotingStrategy):
+    """Casts the votes one after another, skipping those that can no longer
+    change the support label of the discussion.
+
+    A support label only depends on the labelling of an argument if it is a
+    leaf or if its pro and con children may tie. The votes on an argument stop
+    once its majority is settled by the votes cast so far, or once it, or each
+    of its parents, has a settled support label. The support labels of the
+    arguments without a parent among the voted ones, e.g. the discussion
+    target, come out the same as with `SerialVoting`; the labelling of the
+    other arguments may stay incomplete.
+
+    The votes are cast argument by argument, starting from the most recent
+    arguments, since the labels of the children often make the labelling of
+    their parent irrelevant.
+    """
+
+    def pairs(
+        self,
+        agents: List[Agent],
+        arguments: List[Argument],
+        verbose: bool = False,
+    ) -> List[Tuple[Agent, Argument]]:
+        pairs = super().pairs(agents, arguments, verbose)
+        position = {arg.id: i for i, arg in enumerate(arguments)}
+        # sorting is stable, so the agents keep their voting order
+        return sorted(pairs, key=lambda pair: -position[pair[1].id])
+
+    def stream(
+        self,
+        agents: List[Agent],
+        arguments: List[Argument],
+        verbose: bool = False,
+    ) -> Iterator[VoteCast]:
+        yield from self._collect(
+            self.pairs(agents, arguments, verbose), arguments, verbose
+        )
+
+    def collect(
+        self, pairs: List[Tuple[Agent, Argument]], verbose: bool = False
+    ) -> Iterator[VoteCast]:
+        arguments = list({arg.id: arg for _, arg in pairs}.values())
+        yield from self._collect(pairs, arguments, verbose)
+
+    def _collect(
+        self,
+        pairs: List[Tuple[Agent, Argument]],
+        arguments: Sequence[Argument],
+        verbose: bool,
+    ) -> Iterator[VoteCast]:
+        bounds = LabelBounds(arguments, Counter(arg.id for _, arg in pairs))
+        for agent, arg in pairs:
+            if not bounds.needs_vote(arg.id):
+                print_verbose(
+                    f"\nAgent {agent} skips argument {arg.id}: the vote cannot change the consensus",
+                    verbose=verbose,
+                    color="yellow",
+                )
+                continue
+            label = agent.vote(arg)
+            yield _store_vote(agent, arg, label, verbose)
+            bounds.add_vote(arg.id, label)